@@ -1,30 +1,59 @@
 import time
 import logging
 from datetime import datetime
-from src.database.connection import initialize_db
+from src.common.subprocess_runner import command_stats
+from src.common.workers import WORKER_RESULT_TIMEOUT, CollectorPool
+from src.database.connection import initialize_db, write_batch
+from src.database.retention import apply_retention
+from src.modules.analysis.pipeline import register_consumer
+from src.modules.analysis.anomaly import detect_anomalies
+from src.modules.analysis.rules import build_rule_engine
 from src.modules.metrics.system_task import (
     collect_cpu_metrics,
     collect_memory_metrics,
     collect_disk_metrics,
     collect_network_metrics,
 )
-from src.modules.metrics.docker_task import collect_docker_metrics
-from src.modules.runtime.tmux_task import collect_runtime_status
-from src.modules.events.auth_task import collect_auth_logs
-from src.modules.events.system_event_task import collect_system_events
-from src.modules.events.cloudflare_task import collect_cloudflare_status
+from src.modules.metrics.diskio_task import collect_disk_io_metrics
+from src.modules.metrics.pressure_task import collect_pressure_metrics
+from src.modules.runtime.tmux_task import collect_runtime_status, stop_runtime_monitors
+from src.modules.events.auth_task import sample_auth_logs, store_auth_logs
+from src.modules.events.cloudflare_task import sample_cloudflare_status, store_cloudflare_status
+from src.modules.events.docker_event_task import collect_docker_events, stop_docker_events
 
 # 로깅 설정 (INFO 레벨로 설정하여 주요 흐름 확인)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s')
 
+def _guarded(fn, *args, **kwargs):
+    """
+    수집기 하나의 예외가 메인 루프(및 배치 트랜잭션)로 번지지 않도록 막고 None을 반환합니다.
+    """
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"{getattr(fn, '__name__', fn)} 실행 중 오류 발생: {e}")
+        return None
+
+
 def main():
     # 🚀 시작 시 DB 구조부터 잡기 (기존 데이터 삭제됨)
     initialize_db()
+
+    # 수집 샘플을 같은 틱 안에서 분석 (DB 재조회 없음)
+    register_consumer(detect_anomalies)
+    rule_engine = build_rule_engine()
+    if rule_engine:
+        register_consumer(rule_engine)
+
+    # WORKER_COLLECTORS에 지정된 수집기는 별도 프로세스에서 실행 (미지정 시 기존과 동일하게 메인에서 실행)
+    collectors = CollectorPool().start()
     
     logging.info("서버 에이전트 가동 시작 (T1: 10s, T2: 60s, T3: 1h)")
     
     count_t2 = 0
     count_t3 = 0
+    # 수집 소요 시간만큼 주기가 밀리지 않도록 절대 시각 기준으로 다음 틱을 잡음
+    next_tick = time.monotonic()
     
     try:
         while True:
@@ -32,43 +61,80 @@ def main():
             now = datetime.now()
             batch_id = now.isoformat()
             
+            tier2 = count_t2 % 6 == 0
+
             # ------------------------------------------------------------------
-            # [Tier 1] 실시간 메트릭 (10초 주기)
+            # 수집(sample) 단계: 외부 대기(워커 결과, cloudflared HTTP, last 명령)는 배치 쓰기 밖에서 처리
             # ------------------------------------------------------------------
-            res_cpu = collect_cpu_metrics(ts=now, batch_id=batch_id)
-            res_mem = collect_memory_metrics(ts=now, batch_id=batch_id)
-            res_disk = collect_disk_metrics(ts=now, batch_id=batch_id)
-            res_net = collect_network_metrics(ts=now, batch_id=batch_id)
-            res_doc = collect_docker_metrics(ts=now, batch_id=batch_id)
-            
-            if res_cpu: logging.info(f"[Tier 1] {res_cpu}")
-            if res_mem: logging.info(f"[Tier 1] {res_mem}")
-            if res_disk: logging.info(f"[Tier 1] {res_disk}")
-            if res_net: logging.info(f"[Tier 1] {res_net}")
-            if res_doc: logging.info(f"[Tier 1] {res_doc}")
-            
+            # 워커 수집기는 먼저 요청만 보내 두고 아래 수집과 병렬로 진행
+            # 결과 대기는 워커별이 아니라 틱 전체에 데드라인 하나 (워커가 늘어도 틱이 밀리지 않음)
+            receive_deadline = time.monotonic() + WORKER_RESULT_TIMEOUT
+            collectors.submit("docker_metrics", now, batch_id)
+            collectors.submit("process_metrics", now, batch_id)
+            if tier2:
+                collectors.submit("system_events", now, batch_id)
+                cf_rows = _guarded(sample_cloudflare_status, now, batch_id)
+                auth_rows = _guarded(sample_auth_logs, now, batch_id)
+            got_doc = _guarded(collectors.receive, "docker_metrics", now, batch_id, receive_deadline)
+            got_proc = _guarded(collectors.receive, "process_metrics", now, batch_id, receive_deadline)
+            got_sys = _guarded(collectors.receive, "system_events", now, batch_id, receive_deadline) if tier2 else None
+
             # ------------------------------------------------------------------
-            # [Tier 2] 상태/환경 정보 (60초 주기: 10초 * 6)
+            # 저장(store) 단계: Tier 1/2 쓰기를 틱당 커밋 1회로 묶음 (DB_BATCH_WRITES, SQLite 기본)
+            # 수집기 예외는 _guarded가 잡으므로 한 수집기 실패가 배치 전체를 되돌리지 않음
             # ------------------------------------------------------------------
-            if count_t2 % 6 == 0:
-                res_run = collect_runtime_status(ts=now, batch_id=batch_id)
-                res_auth = collect_auth_logs(ts=now, batch_id=batch_id)
-                res_sys = collect_system_events(ts=now, batch_id=batch_id)
-                res_cf = collect_cloudflare_status(ts=now, batch_id=batch_id)
-                
-                if res_run: logging.info(f"[Tier 2] {res_run}")
-                if res_auth: logging.info(f"[Tier 2] {res_auth}")
-                if res_sys: logging.info(f"[Tier 2] {res_sys}")
-                if res_cf: logging.info(f"[Tier 2] {res_cf}")
-            
+            try:
+                with write_batch():
+                    # [Tier 1] 실시간 메트릭 (10초 주기)
+                    res_cpu = _guarded(collect_cpu_metrics, ts=now, batch_id=batch_id)
+                    res_mem = _guarded(collect_memory_metrics, ts=now, batch_id=batch_id)
+                    res_disk = _guarded(collect_disk_metrics, ts=now, batch_id=batch_id)
+                    res_net = _guarded(collect_network_metrics, ts=now, batch_id=batch_id)
+                    res_dio = _guarded(collect_disk_io_metrics, ts=now, batch_id=batch_id)
+                    res_psi = _guarded(collect_pressure_metrics, ts=now, batch_id=batch_id)
+                    res_doc = _guarded(collectors.store, "docker_metrics", got_doc)
+                    res_dev = _guarded(collect_docker_events, ts=now, batch_id=batch_id)
+                    res_proc = _guarded(collectors.store, "process_metrics", got_proc)
+
+                    if res_cpu: logging.info(f"[Tier 1] {res_cpu}")
+                    if res_mem: logging.info(f"[Tier 1] {res_mem}")
+                    if res_disk: logging.info(f"[Tier 1] {res_disk}")
+                    if res_net: logging.info(f"[Tier 1] {res_net}")
+                    if res_dio: logging.info(f"[Tier 1] {res_dio}")
+                    if res_psi: logging.info(f"[Tier 1] {res_psi}")
+                    if res_doc: logging.info(f"[Tier 1] {res_doc}")
+                    if res_dev: logging.info(f"[Tier 1] {res_dev}")
+                    if res_proc: logging.info(f"[Tier 1] {res_proc}")
+
+                    # [Tier 2] 상태/환경 정보 (60초 주기: 10초 * 6)
+                    if tier2:
+                        res_run = _guarded(collect_runtime_status, ts=now, batch_id=batch_id)
+                        res_auth = _guarded(store_auth_logs, now, batch_id, auth_rows)
+                        res_sys = _guarded(collectors.store, "system_events", got_sys)
+                        res_cf = _guarded(store_cloudflare_status, now, batch_id, cf_rows)
+
+                        if res_run: logging.info(f"[Tier 2] {res_run}")
+                        if res_auth: logging.info(f"[Tier 2] {res_auth}")
+                        if res_sys: logging.info(f"[Tier 2] {res_sys}")
+                        if res_cf: logging.info(f"[Tier 2] {res_cf}")
+            except Exception as e:
+                # 최종 커밋 실패: 등록된 on_rollback 후처리로 커서/버퍼가 되돌려졌으므로 다음 틱에 다시 저장
+                logging.error(f"틱 배치 커밋 실패: {e}")
+
             # ------------------------------------------------------------------
             # [Tier 3] 저빈도/통계 데이터 (1시간 주기: 10초 * 360)
             # 디스크 부하 방지 및 예측용 장기 데이터
             # ------------------------------------------------------------------
             if count_t3 % 360 == 0:
-                # TODO: Tier 3 장기 통계 수집기 연결 (예: 월간 추세 집계 등)
-                logging.info(f"[Tier 3] Skip (Placeholder)")
-                pass
+                res_ret = _guarded(apply_retention)
+                if res_ret: logging.info(f"[Tier 3] {res_ret}")
+                stats = command_stats()
+                if stats:
+                    logging.info("[Tier 3] 외부 명령 통계: " + ", ".join(
+                        f"{name}(n={s['count']}, fail={s['failures']}, timeout={s['timeouts']}, "
+                        f"avg={s['avg_ms']}ms, max={s['max_ms']}ms)"
+                        for name, s in stats.items()
+                    ))
             
             # 카운터 관리 (오버플로우 방지)
             count_t2 += 1
@@ -76,9 +142,18 @@ def main():
             if count_t2 >= 60: count_t2 = 0
             if count_t3 >= 3600: count_t3 = 0 # 10시간 주기까지 커버 가능
             
-            time.sleep(10)
+            next_tick += 10
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # 한 틱 이상 밀렸으면 따라잡기 위해 몰아서 돌지 않고 기준을 현재로 재설정
+                next_tick = time.monotonic()
+                delay = 0
+            time.sleep(delay)
             
     except KeyboardInterrupt:
+        stop_runtime_monitors()
+        stop_docker_events()
+        collectors.stop()
         logging.info("에이전트 종료")
     except Exception as e:
         logging.error(f"메인 루프 치명적 오류: {e}")
@@ -0,0 +1,215 @@
+"""
+데이터 소스 상태 추적 (circuit breaker)
+
+Netdata, docker CLI, cloudflared 등 외부 소스가 죽어 있을 때 매 틱마다 타임아웃을 기다리지 않도록
+소스별로 연속 실패를 세어 일정 횟수를 넘으면 차단(open)합니다.
+- open  : 호출 없이 즉시 실패 처리 (마이크로초 단위 비용)
+- 재시도 : 지수 백오프 간격으로 한 번씩만 시험 호출(half-open), 성공하면 정상(closed) 복귀
+- 시험 호출 결과가 SOURCE_PROBE_TIMEOUT 안에 기록되지 않으면(호출 측이 놓친 예외 등) 실패로 보고 다시 open
+- 상태 전이는 ops_events.system_events(event_type='source_health')에 기록합니다.
+- 워커 프로세스(src.common.workers)에서는 메인 프로세스의 상태를 요청마다 받아(load_states) 판단만 하고,
+  상태 변화(allow/성공/실패)는 기록해 두었다가(drain_outcomes) 결과와 함께 돌려보내 메인 프로세스가 적용합니다.
+  (apply_outcomes) → 차단 상태와 source_health 이벤트는 항상 메인 프로세스 한 곳에서 관리됩니다.
+
+사용:
+    netdata = get_source("netdata")
+    if not netdata.allow():
+        return None
+    try:
+        ...
+        netdata.record_success()
+    except Exception as e:
+        netdata.record_failure(e)
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from src.database.connection import SessionLocal
+from src.modules.events.models import SystemEvent
+
+logger = logging.getLogger("HEALTH")
+
+FAILURE_THRESHOLD = int(os.getenv("SOURCE_FAILURE_THRESHOLD", "3"))
+BASE_BACKOFF = float(os.getenv("SOURCE_BASE_BACKOFF", "10"))
+MAX_BACKOFF = float(os.getenv("SOURCE_MAX_BACKOFF", "600"))
+# half-open 시험 호출의 결과를 기다리는 최대 시간 (초)
+PROBE_TIMEOUT = float(os.getenv("SOURCE_PROBE_TIMEOUT", "60"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_SOURCES = {}
+_REGISTRY_LOCK = threading.Lock()
+# 워커 프로세스에서만 사용: [(동작, 소스명, 오류)] (None이면 일반 모드)
+_OUTCOMES = None
+
+
+def _capture(action, name, error=None):
+    if _OUTCOMES is not None:
+        _OUTCOMES.append((action, name, None if error is None else str(error)[:300]))
+
+
+class SourceHealth:
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, base_backoff=BASE_BACKOFF, max_backoff=MAX_BACKOFF,
+                 probe_timeout=PROBE_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.backoff = base_backoff
+        self.next_probe = 0.0
+        self.probe_deadline = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        호출해도 되는지 여부. open 상태에서 백오프가 끝났으면 시험 호출 1회를 허용합니다.
+        결과 없이 probe_timeout이 지난 시험 호출은 실패로 보고 백오프를 늘려 다시 open 합니다.
+        """
+        if self.state == CLOSED:
+            return True
+        expired = False
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN and now >= self.probe_deadline:
+                self.state = OPEN
+                self.failures += 1
+                self.last_error = "시험 호출 결과 없음 (시간 초과)"
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self.next_probe = now + self.backoff
+                expired = True
+            elif self.state == OPEN and now >= self.next_probe:
+                self.state = HALF_OPEN
+                self.probe_deadline = now + self.probe_timeout
+                _capture("allow", self.name)
+                return True
+        if expired:
+            _capture("allow", self.name)
+            logger.warning(f"[{self.name}] 시험 호출 결과가 {self.probe_timeout:.0f}초 안에 기록되지 않아 "
+                           f"{self.backoff:.0f}초 후 다시 시도")
+        return False
+
+    def record_success(self):
+        _capture("success", self.name)
+        if self.state == CLOSED and self.failures == 0:
+            return
+        with self._lock:
+            previous = self.state
+            self.state = CLOSED
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.last_error = None
+        if previous != CLOSED:
+            self._transition(previous, CLOSED, "복구됨")
+
+    def record_failure(self, error=None):
+        _capture("failure", self.name, error)
+        with self._lock:
+            previous = self.state
+            self.failures += 1
+            self.last_error = str(error)[:300] if error else None
+            if previous == HALF_OPEN:
+                # 시험 호출 실패: 백오프 두 배로 다시 차단
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+            elif previous != CLOSED or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.next_probe = time.monotonic() + self.backoff
+        if previous == CLOSED:
+            self._transition(previous, OPEN, f"연속 {self.failures}회 실패, {self.backoff:.0f}초 후 재시도: {self.last_error}")
+        else:
+            logger.info(f"[{self.name}] 재시도 실패, {self.backoff:.0f}초 후 다시 시도")
+
+    def _transition(self, before, after, reason):
+        if _OUTCOMES is not None:
+            # 워커: 메인 프로세스가 apply_outcomes()로 같은 전이를 다시 일으켜 기록함
+            return
+        log = logger.warning if after == OPEN else logger.info
+        log(f"[{self.name}] 소스 상태 {before} → {after} ({reason})")
+        db = SessionLocal()
+        try:
+            db.add(SystemEvent(
+                ts=datetime.now(),
+                event_type="source_health",
+                severity="WARNING" if after == OPEN else "NOTICE",
+                source=f"health:{self.name}",
+                message=f"{self.name}: {before} → {after} ({reason})",
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"소스 상태 이벤트 저장 중 오류 발생: {e}")
+        finally:
+            db.close()
+
+
+def get_source(name, **kwargs):
+    source = _SOURCES.get(name)
+    if source is None:
+        with _REGISTRY_LOCK:
+            source = _SOURCES.setdefault(name, SourceHealth(name, **kwargs))
+    return source
+
+
+def health_snapshot():
+    """
+    {소스명: (상태, 연속 실패 수, 마지막 오류)}
+    """
+    return {name: (s.state, s.failures, s.last_error) for name, s in _SOURCES.items()}
+
+
+def export_states():
+    """
+    워커에 넘길 전체 소스 상태. time.monotonic()은 프로세스 간 같은 시계(CLOCK_MONOTONIC)라 그대로 전달합니다.
+    """
+    return {
+        name: (s.state, s.failures, s.backoff, s.next_probe, s.probe_deadline, s.last_error)
+        for name, s in list(_SOURCES.items())
+    }
+
+
+def load_states(states):
+    """
+    (워커) 메인 프로세스의 상태를 반영하고 이후 상태 변화를 기록하기 시작합니다.
+    """
+    global _OUTCOMES
+    _OUTCOMES = []
+    for name, (state, failures, backoff, next_probe, probe_deadline, last_error) in states.items():
+        source = get_source(name)
+        with source._lock:
+            source.state = state
+            source.failures = failures
+            source.backoff = backoff
+            source.next_probe = next_probe
+            source.probe_deadline = probe_deadline
+            source.last_error = last_error
+
+
+def drain_outcomes():
+    """
+    (워커) load_states() 이후 기록된 상태 변화 목록을 꺼냅니다.
+    """
+    global _OUTCOMES
+    outcomes, _OUTCOMES = _OUTCOMES or [], []
+    return outcomes
+
+
+def apply_outcomes(outcomes):
+    """
+    (메인) 워커에서 일어난 상태 변화를 같은 순서로 다시 적용합니다. 전이 이벤트는 여기서 기록됩니다.
+    """
+    for action, name, error in outcomes or ():
+        source = get_source(name)
+        if action == "allow":
+            source.allow()
+        elif action == "success":
+            source.record_success()
+        elif action == "failure":
+            source.record_failure(error)
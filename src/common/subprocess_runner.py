@@ -0,0 +1,222 @@
+"""
+공용 외부 명령 실행 모듈
+
+모든 수집기의 외부 명령(last, journalctl, docker 등)을 이 모듈을 통해 실행합니다.
+- 명령마다 데드라인을 두고, 넘기면 프로세스 그룹 전체를 SIGKILL 합니다. (메인 루프 정지 방지)
+- stdout은 한 번에 버퍼링하지 않고 줄 단위로 흘려보냅니다. (stream_command)
+- 동시에 실행되는 외부 명령 수를 세마포어로 제한합니다. (스레드 수집기 포함)
+- 명령별 실행 횟수/실패/타임아웃/지연 시간을 메모리에 기록합니다. (command_stats)
+"""
+import logging
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger("COMMAND")
+
+DEFAULT_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "10"))
+MAX_CONCURRENT_COMMANDS = int(os.getenv("MAX_CONCURRENT_COMMANDS", "4"))
+# 이 시간(초)을 넘기면 느린 명령으로 경고
+SLOW_COMMAND_SECONDS = float(os.getenv("SLOW_COMMAND_SECONDS", "3"))
+# stderr는 에러 메시지 용도이므로 앞부분만 보관
+MAX_STDERR_BYTES = 64 * 1024
+READ_CHUNK = 64 * 1024
+
+_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_COMMANDS)
+_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+
+class CommandError(Exception):
+    def __init__(self, result, message=None):
+        super().__init__(message or f"'{result.name}' 종료 코드 {result.returncode}: {result.stderr.strip()[:300]}")
+        self.result = result
+
+
+class CommandTimeout(CommandError):
+    def __init__(self, result):
+        super().__init__(result, f"'{result.name}' 명령이 {result.timeout}초 안에 끝나지 않아 강제 종료했습니다.")
+
+
+class CommandResult:
+    __slots__ = ("cmd", "name", "timeout", "returncode", "stdout", "stderr", "timed_out", "duration")
+
+    def __init__(self, cmd, name, timeout):
+        self.cmd = cmd
+        self.name = name
+        self.timeout = timeout
+        self.returncode = None
+        self.stdout = ""
+        self.stderr = ""
+        self.timed_out = False
+        self.duration = 0.0
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+def _record(result):
+    with _STATS_LOCK:
+        s = _STATS.setdefault(result.name, {"count": 0, "failures": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = result.duration * 1000
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        if result.timed_out:
+            s["timeouts"] += 1
+        elif result.returncode != 0:
+            s["failures"] += 1
+    if result.duration >= SLOW_COMMAND_SECONDS:
+        logger.warning(f"느린 외부 명령: {result.name} {result.duration:.2f}s")
+
+
+def _execute(cmd, timeout, result):
+    """
+    명령을 실행하며 stdout을 줄 단위로 yield 합니다. 결과는 result에 채워집니다.
+    소비 측이 중간에 멈추거나(break) 예외가 나도 finally에서 프로세스를 정리합니다.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    proc = None
+    acquired = False
+    try:
+        # 동시 실행 제한: 슬롯을 기다리는 시간도 데드라인에 포함
+        acquired = _SLOTS.acquire(timeout=max(deadline - time.monotonic(), 0))
+        if not acquired:
+            result.timed_out = True
+            return
+
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        sel = selectors.DefaultSelector()
+        sel.register(proc.stdout, selectors.EVENT_READ, "stdout")
+        sel.register(proc.stderr, selectors.EVENT_READ, "stderr")
+        partial = b""
+        stderr = bytearray()
+
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                result.timed_out = True
+                break
+            for key, _ in sel.select(timeout=remaining):
+                chunk = os.read(key.fd, READ_CHUNK)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    continue
+                if key.data == "stderr":
+                    if len(stderr) < MAX_STDERR_BYTES:
+                        stderr += chunk[:MAX_STDERR_BYTES - len(stderr)]
+                    continue
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                for line in lines:
+                    yield line.decode("utf-8", "replace")
+        sel.close()
+
+        if result.timed_out:
+            _kill_group(proc)
+        else:
+            if partial:
+                yield partial.decode("utf-8", "replace")
+            try:
+                proc.wait(timeout=max(deadline - time.monotonic(), 0.1))
+            except subprocess.TimeoutExpired:
+                result.timed_out = True
+                _kill_group(proc)
+        result.stderr = stderr.decode("utf-8", "replace")
+    finally:
+        if proc is not None:
+            if proc.poll() is None:
+                _kill_group(proc)
+            proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+            result.returncode = proc.returncode
+        if acquired:
+            _SLOTS.release()
+        result.duration = time.monotonic() - started
+        _record(result)
+
+
+def stream_command(cmd, timeout=DEFAULT_TIMEOUT, name=None, check=True):
+    """
+    stdout을 줄 단위로 yield 합니다. 전부 소비한 뒤 실패/타임아웃이면 CommandError/CommandTimeout.
+    실행 파일이 없으면 FileNotFoundError가 그대로 전달됩니다.
+    """
+    result = CommandResult(cmd, name or cmd[0], timeout)
+    yield from _execute(cmd, timeout, result)
+    if check:
+        if result.timed_out:
+            raise CommandTimeout(result)
+        if result.returncode != 0:
+            raise CommandError(result)
+
+
+def run_command(cmd, timeout=DEFAULT_TIMEOUT, name=None, check=False):
+    """
+    출력을 모아 CommandResult로 반환합니다. (출력이 작은 명령용)
+    """
+    result = CommandResult(cmd, name or cmd[0], timeout)
+    result.stdout = "\n".join(_execute(cmd, timeout, result))
+    if check:
+        if result.timed_out:
+            raise CommandTimeout(result)
+        if result.returncode != 0:
+            raise CommandError(result)
+    return result
+
+
+def drain_stats():
+    """
+    누적 원시 통계를 꺼내고 비웁니다. (워커 프로세스 → 메인 프로세스 merge_stats()로 전달)
+    """
+    global _STATS
+    with _STATS_LOCK:
+        stats, _STATS = _STATS, {}
+    return stats
+
+
+def merge_stats(stats):
+    """
+    다른 프로세스에서 꺼낸 원시 통계를 합칩니다.
+    """
+    with _STATS_LOCK:
+        for name, other in (stats or {}).items():
+            s = _STATS.setdefault(name, {"count": 0, "failures": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+            for key in ("count", "failures", "timeouts", "total_ms"):
+                s[key] += other[key]
+            s["max_ms"] = max(s["max_ms"], other["max_ms"])
+
+
+def command_stats():
+    """
+    명령별 누적 통계 {name: {count, failures, timeouts, avg_ms, max_ms}}
+    """
+    with _STATS_LOCK:
+        return {
+            name: {
+                "count": s["count"],
+                "failures": s["failures"],
+                "timeouts": s["timeouts"],
+                "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for name, s in _STATS.items()
+        }
@@ -0,0 +1,252 @@
+"""
+수집기 워커 프로세스 (WORKER_COLLECTORS)
+
+파싱 부하가 큰 수집기(docker stats, journal, /proc 스캔)를 별도 프로세스에서 실행해
+메인 루프의 GIL 경합과 Tier 1 타이밍 지연을 없애고 여러 코어를 사용합니다.
+
+- 각 수집기는 sample 단계(외부 명령/파일 읽기 + 파싱, DB 접근 없음)와
+  store 단계(DB 저장 + 분석 파이프라인 전달)로 나뉘어 있습니다.
+  워커는 sample만 실행하고, 결과(컬럼 dict 목록)를 Pipe로 돌려받아 메인 프로세스가 store 합니다.
+  → DB 쓰기와 publish_samples()는 항상 메인 프로세스 한 곳에서 일어납니다.
+- 소스 차단 상태(src.common.health)는 요청과 함께 워커에 보내고, 워커에서 일어난 상태 변화와
+  외부 명령 통계는 결과와 함께 돌려받아 메인 프로세스에 적용합니다. (command_stats()에 워커 명령도 포함)
+- 틱 시작 시 submit()으로 요청만 보내고 다른 작업을 한 뒤 receive()로 결과를 받으므로
+  워커 작업은 메인 루프와 병렬로 진행됩니다. store()는 받은 결과를 저장하는 단계로,
+  메인 루프는 receive()를 배치 쓰기(write_batch) 밖에서, store()를 안에서 호출해 대기 중에 쓰기 잠금을 잡지 않습니다.
+- 결과가 WORKER_RESULT_TIMEOUT 안에 오지 않으면 이번 틱은 건너뛰고(워커는 계속 작업),
+  늦게 도착한 결과는 원래 ts/batch_id로 다음 collect() 때 저장합니다.
+  메인 루프는 틱마다 데드라인 하나(deadline)를 잡아 모든 워커가 나눠 쓰므로,
+  워커 수와 무관하게 틱당 대기는 최대 WORKER_RESULT_TIMEOUT 입니다.
+- 워커가 죽거나(EOF), WORKER_HUNG_TIMEOUT 동안 응답이 없거나, 최대 RSS가 WORKER_MAX_RSS_MB를 넘으면
+  프로세스를 종료하고 다시 띄웁니다. (수집기 상태는 새 워커에서 처음부터 다시 쌓임)
+
+설정: WORKER_COLLECTORS="docker_metrics,process_metrics,system_events" (기본: 비어 있음 = 모두 메인 프로세스에서 실행)
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from collections import namedtuple
+from src.common import health, subprocess_runner
+
+logger = logging.getLogger("WORKER")
+
+WORKER_COLLECTORS = [n.strip() for n in os.getenv("WORKER_COLLECTORS", "").split(",") if n.strip()]
+WORKER_RESULT_TIMEOUT = float(os.getenv("WORKER_RESULT_TIMEOUT", "5"))
+WORKER_HUNG_TIMEOUT = float(os.getenv("WORKER_HUNG_TIMEOUT", "120"))
+WORKER_MAX_RSS_MB = float(os.getenv("WORKER_MAX_RSS_MB", "512"))
+
+# module: 수집기 모듈, sample/store/collect: 함수 이름, context: 요청마다 메인 프로세스 상태를 넘길 함수 이름
+CollectorTask = namedtuple("CollectorTask", ["module", "sample", "store", "collect", "context"], defaults=[None])
+
+TASKS = {
+    "docker_metrics": CollectorTask(
+        "src.modules.metrics.docker_task", "sample_docker_metrics", "store_docker_metrics", "collect_docker_metrics",
+    ),
+    "process_metrics": CollectorTask(
+        "src.modules.metrics.process_task", "sample_process_metrics", "store_process_metrics", "collect_process_metrics",
+    ),
+    "system_events": CollectorTask(
+        "src.modules.events.system_event_task", "sample_system_events", "store_system_events", "collect_system_events",
+        "journal_context",
+    ),
+}
+
+
+def _resolve(task, attr):
+    return getattr(importlib.import_module(task.module), getattr(task, attr))
+
+
+def _max_rss_mb():
+    # Linux ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_main(conn, name):
+    """
+    워커 프로세스 진입점. 요청 (ts, batch_id, context, 소스 상태)를 받아
+    (상태, ts, batch_id, sample 결과, RSS, 소스 상태 변화, 명령 통계)를 돌려줍니다.
+    """
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s [%(name)s/{name}] %(message)s')
+    sample = _resolve(TASKS[name], "sample")
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        ts, batch_id, context, states = request
+        health.load_states(states)
+        try:
+            status, payload = "ok", sample(ts, batch_id, **context)
+        except Exception as e:
+            status, payload = "error", f"{type(e).__name__}: {e}"
+        conn.send((status, ts, batch_id, payload, _max_rss_mb(),
+                   health.drain_outcomes(), subprocess_runner.drain_stats()))
+
+
+class CollectorWorker:
+    """
+    수집기 하나를 담당하는 워커 프로세스와 감독 로직
+    """
+
+    # fork 대신 spawn: 메인 프로세스의 DB 커넥션 풀/스레드(tmux, docker events)를 물려받지 않음
+    _ctx = multiprocessing.get_context("spawn")
+
+    def __init__(self, name):
+        self.name = name
+        self.task = TASKS[name]
+        self.store = _resolve(self.task, "store")
+        self.context = _resolve(self.task, "context") if self.task.context else None
+        self.process = None
+        self.conn = None
+        self.busy_since = None
+        self.restarts = 0
+
+    def start(self):
+        parent, child = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_worker_main, args=(child, self.name), name=f"worker-{self.name}", daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+        self.busy_since = None
+        logger.info(f"[{self.name}] 워커 시작 (pid={self.process.pid})")
+
+    def stop(self, timeout=5):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        self.process = None
+
+    def restart(self, reason):
+        self.restarts += 1
+        logger.warning(f"[{self.name}] 워커 재시작 ({reason}, 누적 {self.restarts}회)")
+        self.stop(timeout=1)
+        self.start()
+
+    def submit(self, ts, batch_id):
+        """
+        요청 전송 (결과를 기다리지 않음). 이전 요청이 아직 처리 중이면 보내지 않습니다.
+        """
+        if self.process is None or not self.process.is_alive():
+            self.restart("프로세스 종료됨")
+        if self.busy_since is not None:
+            if time.monotonic() - self.busy_since > WORKER_HUNG_TIMEOUT:
+                self.restart(f"{WORKER_HUNG_TIMEOUT:.0f}초 동안 응답 없음")
+            else:
+                return False
+        context = self.context() if self.context else {}
+        try:
+            self.conn.send((ts, batch_id, context, health.export_states()))
+        except (BrokenPipeError, OSError) as e:
+            self.restart(f"요청 전송 실패: {e}")
+            return False
+        self.busy_since = time.monotonic()
+        return True
+
+    def receive(self, timeout=WORKER_RESULT_TIMEOUT):
+        """
+        결과를 받아 (ts, batch_id, payload)로 반환합니다. 시간 내 결과가 없거나 실패하면 None.
+        """
+        if self.busy_since is None:
+            return None
+        try:
+            if not self.conn.poll(max(timeout, 0)):
+                logger.warning(f"[{self.name}] 결과 대기 시간 안에 결과 없음, 이번 주기 건너뜀")
+                return None
+            status, ts, batch_id, payload, rss_mb, outcomes, stats = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.restart(f"워커 비정상 종료: {e!r}")
+            return None
+        self.busy_since = None
+        health.apply_outcomes(outcomes)
+        subprocess_runner.merge_stats(stats)
+
+        if rss_mb > WORKER_MAX_RSS_MB:
+            # 결과는 저장하고 다음 요청 전에 새 프로세스로 교체
+            self.restart(f"RSS {rss_mb:.0f}MB > {WORKER_MAX_RSS_MB:.0f}MB")
+        if status != "ok":
+            logger.error(f"[{self.name}] 워커 수집 중 오류 발생: {payload}")
+            return None
+        return ts, batch_id, payload
+
+    def collect(self, timeout=WORKER_RESULT_TIMEOUT):
+        """
+        결과를 받아 메인 프로세스에서 store 단계를 실행합니다. 시간 내 결과가 없으면 None.
+        """
+        received = self.receive(timeout)
+        if received is None:
+            return None
+        return self.store(*received)
+
+
+class CollectorPool:
+    """
+    WORKER_COLLECTORS에 지정된 수집기는 워커에서, 나머지는 기존처럼 메인 프로세스에서 실행합니다.
+    """
+
+    def __init__(self, names=WORKER_COLLECTORS):
+        self.workers = {}
+        for name in names:
+            if name not in TASKS:
+                logger.warning(f"워커 모드를 지원하지 않는 수집기 무시: {name} (가능: {', '.join(TASKS)})")
+                continue
+            self.workers[name] = CollectorWorker(name)
+
+    def start(self):
+        for worker in self.workers.values():
+            worker.start()
+        return self
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
+
+    def submit(self, name, ts, batch_id):
+        worker = self.workers.get(name)
+        if worker is not None:
+            worker.submit(ts, batch_id)
+
+    def receive(self, name, ts, batch_id, deadline=None):
+        """
+        sample 단계 결과 (ts, batch_id, payload)를 반환합니다. (DB 접근 없음)
+        워커 수집기면 워커 결과를 받고, 아니면 메인 프로세스에서 바로 sample을 실행합니다.
+        deadline(time.monotonic() 기준)이 주어지면 남은 시간만 기다립니다. (틱당 대기 합계 제한)
+        """
+        worker = self.workers.get(name)
+        if worker is not None:
+            if deadline is None:
+                return worker.receive()
+            return worker.receive(deadline - time.monotonic())
+        task = TASKS[name]
+        context = _resolve(task, "context")() if task.context else {}
+        try:
+            return ts, batch_id, _resolve(task, "sample")(ts, batch_id, **context)
+        except Exception as e:
+            logger.error(f"[{name}] 수집 중 오류 발생: {e}")
+            return None
+
+    def store(self, name, received):
+        """
+        receive() 결과를 저장합니다.
+        """
+        if received is None:
+            return None
+        return _resolve(TASKS[name], "store")(*received)
+
+    def collect(self, name, ts, batch_id):
+        """
+        워커 수집기면 결과를 받아 저장, 아니면 메인 프로세스에서 바로 수집합니다.
+        """
+        return self.store(name, self.receive(name, ts, batch_id))
@@ -0,0 +1,121 @@
+"""
+인덱스 전략 검증용 쿼리 벤치마크
+
+실행: python -m src.database.benchmark [--hours 1] [--repeat 5]
+
+대표적인 조회 패턴(엔티티별 시간 범위 조회, 전체 시간 범위 스캔)을
+EXPLAIN (ANALYZE, BUFFERS)로 실행해 실행 시간/사용 인덱스/버퍼 접근량과
+테이블·인덱스 크기를 출력합니다. 마이그레이션 전후로 실행하여 비교합니다.
+"""
+import argparse
+import json
+import statistics
+from sqlalchemy import text
+from src.database.connection import engine
+
+# (이름, SQL) - :since 파라미터는 "현재 - N시간"으로 바인딩됨
+BENCH_QUERIES = [
+    (
+        "docker: 컨테이너 X 최근 범위",
+        """
+        SELECT ts, cpu_percent, mem_percent
+        FROM ops_metrics.docker_metrics
+        WHERE container_name = (SELECT container_name FROM ops_metrics.docker_metrics ORDER BY id DESC LIMIT 1)
+          AND ts >= :since
+        ORDER BY ts
+        """,
+    ),
+    (
+        "disk: 마운트 / 최근 범위",
+        """
+        SELECT ts, disk_percent
+        FROM ops_metrics.metrics_disk
+        WHERE mount = '/' AND ts >= :since
+        ORDER BY ts
+        """,
+    ),
+    (
+        "network: 인터페이스 X 최근 범위",
+        """
+        SELECT ts, rx_rate_bps, tx_rate_bps
+        FROM ops_metrics.metrics_network
+        WHERE interface = (SELECT interface FROM ops_metrics.metrics_network ORDER BY id DESC LIMIT 1)
+          AND ts >= :since
+        ORDER BY ts
+        """,
+    ),
+    (
+        "cpu: 전체 시간 범위 집계",
+        """
+        SELECT date_trunc('minute', ts) AS bucket, AVG(cpu_percent)
+        FROM ops_metrics.metrics_cpu
+        WHERE ts >= :since
+        GROUP BY 1
+        """,
+    ),
+    (
+        "tmux: 세션 X 최근 범위",
+        """
+        SELECT ts, attached, windows
+        FROM ops_runtime.tmux_sessions
+        WHERE session_name = (SELECT session_name FROM ops_runtime.tmux_sessions ORDER BY id DESC LIMIT 1)
+          AND ts >= :since
+        ORDER BY ts
+        """,
+    ),
+]
+
+SIZE_SQL = """
+SELECT n.nspname || '.' || c.relname AS name,
+       CASE c.relkind WHEN 'i' THEN 'index' ELSE 'table' END AS kind,
+       pg_relation_size(c.oid) AS bytes
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname IN ('ops_metrics', 'ops_events', 'ops_runtime')
+  AND c.relkind IN ('r', 'i')
+ORDER BY n.nspname, c.relkind DESC, c.relname;
+"""
+
+
+def _collect_plan_info(node, acc):
+    """플랜 트리를 순회하며 스캔 노드 종류와 사용 인덱스를 수집"""
+    node_type = node.get("Node Type", "")
+    if "Scan" in node_type:
+        acc.append(f"{node_type}({node.get('Index Name') or node.get('Relation Name', '?')})")
+    for child in node.get("Plans", []):
+        _collect_plan_info(child, acc)
+    return acc
+
+
+def run_benchmark(hours=1, repeat=5):
+    with engine.connect() as conn:
+        since = conn.execute(text(f"SELECT now() - interval '{int(hours)} hours'")).scalar()
+        print(f"=== 쿼리 벤치마크 (범위: 최근 {hours}시간, 반복 {repeat}회) ===")
+        for name, sql in BENCH_QUERIES:
+            timings = []
+            plan_info = []
+            buffers = 0
+            for _ in range(repeat):
+                row = conn.execute(
+                    text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), {"since": since}
+                ).scalar()
+                plan = (json.loads(row) if isinstance(row, str) else row)[0]
+                timings.append(plan["Execution Time"])
+                plan_info = _collect_plan_info(plan["Plan"], [])
+                buffers = plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0)
+            print(
+                f"- {name}: median {statistics.median(timings):.3f} ms "
+                f"(min {min(timings):.3f}), buffers {buffers}, plan: {', '.join(plan_info)}"
+            )
+
+        print("=== 테이블/인덱스 크기 ===")
+        for name, kind, size in conn.execute(text(SIZE_SQL)):
+            print(f"- [{kind}] {name}: {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인덱스 전략 쿼리 벤치마크")
+    parser.add_argument("--hours", type=int, default=1, help="조회 시간 범위(시간)")
+    parser.add_argument("--repeat", type=int, default=5, help="쿼리당 반복 횟수")
+    args = parser.parse_args()
+    run_benchmark(hours=args.hours, repeat=args.repeat)
@@ -1,4 +1,7 @@
+import logging
 import os
+import threading
+from contextlib import contextmanager
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -6,30 +9,131 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("DB")
+
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "server_agent_db")
 DB_USER = os.getenv("DB_USER", "app_user")
 DB_PASS = os.getenv("DB_PASS", "")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# 저장소 백엔드: postgresql(기본) 또는 sqlite (외부 DB 없는 엣지 호스트용, src/database/sqlite_backend.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "postgresql").lower()
+IS_SQLITE = DB_BACKEND == "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "data/server_agent.db")
+# 한 틱의 수집기 쓰기를 커밋 1회로 묶을지 여부 (write_batch). SQLite는 기본 사용
+DB_BATCH_WRITES = os.getenv("DB_BATCH_WRITES", "true" if IS_SQLITE else "false").lower() == "true"
+
+SCHEMAS = ("ops_metrics", "ops_events", "ops_runtime")
+
+if IS_SQLITE:
+    from src.database.sqlite_backend import create_sqlite_engine
+    engine = create_sqlite_engine(SQLITE_PATH, SCHEMAS)
+else:
+    DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    engine = create_engine(DATABASE_URL)
+
+_BATCH = threading.local()
+
+
+class _BatchedSessionMaker(sessionmaker):
+    """
+    write_batch() 블록 안(같은 스레드)에서 만든 세션은 배치 커넥션에 SAVEPOINT로 합류합니다.
+    세션의 commit()/rollback()은 SAVEPOINT 해제/되돌리기만 하므로 수집기 코드는 그대로 둡니다.
+    """
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def __call__(self, **local_kw):
+        conn = getattr(_BATCH, "conn", None)
+        if conn is not None and "bind" not in local_kw:
+            local_kw.update(bind=conn, join_transaction_mode="create_savepoint")
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _BatchedSessionMaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+@contextmanager
+def write_batch():
+    """
+    블록 안의 수집기 쓰기를 트랜잭션 하나로 묶어 블록 끝에 한 번만 커밋합니다. (DB_BATCH_WRITES)
+    SQLite는 커밋마다 쓰기 잠금 획득 + WAL 프레임 기록이 일어나므로 틱당 커밋 수를 1회로 줄입니다.
+    한 수집기의 실패(rollback)는 자기 SAVEPOINT만 되돌립니다.
+    다른 스레드(tmux/docker 이벤트 구독)의 세션은 합류하지 않고 기존처럼 각자 커밋합니다.
+
+    블록 안에서 세션 commit()은 SAVEPOINT 해제일 뿐 최종 커밋이 아니므로, 커밋 이후에만 확정해야 하는
+    메모리 상태(커서 전진 등)는 on_commit(), 최종 커밋 실패 시 되돌릴 상태는 on_rollback()으로 등록합니다.
+    """
+    if not DB_BATCH_WRITES or getattr(_BATCH, "conn", None) is not None:
+        yield
+        return
+    committed = False
+    with engine.connect() as conn:
+        trans = conn.begin()
+        _BATCH.conn = conn
+        _BATCH.on_commit = []
+        _BATCH.on_rollback = []
+        try:
+            yield
+            trans.commit()
+            committed = True
+        except BaseException:
+            trans.rollback()
+            raise
+        finally:
+            callbacks = _BATCH.on_commit if committed else _BATCH.on_rollback
+            _BATCH.conn = None
+            _BATCH.on_commit = _BATCH.on_rollback = None
+            for fn in callbacks:
+                try:
+                    fn()
+                except Exception as e:
+                    logger.error(f"배치 {'커밋' if committed else '롤백'} 후처리 중 오류 발생: {e}")
+
+
+def on_commit(fn):
+    """
+    write_batch() 안이면 최종 커밋이 성공한 뒤 fn()을 호출하고, 배치 밖이면 바로 호출합니다.
+    (세션 commit() 직후에 호출하는 것을 전제로 함)
+    """
+    callbacks = getattr(_BATCH, "on_commit", None)
+    if callbacks is None:
+        fn()
+    else:
+        callbacks.append(fn)
+
+
+def on_rollback(fn):
+    """
+    write_batch() 안에서 세션 commit()까지 끝났지만 최종 커밋이 실패(롤백)하면 fn()을 호출합니다.
+    배치 밖에서는 세션 commit()이 곧 최종 커밋이므로 아무것도 하지 않습니다.
+    """
+    callbacks = getattr(_BATCH, "on_rollback", None)
+    if callbacks is not None:
+        callbacks.append(fn)
+
+
+def import_all_models():
+    """모든 모델을 임포트해야 Base.metadata가 전체 테이블을 인식함"""
+    from src.modules.metrics.models import (
+        CpuMetric, MemoryMetric, DiskMetric, DiskIoMetric, PressureMetric, NetworkMetric, DockerMetric,
+        ProcessMetric,
+    )
+    from src.modules.events.models import (
+        LoginEvent, SystemEvent, CloudflareTunnel, ContainerEvent, LogTemplate
+    )
+    from src.modules.runtime.models import TmuxSession
+
+
 def initialize_db():
     """스키마 생성 후 테이블 및 뷰 자동 생성"""
     try:
-        # 모든 모델을 임포트해야 Base.metadata.create_all()이 인식함
-        from src.modules.metrics.models import (
-            CpuMetric, MemoryMetric, DiskMetric, NetworkMetric, DockerMetric
-        )
-        from src.modules.events.models import (
-            LoginEvent, SystemEvent, CloudflareTunnel
-        )
-        from src.modules.runtime.models import TmuxSession
-        
+        import_all_models()
+
+        if IS_SQLITE:
+            _initialize_sqlite()
+            return
+
         with engine.connect() as conn:
             # 1. 기존 스키마 삭제 (리셋)
             if os.getenv("RESET_DB", "false").lower() == "true":
@@ -44,10 +148,16 @@ def initialize_db():
             conn.execute(text("CREATE SCHEMA IF NOT EXISTS ops_metrics;"))
             conn.execute(text("CREATE SCHEMA IF NOT EXISTS ops_events;"))
             conn.execute(text("CREATE SCHEMA IF NOT EXISTS ops_runtime;"))
+            # 부분 일치 검색용 trigram 인덱스(gin_trgm_ops)에 필요
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
             conn.commit()
             
             # 3. 테이블 생성
             Base.metadata.create_all(engine)
+
+            # 3-1. 기존 테이블을 현재 모델(인덱스 등)에 맞게 마이그레이션
+            from src.database.migrations import run_migrations
+            run_migrations(conn)
             
             # 4. 인간 친화적인 요약 뷰(View) 생성
             # (1) 자원 통합 요약
@@ -65,7 +175,11 @@ def initialize_db():
                 ROUND(n.rx_rate_bps::numeric / 1024 / 1024, 2) || 'MB/s' AS "네트워크 수신",
                 ROUND(n.tx_rate_bps::numeric / 1024 / 1024, 2) || 'MB/s' AS "네트워크 송신",
                 '[Resource] CPU ' || ROUND(c.cpu_percent::numeric, 2) || '%, RAM ' ||
-                ROUND(m.mem_percent::numeric, 2) || '%, Disk ' || ROUND(d.disk_percent::numeric, 2) || '%' AS "문장 요약"
+                ROUND(m.mem_percent::numeric, 2) || '%, Disk ' || ROUND(d.disk_percent::numeric, 2) || '%' AS "문장 요약",
+                ROUND(io.util_percent::numeric, 2) || '%' AS "디스크 I/O 사용률",
+                ROUND(io.read_bps::numeric / 1024 / 1024, 2) || 'MB/s' AS "디스크 읽기",
+                ROUND(io.write_bps::numeric / 1024 / 1024, 2) || 'MB/s' AS "디스크 쓰기",
+                ROUND(io.await_ms::numeric, 2) || 'ms' AS "디스크 I/O 대기"
             FROM ops_metrics.metrics_cpu c
             LEFT JOIN ops_metrics.metrics_memory m ON m.batch_id = c.batch_id
             LEFT JOIN (
@@ -77,7 +191,15 @@ def initialize_db():
                 SELECT batch_id, SUM(rx_rate_bps) AS rx_rate_bps, SUM(tx_rate_bps) AS tx_rate_bps
                 FROM ops_metrics.metrics_network
                 GROUP BY batch_id
-            ) n ON n.batch_id = c.batch_id;
+            ) n ON n.batch_id = c.batch_id
+            LEFT JOIN (
+                -- 가장 바쁜 디바이스의 사용률/대기 시간 + 전체 처리량
+                SELECT batch_id, MAX(util_percent) AS util_percent,
+                       SUM(read_bps) AS read_bps, SUM(write_bps) AS write_bps,
+                       MAX(GREATEST(read_await_ms, write_await_ms)) AS await_ms
+                FROM ops_metrics.metrics_disk_io
+                GROUP BY batch_id
+            ) io ON io.batch_id = c.batch_id;
             """
             
             # (2) 도커 컨테이너 요약
@@ -105,13 +227,104 @@ def initialize_db():
                 windows AS "윈도우수",
                 CASE WHEN attached THEN '연결됨' ELSE '대기중' END AS "상태",
                 '[Runtime] Tmux: ' || session_name || ' (' || windows || ' windows, attached: ' || 
-                (CASE WHEN attached THEN 'Yes' ELSE 'No' END) || ')' AS "문장 요약"
+                (CASE WHEN attached THEN 'Yes' ELSE 'No' END) || ')' AS "문장 요약",
+                event AS "기록 사유"
             FROM ops_runtime.tmux_sessions;
             """
 
+            # (4) 컨테이너 라이프사이클 이벤트 요약
+            view_container_events_sql = """
+            CREATE OR REPLACE VIEW ops_events.v_container_events_summary AS
+            SELECT
+                id,
+                ts AS "시각",
+                container_name AS "컨테이너",
+                action AS "이벤트",
+                exit_code AS "종료 코드",
+                '[Docker Event] ' || COALESCE(container_name, container_id) || ': ' || action ||
+                COALESCE(' (exit ' || exit_code || ')', '') AS "문장 요약"
+            FROM ops_events.container_events;
+            """
+
+            # (5) 템플릿 인코딩된 시스템 이벤트 원문 복원
+            # template_miner.render()와 같은 규칙: 공백 구분 토큰 중 <*> 자리를 params 순서대로 채움
+            render_template_sql = """
+            CREATE OR REPLACE FUNCTION ops_events.render_template(tpl text, params text)
+            RETURNS text LANGUAGE plpgsql IMMUTABLE AS $$
+            DECLARE
+                tokens text[] := string_to_array(tpl, ' ');
+                args jsonb := COALESCE(params::jsonb, '[]'::jsonb);
+                n int := 0;
+            BEGIN
+                FOR i IN 1 .. COALESCE(array_length(tokens, 1), 0) LOOP
+                    IF tokens[i] = '<*>' THEN
+                        tokens[i] := COALESCE(args->>n, '');
+                        n := n + 1;
+                    END IF;
+                END LOOP;
+                RETURN array_to_string(tokens, ' ');
+            END;
+            $$;
+            """
+
+            view_system_events_sql = """
+            CREATE OR REPLACE VIEW ops_events.v_system_events AS
+            SELECT
+                e.id,
+                e.ts,
+                e.event_type,
+                e.severity,
+                e.source,
+                COALESCE(e.message, ops_events.render_template(t.template, e.params)) AS message,
+                e.template_id,
+                t.template,
+                e.cluster_id
+            FROM ops_events.system_events e
+            LEFT JOIN ops_events.log_templates t ON t.id = e.template_id;
+            """
+
             conn.execute(text(view_resource_sql))
             conn.execute(text(view_docker_sql))
             conn.execute(text(view_runtime_sql))
+            conn.execute(text(view_container_events_sql))
+            conn.execute(text(render_template_sql))
+            conn.execute(text(view_system_events_sql))
+
+            # (6) 시스템 이벤트 전문 검색: INSERT 시점에 복원된 메시지로 tsvector 계산
+            # 로그는 한/영 혼용 + 식별자 위주이므로 형태소 분석 없는 'simple' 설정 사용
+            search_trigger_sql = """
+            CREATE OR REPLACE FUNCTION ops_events.system_events_search_update()
+            RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('simple', COALESCE(NEW.source, '')), 'A') ||
+                    to_tsvector('simple', COALESCE(
+                        NEW.message,
+                        ops_events.render_template(
+                            (SELECT template FROM ops_events.log_templates WHERE id = NEW.template_id),
+                            NEW.params
+                        ),
+                        ''
+                    ));
+                RETURN NEW;
+            END;
+            $$;
+            """
+            trigger_exists = conn.execute(text(
+                "SELECT 1 FROM pg_trigger WHERE tgname = 'trg_system_events_search' "
+                "AND tgrelid = 'ops_events.system_events'::regclass;"
+            )).first() is not None
+            conn.execute(text(search_trigger_sql))
+            if not trigger_exists:
+                conn.execute(text(
+                    "CREATE TRIGGER trg_system_events_search "
+                    "BEFORE INSERT OR UPDATE OF source, message, template_id, params ON ops_events.system_events "
+                    "FOR EACH ROW EXECUTE FUNCTION ops_events.system_events_search_update();"
+                ))
+                # 트리거 도입 이전 행 1회 백필 (UPDATE가 트리거를 거쳐 search_vector를 채움)
+                conn.execute(text(
+                    "UPDATE ops_events.system_events SET message = message WHERE search_vector IS NULL;"
+                ))
             conn.execute(text(
                 "COMMENT ON VIEW ops_metrics.v_resource_summary IS "
                 "'CPU/RAM/디스크/네트워크 요약을 한 줄로 제공하는 통합 뷰. LLM 기본 조회용.';"
@@ -124,8 +337,40 @@ def initialize_db():
                 "COMMENT ON VIEW ops_runtime.v_runtime_summary IS "
                 "'tmux 세션 상태를 요약해서 보여주는 뷰.';"
             ))
+            conn.execute(text(
+                "COMMENT ON VIEW ops_events.v_container_events_summary IS "
+                "'컨테이너 start/die/oom/restart 이벤트를 요약해서 보여주는 뷰.';"
+            ))
+            conn.execute(text(
+                "COMMENT ON VIEW ops_events.v_system_events IS "
+                "'템플릿으로 인코딩된 journal 메시지를 원문으로 복원한 시스템 이벤트 뷰. 메시지 조회는 이 뷰를 사용.';"
+            ))
             conn.commit()
             
             print("✅ DB 초기화 및 모든 요약 뷰(Summary Views) 생성 완료")
     except Exception as e:
         print(f"❌ DB 초기화 실패: {e}")
+
+
+def _initialize_sqlite():
+    """
+    SQLite 백엔드 초기화. 스키마는 연결 시 ATTACH 되어 있으므로 테이블/인덱스/뷰만 만듭니다.
+    (pg_trgm, plpgsql 함수, 검색 트리거, COMMENT ON은 PostgreSQL 전용이라 생략)
+    """
+    from src.database import sqlite_backend
+    from src.database.migrations import run_migrations
+
+    with engine.connect() as conn:
+        if os.getenv("RESET_DB", "false").lower() == "true":
+            print("⚠ WARNING: DB 리셋을 진행합니다...")
+            sqlite_backend.drop_views(conn)
+            Base.metadata.drop_all(conn)
+            conn.commit()
+            print("✅ 기존 테이블 삭제 완료")
+
+        Base.metadata.create_all(conn)
+        conn.commit()
+        run_migrations(conn)
+        sqlite_backend.create_views(conn)
+        conn.commit()
+    print(f"✅ SQLite DB 초기화 및 요약 뷰 생성 완료 ({SQLITE_PATH})")
@@ -0,0 +1,214 @@
+"""
+이력 데이터 컬럼형(Parquet / Arrow IPC) 내보내기
+
+실행 예:
+    python -m src.database.export --out /data/export                       # 전체 테이블, 지난 내보내기 이후분만
+    python -m src.database.export --out /data/export --full --start 2026-01-01 --end 2026-02-01
+    python -m src.database.export --out /data/export --tables ops_metrics.docker_metrics --format arrow
+
+- 서버 사이드 커서(stream_results) + yield_per 청크 단위로 읽어 범위 크기와 무관하게 메모리가 일정합니다.
+- 컬럼 타입은 모델 정의를 따라 Arrow 타입으로 매핑합니다. (timestamp[us, UTC], int64, float64, string, bool)
+  SQLite 백엔드는 timezone 없는(naive) 로컬 시각을 돌려주므로 로컬 시간대로 해석한 뒤 UTC로 기록합니다.
+- 증분 모드에서는 테이블별 마지막 id를 <out>/.export_state.json에 저장하고 다음 실행 때 그 이후만 내보냅니다.
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from src.database.connection import Base, engine, import_all_models
+
+logger = logging.getLogger("EXPORT")
+
+EXPORT_SCHEMAS = ("ops_metrics", "ops_events", "ops_runtime")
+CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+STATE_FILE = ".export_state.json"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("내보내기에는 pyarrow가 필요합니다. (pip install pyarrow)") from e
+    return pyarrow
+
+
+def export_columns(table):
+    """
+    내보낼 컬럼 목록. 검색 인덱스용 파생 컬럼(tsvector)은 제외.
+    """
+    return [c for c in table.columns if not isinstance(c.type, TSVECTOR)]
+
+
+def arrow_schema(table):
+    """
+    SQLAlchemy 테이블 정의 → pyarrow.Schema
+    """
+    pa = _require_pyarrow()
+    fields = []
+    for column in export_columns(table):
+        t = column.type
+        if isinstance(t, DateTime):
+            arrow_type = pa.timestamp("us", tz="UTC") if t.timezone else pa.timestamp("us")
+        elif isinstance(t, (BigInteger, Integer)):
+            arrow_type = pa.int64()
+        elif isinstance(t, Float):
+            arrow_type = pa.float64()
+        elif isinstance(t, Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=not column.primary_key))
+    return pa.schema(fields)
+
+
+def _localize(value):
+    # naive datetime.astimezone()은 값을 로컬 시각으로 보고 시간대를 붙임 (UTC 값으로 오인 방지)
+    if value is not None and value.tzinfo is None:
+        return value.astimezone()
+    return value
+
+
+def export_tables(names=None):
+    """
+    내보낼 테이블 목록. names가 없으면 ops_* 스키마의 모든 테이블.
+    """
+    import_all_models()
+    tables = [t for t in Base.metadata.sorted_tables if t.schema in EXPORT_SCHEMAS]
+    if names:
+        wanted = set(names)
+        tables = [t for t in tables if t.fullname in wanted or t.name in wanted]
+    return tables
+
+
+def _load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def export_table(table, out_dir, fmt="parquet", start=None, end=None, since_id=None, chunk_rows=CHUNK_ROWS):
+    """
+    테이블 하나를 파일 하나로 내보냅니다.
+    반환: (행 수, 마지막 id, 파일 경로 또는 None)
+    """
+    pa = _require_pyarrow()
+    schema = arrow_schema(table)
+
+    columns = export_columns(table)
+    stmt = select(*columns).order_by(table.c.id)
+    if since_id is not None:
+        stmt = stmt.where(table.c.id > since_id)
+    if start is not None:
+        stmt = stmt.where(table.c.ts >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.ts < end)
+
+    table_dir = os.path.join(out_dir, table.fullname)
+    os.makedirs(table_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    path = os.path.join(table_dir, f"{table.name}-{stamp}.{ext}")
+    tmp_path = path + ".part"
+
+    writer = None
+    rows = 0
+    last_id = since_id
+    names = [c.name for c in columns]
+    # timestamp[us, UTC]로 기록할 컬럼 위치
+    aware = {i for i, c in enumerate(columns) if isinstance(c.type, DateTime) and c.type.timezone}
+    try:
+        with engine.connect() as conn:
+            # 서버 사이드 커서: 결과 전체를 클라이언트 메모리에 올리지 않음
+            result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(stmt)
+            for chunk in result.partitions():
+                columns = [
+                    [_localize(v) for v in col] if i in aware else col
+                    for i, col in enumerate(zip(*chunk))
+                ]
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(col, type=schema.field(i).type) for i, col in enumerate(columns)],
+                    schema=schema,
+                )
+                if writer is None:
+                    if fmt == "parquet":
+                        import pyarrow.parquet as pq
+                        writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+                    else:
+                        writer = pa.ipc.new_file(tmp_path, schema)
+                if fmt == "parquet":
+                    writer.write_batch(batch)
+                else:
+                    writer.write(batch)
+                rows += len(chunk)
+                last_id = chunk[-1][names.index("id")]
+    except Exception:
+        # 재시도마다 파일 이름이 달라지므로 실패한 .part 파일을 남기면 계속 쌓임
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if rows == 0:
+        return 0, last_id, None
+    os.replace(tmp_path, path)
+    return rows, last_id, path
+
+
+def export_history(out_dir, tables=None, fmt="parquet", start=None, end=None, incremental=True):
+    """
+    여러 테이블을 내보내고 증분 상태를 갱신합니다. {테이블: (행 수, 파일)}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir) if incremental else {}
+    summary = {}
+    for table in export_tables(tables):
+        since_id = state.get(table.fullname) if incremental else None
+        rows, last_id, path = export_table(table, out_dir, fmt=fmt, start=start, end=end, since_id=since_id)
+        if incremental and last_id is not None:
+            state[table.fullname] = last_id
+            # 테이블마다 저장해 중간 실패 시에도 완료된 테이블은 다시 내보내지 않음
+            _save_state(out_dir, state)
+        summary[table.fullname] = (rows, path)
+        logger.info(f"{table.fullname}: {rows}행 내보냄" + (f" → {path}" if path else ""))
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(message)s')
+    parser = argparse.ArgumentParser(description="이력 데이터를 Parquet/Arrow 파일로 내보내기")
+    parser.add_argument("--out", required=True, help="출력 디렉토리")
+    parser.add_argument("--tables", help="쉼표 구분 테이블 목록 (예: ops_metrics.metrics_cpu,docker_metrics). 기본: 전체")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="시작 시각 (ISO 8601, 포함)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="종료 시각 (ISO 8601, 미포함)")
+    parser.add_argument("--full", action="store_true", help="증분 상태를 무시하고 범위 전체를 내보냄")
+    args = parser.parse_args()
+
+    export_history(
+        args.out,
+        tables=args.tables.split(",") if args.tables else None,
+        fmt=args.format,
+        start=args.start,
+        end=args.end,
+        incremental=not args.full,
+    )
@@ -0,0 +1,117 @@
+"""
+스키마 마이그레이션 모듈
+
+create_all()은 이미 존재하는 테이블의 인덱스/컬럼을 건드리지 않으므로,
+기존 운영 DB를 현재 모델 정의에 맞추는 작업을 여기서 멱등(idempotent)하게 수행합니다.
+모든 단계는 매 기동 시 실행해도 안전해야 합니다.
+"""
+import logging
+from sqlalchemy import inspect, text
+from src.database.connection import Base
+
+logger = logging.getLogger("MIGRATION")
+
+# 시계열 테이블에 컬럼별로 걸려 있던 기존 B-tree 인덱스.
+# BRIN(ts) + (엔티티, ts) 복합 인덱스로 대체되었으므로 제거한다.
+LEGACY_INDEXES = [
+    "ops_metrics.ix_ops_metrics_metrics_cpu_ts",
+    "ops_metrics.ix_ops_metrics_metrics_cpu_batch_id",
+    "ops_metrics.ix_ops_metrics_metrics_memory_ts",
+    "ops_metrics.ix_ops_metrics_metrics_disk_ts",
+    "ops_metrics.idx_disk_mount",
+    "ops_metrics.ix_ops_metrics_metrics_network_ts",
+    "ops_metrics.idx_network_interface",
+    "ops_metrics.ix_ops_metrics_docker_metrics_ts",
+    "ops_metrics.ix_ops_metrics_docker_metrics_batch_id",
+    "ops_metrics.ix_ops_metrics_docker_metrics_container_name",
+    "ops_events.ix_ops_events_login_events_user_name",
+    "ops_events.ix_ops_events_system_events_ts",
+    "ops_events.ix_ops_events_cloudflare_tunnels_ts",
+    "ops_events.ix_ops_events_cloudflare_tunnels_tunnel_name",
+    "ops_runtime.ix_ops_runtime_tmux_sessions_ts",
+    "ops_runtime.ix_ops_runtime_tmux_sessions_batch_id",
+    "ops_runtime.ix_ops_runtime_tmux_sessions_session_name",
+]
+
+
+def migrate_indexes(conn):
+    """
+    기존 단일 컬럼 인덱스를 제거하고 모델에 정의된 BRIN/복합 인덱스를 생성합니다.
+    """
+    for name in LEGACY_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name};"))
+
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # checkfirst: 이미 존재하는 인덱스는 건너뜀 (신규 설치 시 create_all이 먼저 생성)
+            index.create(conn, checkfirst=True)
+            created += 1
+    logger.info(f"인덱스 마이그레이션 완료 (legacy {len(LEGACY_INDEXES)}개 정리, 모델 인덱스 {created}개 확인)")
+
+
+def migrate_columns(conn):
+    """
+    모델에는 있지만 기존 테이블에는 없는 컬럼을 ALTER TABLE ... ADD COLUMN으로 추가합니다.
+    (신규 컬럼은 모두 NULL 허용이므로 기존 행에 영향 없음)
+    """
+    inspector = inspect(conn)
+    # SQLite는 ADD COLUMN IF NOT EXISTS 미지원 (존재 여부는 위에서 이미 확인)
+    if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name, schema=table.schema):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name, schema=table.schema)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(
+                f"ALTER TABLE {table.schema}.{table.name} ADD COLUMN {if_not_exists}{column.name} {col_type};"
+            ))
+            added.append(f"{table.name}.{column.name}")
+    if added:
+        logger.info(f"컬럼 마이그레이션 완료: {', '.join(added)}")
+
+
+def backfill_template_clusters(conn):
+    """
+    cluster_id 도입 이전 템플릿/이벤트 행에 템플릿 그룹 ID를 채웁니다.
+    superseded_by 체인을 거슬러 올라간 최초 템플릿 ID가 그룹 ID. (템플릿 수는 수백 개 수준이라 파이썬에서 계산)
+    """
+    rows = conn.execute(text("SELECT id, superseded_by, cluster_id FROM ops_events.log_templates;")).all()
+    if all(cluster_id is not None for _, _, cluster_id in rows):
+        return
+    parent = {new_id: old_id for old_id, new_id, _ in rows if new_id is not None}
+    known = {template_id: cluster_id for template_id, _, cluster_id in rows}
+
+    def root(template_id):
+        seen = set()
+        while template_id in parent and known.get(template_id) is None and template_id not in seen:
+            seen.add(template_id)
+            template_id = parent[template_id]
+        return known.get(template_id) or template_id
+
+    for template_id, _, cluster_id in rows:
+        if cluster_id is None:
+            conn.execute(
+                text("UPDATE ops_events.log_templates SET cluster_id = :cluster_id WHERE id = :id;"),
+                {"cluster_id": root(template_id), "id": template_id},
+            )
+    conn.execute(text(
+        "UPDATE ops_events.system_events SET cluster_id = "
+        "(SELECT t.cluster_id FROM ops_events.log_templates t WHERE t.id = system_events.template_id) "
+        "WHERE cluster_id IS NULL AND template_id IS NOT NULL;"
+    ))
+    logger.info("템플릿 그룹 ID 백필 완료")
+
+
+def run_migrations(conn):
+    """
+    initialize_db()에서 create_all() 직후 호출됩니다.
+    """
+    migrate_columns(conn)
+    backfill_template_clusters(conn)
+    migrate_indexes(conn)
+    conn.commit()
@@ -0,0 +1,62 @@
+"""
+보존 기간 정리 (RETENTION_DAYS)
+
+ts 컬럼이 있는 모든 시계열 테이블에서 RETENTION_DAYS보다 오래된 행을 삭제합니다. (Tier 3 주기)
+- 한 번에 RETENTION_CHUNK_ROWS행씩 나눠 삭제/커밋해 쓰기 잠금을 오래 잡지 않습니다.
+- log_templates는 ts가 없고 남은 행의 복원에 필요하므로 삭제하지 않습니다.
+- SQLite 백엔드는 삭제 후 incremental_vacuum + WAL 체크포인트로 파일 크기를 줄입니다.
+
+기본값: SQLite 14일, PostgreSQL 0(사용 안 함)
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from src.database.connection import Base, IS_SQLITE, SCHEMAS, engine, import_all_models
+
+logger = logging.getLogger("RETENTION")
+
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "14" if IS_SQLITE else "0"))
+RETENTION_CHUNK_ROWS = int(os.getenv("RETENTION_CHUNK_ROWS", "5000"))
+
+
+def retention_tables():
+    import_all_models()
+    return [t for t in Base.metadata.sorted_tables if t.schema in SCHEMAS and "ts" in t.c]
+
+
+def apply_retention(days=RETENTION_DAYS, now=None):
+    """
+    오래된 행을 삭제하고 요약 문자열을 반환합니다. 비활성(days <= 0)이거나 삭제한 행이 없으면 None.
+    """
+    if days <= 0:
+        return None
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    deleted = {}
+    with engine.connect() as conn:
+        for table in retention_tables():
+            total = 0
+            try:
+                while True:
+                    ids = select(table.c.id).where(table.c.ts < cutoff).limit(RETENTION_CHUNK_ROWS)
+                    count = conn.execute(delete(table).where(table.c.id.in_(ids.scalar_subquery()))).rowcount
+                    conn.commit()
+                    total += count
+                    if count < RETENTION_CHUNK_ROWS:
+                        break
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"{table.fullname} 보존 기간 정리 중 오류 발생: {e}")
+            if total:
+                deleted[table.fullname] = total
+
+    if not deleted:
+        return None
+    if IS_SQLITE:
+        from src.database.sqlite_backend import reclaim_space
+        try:
+            reclaim_space(engine, SCHEMAS)
+        except Exception as e:
+            logger.error(f"SQLite 공간 반환 중 오류 발생: {e}")
+    logger.info(f"보존 기간 정리 완료 ({days:g}일 이전, {sum(deleted.values())}행)")
+    return f"Retention: {days:g}d, " + ", ".join(f"{name}={count}" for name, count in deleted.items())
@@ -0,0 +1,210 @@
+"""
+SQLite 저장소 백엔드 (DB_BACKEND=sqlite)
+
+PostgreSQL을 따로 운영하기 어려운 소형 엣지 호스트용. 외부 서비스 없이 로컬 파일에 기록합니다.
+
+- 스키마 매핑: ops_metrics/ops_events/ops_runtime을 각각 별도 파일로 ATTACH 합니다.
+  (<SQLITE_PATH 확장자 제외>.<스키마>.db) 모델/쿼리의 "스키마.테이블" 이름을 그대로 쓸 수 있고,
+  스키마마다 WAL/체크포인트가 분리되어 대용량 metrics 쓰기가 events 조회를 막지 않습니다.
+- pragma: WAL + synchronous=NORMAL(커밋마다 fsync 없음, 체크포인트 때만), busy_timeout,
+  작은 페이지 캐시(저메모리), auto_vacuum=INCREMENTAL(보존 기간 삭제 후 공간 반환).
+- 트랜잭션: pysqlite의 암묵적 트랜잭션 처리를 끄고 BEGIN을 직접 보냅니다.
+  (SAVEPOINT가 정상 동작해야 connection.write_batch()의 틱 단위 배치 커밋이 가능)
+- PostgreSQL 전용 기능은 건너뜁니다: BRIN/GIN/trigram 인덱스(BRIN은 일반 B-tree로 생성),
+  tsvector 검색 트리거, plpgsql 함수, COMMENT ON. render_template()은 파이썬 함수로 등록합니다.
+- 시각: 수집기가 넣는 값(datetime.now())과 같이 모든 시각을 시간대 없는 로컬 시각으로 저장합니다.
+  server_default=func.now()도 UTC인 CURRENT_TIMESTAMP 대신 로컬 시각으로 컴파일합니다.
+"""
+import os
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+# 음수는 KiB 단위 (기본 8MB/스키마)
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "8192"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "64"))
+SQLITE_WAL_AUTOCHECKPOINT = int(os.getenv("SQLITE_WAL_AUTOCHECKPOINT", "1000"))
+
+
+@compiles(TSVECTOR, "sqlite")
+def _compile_tsvector(type_, compiler, **kw):
+    # search_vector 컬럼은 SQLite에서 채우지 않음 (전문 검색 트리거 없음)
+    return "TEXT"
+
+
+@compiles(functions.now, "sqlite")
+def _compile_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP는 UTC라 수집기가 넣는 로컬 시각과 섞이면 내보내기/조회 시 시간대만큼 어긋남
+    return "datetime('now', 'localtime')"
+
+
+def schema_path(path, schema):
+    base, _ = os.path.splitext(path)
+    return f"{base}.{schema}.db"
+
+
+def _render_template(tpl, params):
+    from src.modules.events.template_miner import render
+    if tpl is None:
+        return None
+    return render(tpl, params or "[]")
+
+
+def create_sqlite_engine(path, schemas):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        # BEGIN/SAVEPOINT를 SQLAlchemy가 직접 제어 (아래 begin 이벤트)
+        dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        for schema in ("main",) + tuple(schemas):
+            if schema != "main":
+                cursor.execute(f"ATTACH DATABASE ? AS {schema}", (schema_path(path, schema),))
+            # auto_vacuum은 테이블 생성 전(새 파일)에만 적용됨
+            cursor.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+            cursor.execute(f"PRAGMA {schema}.journal_mode = WAL")
+            cursor.execute(f"PRAGMA {schema}.synchronous = NORMAL")
+            cursor.execute(f"PRAGMA {schema}.cache_size = -{SQLITE_CACHE_KB}")
+            cursor.execute(f"PRAGMA {schema}.mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}")
+            cursor.execute(f"PRAGMA {schema}.wal_autocheckpoint = {SQLITE_WAL_AUTOCHECKPOINT}")
+        cursor.close()
+        dbapi_conn.create_function("render_template", 2, _render_template, deterministic=True)
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+# ------------------------------------------------------------
+# 요약 뷰 (PostgreSQL 뷰와 같은 이름/컬럼)
+# 뷰 본문은 스키마 없이 테이블 이름만 사용: ATTACH 별칭이 달라도(또는 파일을 직접 열어도) 동작
+# ------------------------------------------------------------
+VIEWS = {
+    "ops_metrics.v_resource_summary": """
+        SELECT
+            c.ts AS "시각",
+            c.batch_id AS "배치 ID",
+            ROUND(c.cpu_percent, 2) || '%' AS "CPU 전체",
+            ROUND(c.cpu_user, 2) || '%' AS "CPU 유저",
+            ROUND(c.cpu_system, 2) || '%' AS "CPU 시스템",
+            ROUND(m.mem_percent, 2) || '%' AS "RAM 사용률",
+            ROUND(m.mem_used_mb, 0) || 'MB / ' || ROUND(m.mem_total_mb, 0) || 'MB' AS "RAM 상세",
+            ROUND(d.disk_percent, 2) || '%' AS "디스크 사용률",
+            ROUND(n.rx_rate_bps / 1024 / 1024, 2) || 'MB/s' AS "네트워크 수신",
+            ROUND(n.tx_rate_bps / 1024 / 1024, 2) || 'MB/s' AS "네트워크 송신",
+            '[Resource] CPU ' || ROUND(c.cpu_percent, 2) || '%, RAM ' ||
+            ROUND(m.mem_percent, 2) || '%, Disk ' || ROUND(d.disk_percent, 2) || '%' AS "문장 요약",
+            ROUND(io.util_percent, 2) || '%' AS "디스크 I/O 사용률",
+            ROUND(io.read_bps / 1024 / 1024, 2) || 'MB/s' AS "디스크 읽기",
+            ROUND(io.write_bps / 1024 / 1024, 2) || 'MB/s' AS "디스크 쓰기",
+            ROUND(io.await_ms, 2) || 'ms' AS "디스크 I/O 대기"
+        FROM metrics_cpu c
+        LEFT JOIN metrics_memory m ON m.batch_id = c.batch_id
+        LEFT JOIN (
+            SELECT batch_id, MAX(disk_percent) AS disk_percent
+            FROM metrics_disk
+            GROUP BY batch_id
+        ) d ON d.batch_id = c.batch_id
+        LEFT JOIN (
+            SELECT batch_id, SUM(rx_rate_bps) AS rx_rate_bps, SUM(tx_rate_bps) AS tx_rate_bps
+            FROM metrics_network
+            GROUP BY batch_id
+        ) n ON n.batch_id = c.batch_id
+        LEFT JOIN (
+            SELECT batch_id, MAX(util_percent) AS util_percent,
+                   SUM(read_bps) AS read_bps, SUM(write_bps) AS write_bps,
+                   MAX(MAX(read_await_ms, write_await_ms)) AS await_ms
+            FROM metrics_disk_io
+            GROUP BY batch_id
+        ) io ON io.batch_id = c.batch_id
+    """,
+    "ops_metrics.v_docker_summary": """
+        SELECT
+            id,
+            ts AS "시각",
+            container_name AS "컨테이너",
+            ROUND(cpu_percent, 2) || '%' AS "CPU",
+            ROUND(mem_percent, 2) || '%' AS "RAM 사용률",
+            ROUND(mem_used_mb, 0) || 'MB' AS "RAM 사용량",
+            '[Docker] ' || container_name || ': ' || ROUND(cpu_percent, 2) || '% CPU, ' ||
+            ROUND(mem_percent, 2) || '% RAM (' || ROUND(mem_used_mb, 0) || 'MB)' AS "문장 요약"
+        FROM docker_metrics
+    """,
+    "ops_runtime.v_runtime_summary": """
+        SELECT
+            id,
+            ts AS "시각",
+            session_name AS "세션명",
+            windows AS "윈도우수",
+            CASE WHEN attached THEN '연결됨' ELSE '대기중' END AS "상태",
+            '[Runtime] Tmux: ' || session_name || ' (' || windows || ' windows, attached: ' ||
+            (CASE WHEN attached THEN 'Yes' ELSE 'No' END) || ')' AS "문장 요약",
+            event AS "기록 사유"
+        FROM tmux_sessions
+    """,
+    "ops_events.v_container_events_summary": """
+        SELECT
+            id,
+            ts AS "시각",
+            container_name AS "컨테이너",
+            action AS "이벤트",
+            exit_code AS "종료 코드",
+            '[Docker Event] ' || COALESCE(container_name, container_id) || ': ' || action ||
+            COALESCE(' (exit ' || exit_code || ')', '') AS "문장 요약"
+        FROM container_events
+    """,
+    # render_template()은 연결 시 등록하는 파이썬 함수 (sqlite3 CLI 등 외부 도구에서는 message가 NULL인 행 복원 불가)
+    "ops_events.v_system_events": """
+        SELECT
+            e.id,
+            e.ts,
+            e.event_type,
+            e.severity,
+            e.source,
+            COALESCE(e.message, render_template(t.template, e.params)) AS message,
+            e.template_id,
+            t.template,
+            e.cluster_id
+        FROM system_events e
+        LEFT JOIN log_templates t ON t.id = e.template_id
+    """,
+}
+
+
+def drop_views(conn):
+    for name in VIEWS:
+        conn.execute(text(f"DROP VIEW IF EXISTS {name};"))
+
+
+def create_views(conn):
+    """
+    SQLite에는 CREATE OR REPLACE VIEW가 없으므로 매번 삭제 후 다시 생성합니다.
+    """
+    drop_views(conn)
+    for name, body in VIEWS.items():
+        conn.execute(text(f"CREATE VIEW {name} AS {body};"))
+
+
+def reclaim_space(engine, schemas):
+    """
+    보존 기간 삭제 후 빈 페이지를 파일 시스템에 반환하고 WAL 파일을 비웁니다.
+    체크포인트는 트랜잭션 밖에서 실행해야 하므로 BEGIN 없이 DBAPI 커넥션으로 직접 실행합니다.
+    """
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for schema in schemas:
+            cursor.execute(f"PRAGMA {schema}.incremental_vacuum").fetchall()
+            cursor.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)").fetchall()
+        cursor.close()
+    finally:
+        raw.close()
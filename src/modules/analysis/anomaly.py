@@ -0,0 +1,182 @@
+"""
+스트리밍 이상 탐지 모듈
+
+시계열(메트릭 × 엔티티)마다 O(1) 메모리 상태만 유지하며 샘플이 들어올 때마다 편차를 계산합니다.
+- ewma: 지수가중 평균/분산 기반 z-score
+- mad : 확률적 중앙값 추정 + 지수가중 절대편차(MAD 근사) 기반 robust z-score
+
+임계값을 넘으면 ops_events.system_events에 event_type='anomaly'로 기록합니다.
+컨테이너/인터페이스가 생겼다 사라져도 상태가 쌓이지 않도록, ANOMALY_IDLE_TICKS 틱 동안
+샘플이 없던 시계열은 제거합니다. (다시 나타나면 워밍업부터 새로 시작)
+"""
+import logging
+import math
+import os
+from src.database.connection import SessionLocal
+from src.modules.events.models import SystemEvent
+
+logger = logging.getLogger("ANOMALY")
+
+ANOMALY_METHOD = os.getenv("ANOMALY_METHOD", "ewma").lower()
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "4.0"))
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.05"))
+# 상태가 안정되기 전(샘플 수 부족)에는 판정하지 않음
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "30"))
+# 같은 시계열에서 연속 알림 방지 (샘플 수)
+ANOMALY_COOLDOWN = int(os.getenv("ANOMALY_COOLDOWN", "30"))
+# 이 틱 수 동안 샘플이 없던 시계열 상태는 제거 (기본 60틱 = 10분)
+ANOMALY_IDLE_TICKS = int(os.getenv("ANOMALY_IDLE_TICKS", "60"))
+
+# 분산이 거의 0인 평탄한 시계열에서 사소한 변화가 이상으로 잡히지 않도록 하는 최소 절대 편차
+MIN_DELTA = {
+    "cpu_percent": 10.0,
+    "cpu_iowait": 5.0,
+    "mem_percent": 5.0,
+    "disk_percent": 2.0,
+    "disk_util_percent": 20.0,
+    "disk_read_await_ms": 20.0,
+    "disk_write_await_ms": 20.0,
+    "psi_cpu_some": 10.0,
+    "psi_memory_some": 5.0,
+    "psi_io_some": 10.0,
+    "load_1min": 1.0,
+    "rx_rate_bps": 1024 * 1024,
+    "tx_rate_bps": 1024 * 1024,
+}
+
+# 1.4826 * MAD ≈ 정규분포 표준편차
+_MAD_SCALE = 1.4826
+
+
+class SeriesState:
+    """
+    시계열 하나의 온라인 통계 상태
+    """
+    __slots__ = ("count", "mean", "var", "median", "mad", "cooldown", "last_tick")
+
+    def __init__(self, value, tick=0):
+        self.count = 1
+        self.mean = value
+        self.var = 0.0
+        self.median = value
+        self.mad = 0.0
+        self.cooldown = 0
+        self.last_tick = tick
+
+    def score(self, value, method):
+        """현재 상태 기준 편차 점수 (업데이트 전 값으로 판정)"""
+        if method == "mad":
+            spread = self.mad * _MAD_SCALE
+            center = self.median
+        else:
+            spread = math.sqrt(self.var)
+            center = self.mean
+        if spread <= 0:
+            return 0.0, center
+        return (value - center) / spread, center
+
+    def update(self, value, alpha):
+        self.count += 1
+        # EWMA 평균/분산 (West, 1979 증분식)
+        diff = value - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1 - alpha) * (self.var + diff * incr)
+        # 확률적 중앙값: 편차 규모(MAD)에 비례한 보폭으로 이동
+        step = alpha * (self.mad if self.mad > 0 else abs(value - self.median))
+        if value > self.median:
+            self.median += step
+        elif value < self.median:
+            self.median -= step
+        self.mad += alpha * (abs(value - self.median) - self.mad)
+
+
+class AnomalyDetector:
+    def __init__(self, method=ANOMALY_METHOD, threshold=ANOMALY_THRESHOLD, alpha=ANOMALY_ALPHA,
+                 warmup=ANOMALY_WARMUP, cooldown=ANOMALY_COOLDOWN, idle_ticks=ANOMALY_IDLE_TICKS):
+        self.method = method
+        self.threshold = threshold
+        self.alpha = alpha
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.idle_ticks = idle_ticks
+        self.series = {}
+        # 틱 = 서로 다른 수집 ts (워커가 늦게 돌려준 이전 ts는 틱으로 세지 않음)
+        self.tick = 0
+        self._last_ts = None
+
+    def advance(self, ts):
+        """
+        새 틱이면 틱 번호를 올리고, idle_ticks마다 한 번 오래된 시계열을 정리합니다. (분할 상환 O(1))
+        """
+        if self._last_ts is not None and ts <= self._last_ts:
+            return
+        self._last_ts = ts
+        self.tick += 1
+        if self.idle_ticks > 0 and self.tick % self.idle_ticks == 0:
+            expired = [k for k, state in self.series.items() if self.tick - state.last_tick > self.idle_ticks]
+            for key in expired:
+                del self.series[key]
+            if expired:
+                logger.info(f"유휴 시계열 {len(expired)}개 상태 제거 (남은 {len(self.series)}개)")
+
+    def observe(self, sample):
+        """
+        샘플 하나를 반영하고, 이상이면 (score, 기준값)을 반환합니다.
+        """
+        if sample.value is None:
+            return None
+        value = float(sample.value)
+        key = (sample.kind, sample.entity, sample.metric)
+        state = self.series.get(key)
+        if state is None:
+            self.series[key] = SeriesState(value, self.tick)
+            return None
+        state.last_tick = self.tick
+
+        result = None
+        if state.cooldown > 0:
+            state.cooldown -= 1
+        elif state.count >= self.warmup:
+            score, center = state.score(value, self.method)
+            if abs(score) >= self.threshold and abs(value - center) >= MIN_DELTA.get(sample.metric, 0.0):
+                state.cooldown = self.cooldown
+                result = (score, center)
+        state.update(value, self.alpha)
+        return result
+
+    def __call__(self, ts, samples):
+        self.advance(ts)
+        anomalies = []
+        for sample in samples:
+            hit = self.observe(sample)
+            if hit:
+                anomalies.append((sample, hit[0], hit[1]))
+        if anomalies:
+            self._write(ts, anomalies)
+
+    def _write(self, ts, anomalies):
+        db = SessionLocal()
+        try:
+            for sample, score, center in anomalies:
+                target = f"{sample.kind} {sample.entity}" if sample.entity else sample.kind
+                db.add(SystemEvent(
+                    ts=ts,
+                    event_type="anomaly",
+                    severity="WARNING",
+                    source=f"anomaly:{sample.kind}",
+                    message=(
+                        f"[{target}] {sample.metric}={sample.value:.2f} "
+                        f"(기준 {center:.2f}, {self.method} score {score:+.1f})"
+                    ),
+                ))
+            db.commit()
+            logger.warning(f"이상 징후 {len(anomalies)}건 기록")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"이상 징후 저장 중 오류 발생: {e}")
+        finally:
+            db.close()
+
+
+detect_anomalies = AnomalyDetector()
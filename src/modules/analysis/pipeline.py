@@ -0,0 +1,36 @@
+"""
+실시간 샘플 파이프라인
+
+수집기가 DB에 저장한 값을 같은 틱 안에서 분석기(이상 탐지, 알림 규칙 등)로 전달합니다.
+분석기는 DB를 다시 조회하지 않고 메모리 상태만으로 판단합니다.
+
+수집기: publish_samples(ts, [Sample("cpu_percent", 42.0), Sample("disk_percent", 91.0, "mount", "/")])
+분석기: register_consumer(fn)  # fn(ts, samples)
+"""
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger("PIPELINE")
+
+# kind: 엔티티 종류 (host / mount / interface / container ...), entity: 엔티티 이름 (host는 None)
+Sample = namedtuple("Sample", ["metric", "value", "kind", "entity"], defaults=["host", None])
+
+_CONSUMERS = []
+
+
+def register_consumer(consumer):
+    if consumer not in _CONSUMERS:
+        _CONSUMERS.append(consumer)
+
+
+def publish_samples(ts, samples):
+    """
+    분석기 오류가 수집기 흐름을 깨지 않도록 consumer별로 예외를 격리합니다.
+    """
+    if not _CONSUMERS or not samples:
+        return
+    for consumer in _CONSUMERS:
+        try:
+            consumer(ts, samples)
+        except Exception as e:
+            logger.error(f"샘플 처리 중 오류 발생 ({getattr(consumer, '__name__', consumer)}): {e}")
@@ -0,0 +1,265 @@
+"""
+알림 규칙 엔진
+
+선언형 규칙을 기동 시 한 번 컴파일해 두고, 수집기가 publish하는 샘플에 대해 증분 평가합니다.
+규칙 상태(조건 충족 시작 시각, firing 여부)는 메모리에만 두며 DB를 조회하지 않습니다.
+
+규칙 문법 (한 줄에 하나, ALERT_RULES는 ';' 구분 / ALERT_RULES_FILE은 줄 단위, '#' 주석):
+    [<kind> <entity>] <metric> <op> <threshold> [for <duration>] [on <kind> <entity>]
+
+    disk_percent > 90 for 5m on mount /
+    container web mem_percent > 80
+    container * cpu_percent >= 95 for 1m
+    load_1min > 8 for 10m on host
+
+kind/entity를 생략하면 해당 metric을 내는 모든 엔티티에 적용됩니다. entity '*'는 해당 kind 전체.
+상태 전이(firing/resolved)는 ops_events.system_events(event_type='alert')와
+ALERT_WEBHOOK_URL(설정 시)로 전달됩니다.
+조건 충족 중에 엔티티가 사라지면(컨테이너 삭제, 인터페이스 제거 등) 샘플이 더 오지 않으므로,
+ALERT_STALE_TICKS 틱 동안 샘플이 없던 상태는 firing이면 resolved(데이터 없음)로 전이하고 제거합니다.
+"""
+import logging
+import operator
+import os
+import queue
+import re
+import threading
+import requests
+from src.database.connection import SessionLocal
+from src.modules.analysis.pipeline import Sample
+from src.modules.events.models import SystemEvent
+
+logger = logging.getLogger("ALERT")
+
+ALERT_RULES = os.getenv("ALERT_RULES", "")
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+# 이 틱 수 동안 샘플이 없던 규칙 상태는 만료 (기본 30틱 = 5분)
+ALERT_STALE_TICKS = int(os.getenv("ALERT_STALE_TICKS", "30"))
+
+_OPS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+_RULE_RE = re.compile(
+    r"^(?:(?P<kind1>[a-z_]+)\s+(?P<entity1>\S+)\s+)?"
+    r"(?P<metric>[a-z_][a-z0-9_]*)\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<threshold>-?[0-9.]+)"
+    r"(?:\s+for\s+(?P<duration>[0-9]+[smh]))?"
+    r"(?:\s+on\s+(?P<kind2>[a-z_]+)(?:\s+(?P<entity2>\S+))?)?\s*$"
+)
+
+
+class Rule:
+    __slots__ = ("text", "metric", "op", "threshold", "duration", "kind", "entity")
+
+    def __init__(self, text, metric, op, threshold, duration, kind, entity):
+        self.text = text
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.duration = duration
+        self.kind = kind
+        self.entity = entity
+
+
+def parse_rule(text):
+    """
+    규칙 한 줄을 Rule로 컴파일합니다. 문법 오류는 ValueError.
+    """
+    m = _RULE_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"규칙 문법 오류: {text!r}")
+    if m.group("kind1") and m.group("kind2"):
+        raise ValueError(f"엔티티는 앞이나 'on' 중 한 곳에만 지정: {text!r}")
+
+    kind = m.group("kind1") or m.group("kind2")
+    entity = m.group("entity1") or m.group("entity2")
+    if entity == "*":
+        entity = None
+    duration = 0
+    if m.group("duration"):
+        d = m.group("duration")
+        duration = int(d[:-1]) * _DURATION_UNITS[d[-1]]
+    return Rule(
+        text=text.strip(),
+        metric=m.group("metric"),
+        op=_OPS[m.group("op")],
+        threshold=float(m.group("threshold")),
+        duration=duration,
+        kind=kind,
+        entity=entity,
+    )
+
+
+def load_rules():
+    lines = [r for r in ALERT_RULES.split(";")]
+    if ALERT_RULES_FILE:
+        try:
+            with open(ALERT_RULES_FILE, encoding="utf-8") as f:
+                lines.extend(f.read().splitlines())
+        except OSError as e:
+            logger.error(f"알림 규칙 파일을 읽을 수 없습니다 ({ALERT_RULES_FILE}): {e}")
+
+    rules = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            rules.append(parse_rule(line))
+        except ValueError as e:
+            logger.error(str(e))
+    return rules
+
+
+class _WebhookSender(threading.Thread):
+    """
+    웹훅 전송은 별도 스레드에서 처리해 수집 루프가 대기하지 않도록 함
+    """
+
+    def __init__(self, url):
+        super().__init__(name="alert-webhook", daemon=True)
+        self.url = url
+        self.queue = queue.Queue(maxsize=1000)
+        self.session = requests.Session()
+
+    def run(self):
+        while True:
+            payload = self.queue.get()
+            try:
+                self.session.post(self.url, json=payload, timeout=5)
+            except Exception as e:
+                logger.warning(f"알림 웹훅 전송 실패: {e}")
+
+    def send(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            logger.warning("알림 웹훅 큐가 가득 차서 전송을 건너뜁니다.")
+
+
+class RuleEngine:
+    def __init__(self, rules, webhook_url=ALERT_WEBHOOK_URL, stale_ticks=ALERT_STALE_TICKS):
+        self.rules = rules
+        # (metric, kind, entity) → 규칙 목록. kind/entity가 None이면 와일드카드.
+        # 샘플마다 최대 3번의 dict 조회로 해당 규칙만 꺼내므로 규칙 수와 무관하게 비용이 일정함
+        self._index = {}
+        for rule in rules:
+            self._index.setdefault((rule.metric, rule.kind, rule.entity), []).append(rule)
+        # (rule, kind, entity) → [조건 충족 시작 ts, firing 여부, 마지막 샘플 틱]
+        self._state = {}
+        self.stale_ticks = stale_ticks
+        # 틱 = 서로 다른 수집 ts (워커가 늦게 돌려준 이전 ts는 틱으로 세지 않음)
+        self.tick = 0
+        self._last_ts = None
+        self._webhook = None
+        if webhook_url:
+            self._webhook = _WebhookSender(webhook_url)
+            self._webhook.start()
+
+    def evaluate(self, ts, samples):
+        """
+        샘플 배치를 평가하고 상태 전이 목록 [(status, rule, sample)]을 반환합니다.
+        """
+        transitions = []
+        if self._last_ts is None or ts > self._last_ts:
+            self._last_ts = ts
+            self.tick += 1
+            self._expire(transitions)
+        index = self._index
+        for sample in samples:
+            if sample.value is None:
+                continue
+            lookups = [(sample.metric, sample.kind, None), (sample.metric, None, None)]
+            if sample.entity is not None:
+                lookups.append((sample.metric, sample.kind, sample.entity))
+            for lookup in lookups:
+                for rule in index.get(lookup, ()):
+                    self._evaluate_rule(rule, sample, ts, transitions)
+        return transitions
+
+    def _evaluate_rule(self, rule, sample, ts, transitions):
+        key = (rule, sample.kind, sample.entity)
+        state = self._state.get(key)
+        if rule.op(sample.value, rule.threshold):
+            if state is None:
+                state = self._state[key] = [ts, False, self.tick]
+            state[2] = self.tick
+            if not state[1] and (ts - state[0]).total_seconds() >= rule.duration:
+                state[1] = True
+                transitions.append(("firing", rule, sample))
+        elif state is not None:
+            if state[1]:
+                transitions.append(("resolved", rule, sample))
+            # 조건이 풀린 시계열의 상태는 바로 제거 (메모리는 조건 충족 중인 시계열 수에 비례)
+            del self._state[key]
+
+    def _expire(self, transitions):
+        """
+        stale_ticks 동안 샘플이 없던 상태 제거. firing 중이던 상태는 값 없는 resolved로 전이합니다.
+        (상태 수는 조건 충족 중인 시계열 수에 비례하므로 틱마다 검사해도 비용이 작음)
+        """
+        if self.stale_ticks <= 0:
+            return
+        for key in [k for k, state in self._state.items() if self.tick - state[2] > self.stale_ticks]:
+            rule, kind, entity = key
+            if self._state.pop(key)[1]:
+                transitions.append(("resolved", rule, Sample(rule.metric, None, kind, entity)))
+
+    def __call__(self, ts, samples):
+        transitions = self.evaluate(ts, samples)
+        if transitions:
+            self._emit(ts, transitions)
+
+    def _emit(self, ts, transitions):
+        db = SessionLocal()
+        try:
+            for status, rule, sample in transitions:
+                target = f"{sample.kind} {sample.entity}" if sample.entity else sample.kind
+                if sample.value is None:
+                    detail = f"{self.stale_ticks}틱 동안 데이터 없음"
+                else:
+                    detail = f"{sample.metric}={sample.value:.2f}"
+                message = f"[{status.upper()}] {rule.text} ({target}: {detail})"
+                db.add(SystemEvent(
+                    ts=ts,
+                    event_type="alert",
+                    severity="ALERT" if status == "firing" else "NOTICE",
+                    source="rule",
+                    message=message,
+                ))
+                logger.warning(message)
+                if self._webhook:
+                    self._webhook.send({
+                        "status": status,
+                        "rule": rule.text,
+                        "kind": sample.kind,
+                        "entity": sample.entity,
+                        "metric": sample.metric,
+                        "value": sample.value,
+                        "threshold": rule.threshold,
+                        "ts": ts.isoformat(),
+                    })
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"알림 이벤트 저장 중 오류 발생: {e}")
+        finally:
+            db.close()
+
+
+def build_rule_engine():
+    """
+    규칙이 하나도 없으면 None (파이프라인에 등록하지 않음)
+    """
+    rules = load_rules()
+    if not rules:
+        return None
+    logger.info(f"알림 규칙 {len(rules)}개 로드")
+    return RuleEngine(rules)
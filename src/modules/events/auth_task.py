@@ -1,12 +1,15 @@
-import subprocess
 import logging
 import re
 from datetime import datetime
+from src.common.health import get_source
+from src.common.subprocess_runner import stream_command
 from src.database.connection import SessionLocal
 from .models import LoginEvent
 
 logger = logging.getLogger("AUTH")
 
+_LAST_CMD = get_source("last")
+
 def parse_last_output(line):
     """
     Parses a single line from 'last' output.
@@ -44,25 +47,33 @@ def parse_last_output(line):
         "ts": ts
     }
 
-def collect_auth_logs(ts=None, batch_id=None):
+def sample_auth_logs(ts=None, batch_id=None):
     """
-    Collects system login/auth records using the 'last' command.
+    'last' 명령을 실행/파싱해 로그인 기록 dict 목록을 반환합니다. (DB 접근 없음, 실패 시 None)
     """
+    if not _LAST_CMD.allow():
+        return None
     try:
-        result = subprocess.run(['last', '-i', '-n', '50'], capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split('\n')
+        lines = list(stream_command(['last', '-i', '-n', '50'], timeout=10))
+        _LAST_CMD.record_success()
     except Exception as e:
+        _LAST_CMD.record_failure(e)
         logger.error(f"Failed to run 'last' command: {e}")
         return None
+    return [data for data in (parse_last_output(line) for line in lines) if data]
+
+
+def store_auth_logs(ts, batch_id, records):
+    """
+    sample_auth_logs() 결과 중 아직 저장되지 않은 로그인 기록만 저장합니다.
+    """
+    if records is None:
+        return None
 
     db = SessionLocal()
     count = 0
     try:
-        for line in lines:
-            data = parse_last_output(line)
-            if not data:
-                continue
-
+        for data in records:
             # Check for duplicates (simple check based on timestamp, user, and tty)
             exists = db.query(LoginEvent).filter(
                 LoginEvent.ts == data['ts'],
@@ -91,3 +102,10 @@ def collect_auth_logs(ts=None, batch_id=None):
         return None
     finally:
         db.close()
+
+
+def collect_auth_logs(ts=None, batch_id=None):
+    """
+    Collects system login/auth records using the 'last' command.
+    """
+    return store_auth_logs(ts, batch_id, sample_auth_logs(ts, batch_id))
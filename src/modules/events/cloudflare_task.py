@@ -1,58 +1,174 @@
-import subprocess
+"""
+Cloudflare Tunnel 상태 수집 모듈 (로컬 metrics 엔드포인트 버전)
+
+`cloudflared tunnel list`는 매번 Cloudflare API를 원격 호출하고 origin cert가 필요하므로,
+대신 로컬에서 실행 중인 cloudflared의 metrics 서버(--metrics)를 직접 조회합니다.
+- /ready   : 연결 준비 상태와 활성 커넥션 수 (JSON)
+- /metrics : Prometheus 텍스트 포맷 카운터 (요청 수, 오류, 연결 지연 등)
+카운터는 직전 수집값과의 차분으로 초당 비율을 계산합니다. 인증 정보는 필요 없습니다.
+"""
 import logging
-import re
+import os
+import time
 from datetime import datetime
+import requests
+from src.common.health import get_source
 from src.database.connection import SessionLocal
 from .models import CloudflareTunnel
 
 logger = logging.getLogger("CLOUDFLARE")
 
-def collect_cloudflare_status(ts=None, batch_id=None):
+# "이름=host:port" 또는 "host:port"를 쉼표로 구분 (cloudflared --metrics 주소)
+CLOUDFLARED_METRICS = os.getenv("CLOUDFLARED_METRICS", "localhost:20241")
+SCRAPE_TIMEOUT = 2
+
+# 연결을 재사용하기 위한 공용 세션 (keep-alive)
+_HTTP = requests.Session()
+# endpoint → (monotonic ts, {counter: value})
+_LAST_CF_COUNTERS = {}
+
+COUNTER_METRICS = (
+    "cloudflared_tunnel_total_requests",
+    "cloudflared_tunnel_request_errors",
+    "cloudflared_proxy_connect_latency_sum",
+    "cloudflared_proxy_connect_latency_count",
+)
+
+
+def parse_endpoints(value=CLOUDFLARED_METRICS):
+    endpoints = []
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, addr = item.rpartition('=')
+        endpoints.append((name or addr, addr))
+    return endpoints
+
+
+def parse_prometheus(text):
     """
-    Checks Cloudflare Tunnel status.
+    Prometheus 텍스트 포맷을 {metric_name: 라벨 무시 합계}로 변환합니다.
     """
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        # name{labels} value [timestamp] - 라벨 값에 공백이 있을 수 있으므로 '}' 기준으로 자름
+        if '}' in line:
+            name = line.split('{', 1)[0]
+            rest = line.rsplit('}', 1)[1].split()
+        else:
+            name, *rest = line.split()
+        try:
+            value = float(rest[0])
+        except (IndexError, ValueError):
+            continue
+        values[name] = values.get(name, 0.0) + value
+    return values
+
+
+def _counter_delta(cur, prev):
+    # cloudflared 재시작으로 카운터가 초기화된 경우 현재값 자체가 증가분
+    return cur - prev if cur >= prev else cur
+
+
+def scrape_tunnel(name, addr):
+    """
+    metrics 엔드포인트 하나를 조회해 CloudflareTunnel 컬럼 dict를 반환합니다.
+    """
+    base = f"http://{addr}"
+    row = {"tunnel_name": name}
+
+    ready = _HTTP.get(f"{base}/ready", timeout=SCRAPE_TIMEOUT)
+    try:
+        body = ready.json()
+    except ValueError:
+        body = None
+    # 다른 서비스가 같은 포트를 쓰는 경우 등 dict가 아닌 JSON도 올 수 있음
     try:
-        # Try to get tunnel info. If cert is missing, this might fail,
-        # but we can at least try 'version' or handled output.
-        result = subprocess.run(['cloudflared', 'tunnel', 'list'], capture_output=True, text=True, timeout=10)
-        
-        if result.returncode != 0:
-            # Handle the case where cert is missing or auth is needed
-            if "client didn't specify origincert path" in result.stderr:
-                logger.warning("Cloudflare cert missing. Skipping tunnel list.")
-                return None
-            logger.error(f"Cloudflare tunnel list failed: {result.stderr}")
-            return None
-
-        # If we have output, parse it
-        lines = result.stdout.strip().split('\n')
-        # Typical output has header
-        if len(lines) < 2: return "Cloudflare: No tunnels found"
-
-        db = SessionLocal()
-        count = 0
+        row["ready_connections"] = int(body.get("readyConnections", 0)) if isinstance(body, dict) else None
+    except (TypeError, ValueError):
+        row["ready_connections"] = None
+
+    resp = _HTTP.get(f"{base}/metrics", timeout=SCRAPE_TIMEOUT)
+    resp.raise_for_status()
+    metrics = parse_prometheus(resp.text)
+    now = time.monotonic()
+
+    row["ha_connections"] = int(metrics.get("cloudflared_tunnel_ha_connections", 0))
+    row["concurrent_requests"] = metrics.get("cloudflared_tunnel_concurrent_requests_per_tunnel")
+    row["total_requests"] = int(metrics.get("cloudflared_tunnel_total_requests", 0))
+    row["request_errors"] = int(metrics.get("cloudflared_tunnel_request_errors", 0))
+
+    counters = {k: metrics.get(k, 0.0) for k in COUNTER_METRICS}
+    prev = _LAST_CF_COUNTERS.get(addr)
+    _LAST_CF_COUNTERS[addr] = (now, counters)
+    if prev:
+        dt = now - prev[0]
+        d = {k: _counter_delta(counters[k], prev[1][k]) for k in COUNTER_METRICS}
+        if dt > 0:
+            row["request_rate"] = round(d["cloudflared_tunnel_total_requests"] / dt, 3)
+            row["error_rate"] = round(d["cloudflared_tunnel_request_errors"] / dt, 3)
+        latency_count = d["cloudflared_proxy_connect_latency_count"]
+        if latency_count > 0:
+            row["latency_ms"] = round(d["cloudflared_proxy_connect_latency_sum"] / latency_count, 2)
+
+    if ready.status_code == 200 and row["ready_connections"]:
+        row["status"] = "healthy"
+    elif row["ha_connections"] > 0:
+        row["status"] = "degraded"
+    else:
+        row["status"] = "down"
+    row["error_message"] = "" if row["status"] == "healthy" else f"/ready HTTP {ready.status_code}"
+    return row
+
+
+def sample_cloudflare_status(ts=None, batch_id=None):
+    """
+    모든 metrics 엔드포인트를 조회해 CloudflareTunnel 컬럼 dict 목록을 반환합니다. (DB 접근 없음)
+    """
+    rows = []
+    for name, addr in parse_endpoints():
+        source = get_source(f"cloudflared:{name}")
+        if not source.allow():
+            rows.append({"tunnel_name": name, "status": "unreachable", "error_message": source.last_error})
+            continue
         try:
-            for line in lines[1:]: # Skip header
-                parts = re.split(r'\s{2,}', line.strip())
-                if len(parts) >= 4:
-                    id_, name, status, connections = parts[0], parts[1], parts[2], parts[3]
-                    new_tunnel = CloudflareTunnel(
-                        ts=ts or datetime.now(),
-                        tunnel_name=name,
-                        status=status,
-                        error_message=connections if "active" not in status.lower() else ""
-                    )
-                    db.add(new_tunnel)
-                    count += 1
-            db.commit()
-            return f"Cloudflare: {count} tunnels monitored"
+            rows.append(scrape_tunnel(name, addr))
+            source.record_success()
         except Exception as e:
-            db.rollback()
-            logger.error(f"Error saving cloudflare status: {e}")
-            return None
-        finally:
-            db.close()
-            
+            # 어떤 예외든 실패로 기록해야 half-open 시험 호출이 끝나고 메인 루프도 계속 돔
+            source.record_failure(e)
+            logger.warning(f"cloudflared metrics 조회 실패 ({name} @ {addr}): {e}")
+            rows.append({"tunnel_name": name, "status": "unreachable", "error_message": str(e)[:500]})
+
+    return rows
+
+
+def store_cloudflare_status(ts, batch_id, rows):
+    """
+    sample_cloudflare_status() 결과를 저장합니다.
+    """
+    if not rows:
+        return None
+
+    ts = ts or datetime.now()
+    db = SessionLocal()
+    try:
+        db.bulk_save_objects([CloudflareTunnel(ts=ts, **row) for row in rows])
+        db.commit()
+        return "Cloudflare: " + ", ".join(f"{r['tunnel_name']}={r['status']}" for r in rows)
     except Exception as e:
-        logger.error(f"Cloudflare status check error: {e}")
+        db.rollback()
+        logger.error(f"Error saving cloudflare status: {e}")
         return None
+    finally:
+        db.close()
+
+
+def collect_cloudflare_status(ts=None, batch_id=None):
+    """
+    Checks Cloudflare Tunnel status via local cloudflared metrics endpoints.
+    """
+    return store_cloudflare_status(ts, batch_id, sample_cloudflare_status(ts, batch_id))
@@ -0,0 +1,261 @@
+"""
+Docker 라이프사이클 이벤트 수집 모듈
+
+10초 주기의 `docker stats` 스냅샷 사이에 발생한 크래시 루프/OOM 등을 놓치지 않도록
+도커 데몬 유닉스 소켓(/var/run/docker.sock)의 events API를 상시 구독합니다.
+- 이벤트는 백그라운드 스레드가 메모리 버퍼에 쌓고, 메인 루프(Tier 1)가 한 번에 bulk insert 합니다.
+- 연결이 끊기면 마지막 이벤트의 timeNano를 since로 넘겨 재접속하므로 이벤트가 유실되지 않습니다.
+- 에이전트 (재)기동 시에는 DB에 저장된 마지막 time_nano부터 이어받아, 중단된 동안의 이벤트도 복구합니다.
+  (도커 데몬이 메모리에 보관 중인 범위까지)
+"""
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import quote
+from sqlalchemy import func, select
+from src.common.health import get_source
+from src.database.connection import SessionLocal, on_rollback
+from .models import ContainerEvent
+
+logger = logging.getLogger("DOCKER_EVENT")
+
+DOCKER_SOCKET = os.getenv("DOCKER_SOCKET", "/var/run/docker.sock")
+
+# 수집 대상 컨테이너 이벤트
+CONTAINER_ACTIONS = [
+    "create", "start", "restart", "die", "oom", "kill", "stop",
+    "pause", "unpause", "destroy", "health_status",
+]
+
+# 이벤트가 없을 때 소켓을 재접속하는 주기(초). half-open 연결 감지용 (since로 이어받으므로 유실 없음)
+IDLE_TIMEOUT = 300
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+# DB 장애 등으로 flush가 밀릴 때 메모리 상한
+MAX_BUFFERED_EVENTS = 10000
+
+_SUBSCRIBER = None
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    유닉스 도메인 소켓 위의 HTTP/1.1 연결 (docker.sock 전용)
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def format_since(time_nano):
+    """
+    timeNano(ns) → docker API since 파라미터 ("<sec>.<nanosec>")
+    """
+    return f"{time_nano // 1_000_000_000}.{time_nano % 1_000_000_000:09d}"
+
+
+def parse_event(data):
+    """
+    docker events JSON 한 건을 ContainerEvent 컬럼 dict로 변환합니다.
+    """
+    if data.get("Type") != "container":
+        return None
+    actor = data.get("Actor") or {}
+    attrs = actor.get("Attributes") or {}
+    time_nano = int(data.get("timeNano") or int(data.get("time", 0)) * 1_000_000_000)
+    exit_code = attrs.get("exitCode")
+    return {
+        "ts": datetime.fromtimestamp(time_nano / 1_000_000_000),
+        "time_nano": time_nano,
+        "container_id": (actor.get("ID") or data.get("id") or "unknown")[:12],
+        "container_name": attrs.get("name"),
+        "image": attrs.get("image") or data.get("from"),
+        # health_status 이벤트는 "health_status: healthy" 형태 그대로 보존
+        "action": data.get("Action") or data.get("status") or "unknown",
+        "exit_code": int(exit_code) if exit_code is not None and str(exit_code).lstrip("-").isdigit() else None,
+        "attributes": json.dumps(attrs, ensure_ascii=False),
+    }
+
+
+class DockerEventSubscriber(threading.Thread):
+    """
+    docker events API 장기 구독 스레드.
+    socket_path를 바꾸면 테스트용 가짜 소켓 서버에도 그대로 붙일 수 있습니다.
+    """
+
+    def __init__(self, socket_path=DOCKER_SOCKET, since_nano=None):
+        super().__init__(name="docker-events", daemon=True)
+        self.socket_path = socket_path
+        self.last_time_nano = since_nano if since_nano is not None else time.time_ns()
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._conn = None
+        self.dropped = 0
+        # 재접속 백오프는 자체 처리하고, 상태 전이 기록에만 사용
+        self._health = get_source("docker-events")
+
+    def run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop_event.is_set():
+            try:
+                received = self._stream()
+                if received:
+                    delay = RECONNECT_MIN_DELAY
+            except socket.timeout:
+                # 유휴 타임아웃: since 기준으로 즉시 재접속
+                continue
+            except FileNotFoundError as e:
+                self._health.record_failure(e)
+                logger.warning(f"도커 소켓을 찾을 수 없습니다: {self.socket_path}")
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    self._health.record_failure(e)
+                    logger.error(f"도커 이벤트 스트림 오류: {e}")
+            finally:
+                self._close()
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _stream(self):
+        filters = json.dumps({"type": ["container"], "event": CONTAINER_ACTIONS})
+        # since는 포함(inclusive)이므로 마지막 이벤트 직후(+1ns)부터 요청
+        path = f"/events?since={format_since(self.last_time_nano + 1)}&filters={quote(filters)}"
+
+        self._conn = UnixHTTPConnection(self.socket_path, timeout=IDLE_TIMEOUT)
+        self._conn.request("GET", path)
+        resp = self._conn.getresponse()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {resp.read(200)!r}")
+        self._health.record_success()
+        logger.info(f"도커 이벤트 구독 시작 (since={format_since(self.last_time_nano)})")
+
+        received = 0
+        while not self._stop_event.is_set():
+            line = resp.readline()
+            if not line:
+                # 데몬 재시작 등으로 스트림 종료
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = parse_event(json.loads(line))
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.warning(f"도커 이벤트 파싱 실패: {e}")
+                continue
+            if event is None:
+                continue
+            self._append(event)
+            self.last_time_nano = max(self.last_time_nano, event["time_nano"])
+            received += 1
+        return received
+
+    def _append(self, event):
+        with self._lock:
+            if len(self._buffer) >= MAX_BUFFERED_EVENTS:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(event)
+
+    def drain(self):
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+        return events
+
+    def requeue(self, events):
+        # 저장 실패분을 다음 flush 때 다시 시도
+        with self._lock:
+            self._buffer.extendleft(reversed(events))
+            while len(self._buffer) > MAX_BUFFERED_EVENTS:
+                self._buffer.popleft()
+                self.dropped += 1
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self._conn is not None and self._conn.sock is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _last_stored_time_nano():
+    """
+    저장된 마지막 이벤트의 time_nano. 없거나 조회에 실패하면 None (현재 시각부터 구독)
+    """
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.max(ContainerEvent.time_nano))).scalar()
+    except Exception as e:
+        logger.error(f"마지막 도커 이벤트 시각 조회 실패: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def collect_docker_events(ts=None, batch_id=None):
+    """
+    구독 스레드를 보장하고, 버퍼에 쌓인 이벤트를 한 번의 bulk insert로 저장합니다. (Tier 1)
+    """
+    global _SUBSCRIBER
+
+    leftover = []
+    if _SUBSCRIBER is None or not _SUBSCRIBER.is_alive():
+        if _SUBSCRIBER is None:
+            since = _last_stored_time_nano()
+        else:
+            since = _SUBSCRIBER.last_time_nano
+            leftover = _SUBSCRIBER.drain()
+        _SUBSCRIBER = DockerEventSubscriber(DOCKER_SOCKET, since_nano=since)
+        _SUBSCRIBER.start()
+
+    events = leftover + _SUBSCRIBER.drain()
+    if not events:
+        return None
+
+    db = SessionLocal()
+    try:
+        db.bulk_save_objects([ContainerEvent(**e) for e in events])
+        db.commit()
+        # 배치 쓰기의 최종 커밋이 실패하면 꺼낸 이벤트를 버퍼로 되돌림
+        subscriber = _SUBSCRIBER
+        on_rollback(lambda: subscriber.requeue(events))
+        summary = {}
+        for e in events:
+            summary[e["action"]] = summary.get(e["action"], 0) + 1
+        logger.info(f"도커 이벤트 저장 완료 ({len(events)}건)")
+        return "Docker events: " + ", ".join(f"{k}={v}" for k, v in summary.items())
+    except Exception as e:
+        db.rollback()
+        _SUBSCRIBER.requeue(events)
+        logger.error(f"도커 이벤트 저장 중 오류 발생: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def stop_docker_events():
+    if _SUBSCRIBER is not None:
+        _SUBSCRIBER.stop()
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from src.database.connection import Base
 from sqlalchemy.sql import func
 
@@ -19,12 +20,21 @@ class LoginEvent(Base):
     id = Column(Integer, primary_key=True, comment="행 식별자(PK).")
     ts = Column(DateTime(timezone=True), nullable=False, index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
 
-    user_name = Column(Text, nullable=False, index=True, comment="접속 계정명.")
+    user_name = Column(Text, nullable=False, comment="접속 계정명.")
     tty = Column(Text, comment="터미널 (tty, pts 등).")
     remote_host = Column(Text, comment="접속 IP/호스트.")
     session_id = Column(Text, comment="세션 식별자.")
 
 
+# last 출력은 시간 역순으로 들어오므로 ts는 BRIN 대신 B-tree 유지.
+# (user_name, ts, tty) 복합 인덱스는 중복 체크와 "사용자 X의 접속 이력" 조회를 함께 처리한다.
+Index("idx_login_user_ts", LoginEvent.user_name, LoginEvent.ts, LoginEvent.tty)
+# 접속 IP/호스트 부분 일치(ILIKE '%...%') 검색용 trigram 인덱스 (pg_trgm)
+Index(
+    "trgm_login_remote_host", LoginEvent.remote_host, postgresql_using="gin", postgresql_ops={"remote_host": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+
+
 class SystemEvent(Base):
     """
     중요한 시스템 이벤트
@@ -36,12 +46,49 @@ class SystemEvent(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK).")
-    ts = Column(DateTime(timezone=True), nullable=False, index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
+    ts = Column(DateTime(timezone=True), nullable=False, comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
 
     event_type = Column(Text, comment="이벤트 타입 (ERROR/WARN/INFO 등).")
     severity = Column(Text, comment="심각도.")
     source = Column(Text, comment="발생 소스.")
-    message = Column(Text, comment="이벤트 메시지.")
+    message = Column(Text, comment="이벤트 메시지. 템플릿으로 인코딩된 journal 행은 NULL (v_system_events에서 복원).")
+    template_id = Column(Integer, comment="메시지 템플릿 ID (ops_events.log_templates.id).")
+    cluster_id = Column(Integer, comment="템플릿 그룹 ID (log_templates.cluster_id). 템플릿이 일반화되어 ID가 바뀌어도 유지되므로 발생 횟수 집계는 이 컬럼 기준.")
+    params = Column(Text, comment="템플릿 <*> 자리에 들어갈 파라미터 목록(JSON 배열).")
+    search_vector = Column(TSVECTOR, comment="전문 검색용 tsvector (source + 복원된 메시지). INSERT 트리거가 채움.")
+
+
+Index("brin_system_events_ts", SystemEvent.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index("idx_system_events_source_ts", SystemEvent.source, SystemEvent.ts, postgresql_include=["severity"])
+Index("idx_system_events_template_ts", SystemEvent.template_id, SystemEvent.ts)
+# "템플릿 X가 얼마나 자주 발생했나" 집계용 (LIKE 스캔 대신 정수 GROUP BY, 일반화 전후 행을 한 그룹으로)
+Index("idx_system_events_cluster_ts", SystemEvent.cluster_id, SystemEvent.ts)
+Index("gin_system_events_search", SystemEvent.search_vector, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+
+class LogTemplate(Base):
+    """
+    journal 메시지 템플릿 사전 (Drain 방식 온라인 마이닝)
+    """
+    __tablename__ = "log_templates"
+    __table_args__ = {
+        "schema": "ops_events",
+        "comment": "journal 메시지 템플릿 사전. 가변 토큰은 <*>로 치환되어 있으며 system_events.params와 합쳐 원문을 복원한다.",
+    }
+
+    id = Column(Integer, primary_key=True, comment="템플릿 ID(PK).")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="템플릿 최초 생성 시각.")
+
+    template = Column(Text, nullable=False, comment="공백 구분 토큰 템플릿. 가변 자리는 <*>.")
+    token_count = Column(Integer, nullable=False, comment="토큰 수.")
+    superseded_by = Column(Integer, comment="템플릿이 일반화되어 새 ID로 대체된 경우 새 템플릿 ID. 기존 행 복원용으로 원본은 유지.")
+    cluster_id = Column(Integer, comment="템플릿 그룹 ID. 그룹의 최초 템플릿 ID이며 일반화로 새 ID가 발급되어도 같은 값을 유지.")
+
+
+# 고정 문구 부분 일치 검색용 trigram 인덱스 → 매칭된 template_id로 system_events 조회
+Index(
+    "trgm_log_templates_template", LogTemplate.template, postgresql_using="gin", postgresql_ops={"template": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
 
 
 class CloudflareTunnel(Base):
@@ -55,8 +102,46 @@ class CloudflareTunnel(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK).")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
 
-    tunnel_name = Column(Text, nullable=False, index=True, comment="터널 이름.")
-    status = Column(Text, comment="상태.")
+    tunnel_name = Column(Text, nullable=False, comment="터널 이름 (CLOUDFLARED_METRICS에 지정한 이름 또는 metrics 주소).")
+    status = Column(Text, comment="상태 (healthy/degraded/down/unreachable).")
     error_message = Column(Text, comment="에러 메시지.")
+    ready_connections = Column(Integer, comment="/ready 기준 활성 엣지 커넥션 수.")
+    ha_connections = Column(Integer, comment="cloudflared_tunnel_ha_connections (HA 커넥션 수).")
+    concurrent_requests = Column(Float, comment="동시 처리 중인 요청 수.")
+    total_requests = Column(BigInteger, comment="누적 요청 수 (cloudflared 기동 이후).")
+    request_errors = Column(BigInteger, comment="누적 요청 오류 수.")
+    request_rate = Column(Float, comment="직전 수집 대비 초당 요청 수.")
+    error_rate = Column(Float, comment="직전 수집 대비 초당 오류 수.")
+    latency_ms = Column(Float, comment="직전 수집 구간의 평균 origin 연결 지연(ms).")
+
+
+Index("brin_cloudflare_ts", CloudflareTunnel.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index("idx_cloudflare_tunnel_ts", CloudflareTunnel.tunnel_name, CloudflareTunnel.ts, postgresql_include=["status"])
+
+
+class ContainerEvent(Base):
+    """
+    도커 컨테이너 라이프사이클 이벤트 (Docker events API)
+    """
+    __tablename__ = "container_events"
+    __table_args__ = {
+        "schema": "ops_events",
+        "comment": "도커 컨테이너 start/die/oom/restart 등 라이프사이클 이벤트 테이블. 10초 stats 샘플 사이의 크래시 루프/OOM 추적용.",
+    }
+
+    id = Column(Integer, primary_key=True, comment="행 식별자(PK).")
+    ts = Column(DateTime(timezone=True), nullable=False, comment="이벤트 발생 시각(도커 데몬 기준). 시간 범위 필터/정렬에 사용(BRIN).")
+    time_nano = Column(BigInteger, comment="이벤트 발생 시각(ns). 재접속 시 since 기준값.")
+
+    container_id = Column(Text, nullable=False, comment="도커 컨테이너 ID(12자리).")
+    container_name = Column(Text, comment="도커 컨테이너 이름.")
+    image = Column(Text, comment="컨테이너 이미지.")
+    action = Column(Text, nullable=False, comment="이벤트 종류 (start/die/oom/restart/kill/stop/health_status 등).")
+    exit_code = Column(Integer, comment="die 이벤트의 종료 코드.")
+    attributes = Column(Text, comment="이벤트 Actor.Attributes 원본(JSON).")
+
+
+Index("brin_container_events_ts", ContainerEvent.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index("idx_container_events_name_ts", ContainerEvent.container_name, ContainerEvent.ts, postgresql_include=["action"])
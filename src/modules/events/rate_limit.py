@@ -0,0 +1,130 @@
+"""
+로그 폭주 시 수집량 제한 (토큰 버킷 + 결정적 샘플링)
+
+서비스 하나가 초당 수천 줄을 journal에 쏟아내도 system_events 쓰기 비용이 일정하도록,
+SYSLOG_IDENTIFIER별 / 심각도별 토큰 버킷을 두 개 모두 통과한 줄만 저장합니다.
+- 버킷 보충은 벽시계가 아니라 journal 항목의 발생 시각 기준입니다.
+  (1분마다 몰아서 읽으므로 벽시계로는 한 배치 전체가 같은 순간에 도착한 것처럼 보임)
+- 버킷이 비어도 LOG_SAMPLE_RATE 비율은 커서 해시로 결정적으로 통과시켜 폭주 중 샘플을 남깁니다.
+  (같은 항목은 재수집해도 같은 판정)
+- ERR 이상(EMERG/ALERT/CRIT/ERR)은 절대 버리지 않고 버킷도 소모하지 않습니다.
+- 버린 줄은 (소스, 심각도)별로 세어 수집 주기마다 "N similar messages dropped" 행으로 요약합니다.
+
+설정 예:
+    LOG_SOURCE_RATE=5  LOG_SOURCE_BURST=100          # 소스별 기본 초당 5줄, 순간 100줄
+    LOG_SOURCE_RATES="kernel=20,sshd=10"              # 소스별 개별 설정
+    LOG_SEVERITY_RATES="WARNING=50,NOTICE=20,INFO=20,DEBUG=5"
+"""
+import logging
+import os
+import zlib
+
+logger = logging.getLogger("LOG_LIMIT")
+
+# journal PRIORITY 3(ERR) 이하는 항상 저장
+NEVER_DROP_PRIORITY = 3
+
+
+def _parse_rates(value):
+    rates = {}
+    for item in (value or "").split(","):
+        key, sep, rate = item.strip().partition("=")
+        if not sep:
+            continue
+        try:
+            rates[key.strip()] = float(rate)
+        except ValueError:
+            logger.warning(f"잘못된 로그 제한 설정 무시: {item}")
+    return rates
+
+
+LOG_RATE_LIMIT = os.getenv("LOG_RATE_LIMIT", "true").lower() == "true"
+LOG_SOURCE_RATE = float(os.getenv("LOG_SOURCE_RATE", "5"))
+LOG_SOURCE_BURST = float(os.getenv("LOG_SOURCE_BURST", "100"))
+LOG_SOURCE_RATES = _parse_rates(os.getenv("LOG_SOURCE_RATES", ""))
+LOG_SEVERITY_RATES = _parse_rates(os.getenv("LOG_SEVERITY_RATES", "WARNING=50,NOTICE=20,INFO=20,DEBUG=5"))
+# 심각도 버킷 버스트 = 초당 비율 × 이 배수
+LOG_SEVERITY_BURST_FACTOR = float(os.getenv("LOG_SEVERITY_BURST_FACTOR", "10"))
+# 버킷이 빈 상태에서도 통과시킬 샘플 비율 (0이면 샘플링 없음)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = None
+
+    def refill(self, now):
+        if self.updated is not None and now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        if self.updated is None or now > self.updated:
+            self.updated = now
+
+    def has_token(self, now):
+        self.refill(now)
+        return self.tokens >= 1.0
+
+    def take(self):
+        self.tokens -= 1.0
+
+
+def sampled(key, rate=LOG_SAMPLE_RATE):
+    """
+    key 해시 기반 결정적 샘플링 (같은 key는 항상 같은 결과)
+    """
+    if rate <= 0:
+        return False
+    return (zlib.crc32(key.encode("utf-8", "replace")) & 0xFFFFFFFF) < rate * 0x100000000
+
+
+class LogRateLimiter:
+    def __init__(self):
+        self.source_buckets = {}
+        self.severity_buckets = {
+            severity: TokenBucket(rate, rate * LOG_SEVERITY_BURST_FACTOR)
+            for severity, rate in LOG_SEVERITY_RATES.items()
+        }
+        # (source, severity) → [버린 수, 마지막으로 버린 항목 시각]
+        self.dropped = {}
+
+    def _source_bucket(self, source):
+        bucket = self.source_buckets.get(source)
+        if bucket is None:
+            rate = LOG_SOURCE_RATES.get(source, LOG_SOURCE_RATE)
+            bucket = self.source_buckets[source] = TokenBucket(rate, max(LOG_SOURCE_BURST, rate))
+        return bucket
+
+    def admit(self, source, severity, priority, ts, sample_key):
+        """
+        저장 여부 판정. 버려지는 줄은 요약용으로 집계합니다.
+        """
+        if priority <= NEVER_DROP_PRIORITY:
+            return True
+        now = ts.timestamp()
+        source_bucket = self._source_bucket(source)
+        severity_bucket = self.severity_buckets.get(severity)
+        if source_bucket.has_token(now) and (severity_bucket is None or severity_bucket.has_token(now)):
+            source_bucket.take()
+            if severity_bucket is not None:
+                severity_bucket.take()
+            return True
+        if sampled(sample_key):
+            return True
+        entry = self.dropped.setdefault((source, severity), [0, ts])
+        entry[0] += 1
+        entry[1] = max(entry[1], ts)
+        return False
+
+    def drain_dropped(self):
+        """
+        이번 주기에 버린 줄 집계를 꺼냅니다. [(source, severity, count, last_ts), ...]
+        """
+        dropped, self.dropped = self.dropped, {}
+        return [(source, severity, count, last_ts) for (source, severity), (count, last_ts) in dropped.items()]
+
+
+journal_limiter = LogRateLimiter()
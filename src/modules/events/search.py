@@ -0,0 +1,107 @@
+"""
+시스템 이벤트 / 로그인 기록 검색
+
+LIKE '%...%' 순차 스캔 대신 인덱스를 타는 검색 함수 모음입니다.
+- search_events : system_events.search_vector(GIN) 전문 검색. websearch 문법 지원
+                  (예: 'sshd "Failed password" -invalid', 'oom or killed')
+- find_templates: log_templates.template trigram 인덱스로 고정 문구 부분 일치 → template_id 목록
+- search_logins : login_events.remote_host trigram 인덱스로 IP/호스트 부분 일치
+
+search_vector는 INSERT 트리거(ops_events.system_events_search_update)가 템플릿으로 복원한
+메시지 기준으로 채우므로, 템플릿 인코딩된 행도 원문 단어로 검색됩니다.
+
+SQLite 백엔드에는 tsvector/trigram이 없으므로 같은 함수가 LIKE 순차 검색으로 동작합니다.
+(search_events의 query는 공백으로 나눈 모든 단어를 포함하는 행, websearch 문법 미지원)
+"""
+from sqlalchemy import func, select
+from src.database.connection import engine
+from .models import LoginEvent, LogTemplate, SystemEvent
+
+TS_CONFIG = "simple"
+DEFAULT_LIMIT = 100
+
+
+def _escape_like(value):
+    # 백슬래시는 standard_conforming_strings 설정에 따라 해석이 달라지므로 '!'를 이스케이프 문자로 사용
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _time_range(stmt, column, start, end):
+    if start is not None:
+        stmt = stmt.where(column >= start)
+    if end is not None:
+        stmt = stmt.where(column < end)
+    return stmt
+
+
+def search_events(query=None, start=None, end=None, severities=None, sources=None, template_ids=None,
+                  event_types=None, limit=DEFAULT_LIMIT):
+    """
+    시스템 이벤트 검색 (최신순). 반환: [{id, ts, event_type, severity, source, message, template_id}, ...]
+    query가 없으면 필터 조건만으로 조회합니다.
+    """
+    is_sqlite = engine.dialect.name == "sqlite"
+    # SQLite는 스키마 한정 함수 이름을 지원하지 않음 (연결 시 등록한 render_template)
+    render_template = func.render_template if is_sqlite else func.ops_events.render_template
+    message = func.coalesce(
+        SystemEvent.message,
+        render_template(LogTemplate.template, SystemEvent.params),
+    )
+    stmt = (
+        select(
+            SystemEvent.id, SystemEvent.ts, SystemEvent.event_type, SystemEvent.severity,
+            SystemEvent.source, message.label("message"), SystemEvent.template_id,
+        )
+        .outerjoin(LogTemplate, LogTemplate.id == SystemEvent.template_id)
+    )
+    if query and is_sqlite:
+        for word in query.split():
+            stmt = stmt.where(
+                (func.coalesce(SystemEvent.source, "") + " " + message).like(f"%{_escape_like(word)}%", escape="!")
+            )
+    elif query:
+        stmt = stmt.where(SystemEvent.search_vector.op("@@")(func.websearch_to_tsquery(TS_CONFIG, query)))
+    stmt = _time_range(stmt, SystemEvent.ts, start, end)
+    if severities:
+        stmt = stmt.where(SystemEvent.severity.in_([s.upper() for s in severities]))
+    if sources:
+        stmt = stmt.where(SystemEvent.source.in_(sources))
+    if event_types:
+        stmt = stmt.where(SystemEvent.event_type.in_(event_types))
+    if template_ids:
+        stmt = stmt.where(SystemEvent.template_id.in_(template_ids))
+    stmt = stmt.order_by(SystemEvent.ts.desc()).limit(limit)
+
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(stmt)]
+
+
+def find_templates(pattern, include_superseded=True, limit=DEFAULT_LIMIT):
+    """
+    템플릿 고정 문구 부분 일치 검색. 반환: [(template_id, template), ...]
+    일반화 이전 버전으로 저장된 행도 찾을 수 있도록 기본적으로 대체된 템플릿도 포함합니다.
+    """
+    stmt = select(LogTemplate.id, LogTemplate.template).where(
+        LogTemplate.template.ilike(f"%{_escape_like(pattern)}%", escape="!")
+    )
+    if not include_superseded:
+        stmt = stmt.where(LogTemplate.superseded_by.is_(None))
+    stmt = stmt.order_by(LogTemplate.id).limit(limit)
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(stmt)]
+
+
+def search_logins(host_pattern, start=None, end=None, user_name=None, limit=DEFAULT_LIMIT):
+    """
+    접속 IP/호스트 부분 일치 검색 (최신순). 반환: [{id, ts, user_name, tty, remote_host, session_id}, ...]
+    """
+    stmt = select(
+        LoginEvent.id, LoginEvent.ts, LoginEvent.user_name, LoginEvent.tty,
+        LoginEvent.remote_host, LoginEvent.session_id,
+    ).where(LoginEvent.remote_host.ilike(f"%{_escape_like(host_pattern)}%", escape="!"))
+    stmt = _time_range(stmt, LoginEvent.ts, start, end)
+    if user_name:
+        stmt = stmt.where(LoginEvent.user_name == user_name)
+    stmt = stmt.order_by(LoginEvent.ts.desc()).limit(limit)
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(stmt)]
@@ -1,89 +1,343 @@
-import subprocess
 import logging
 import json
+import os
 from datetime import datetime
-from src.database.connection import SessionLocal
+from itertools import islice
+from src.common.health import get_source
+from src.common.subprocess_runner import CommandError, stream_command
+from src.database.connection import SessionLocal, on_commit, on_rollback
 from .models import SystemEvent
+from .rate_limit import LOG_RATE_LIMIT, journal_limiter
+from .template_miner import LOG_TEMPLATE_MINING, template_miner
 
 logger = logging.getLogger("SYSTEM_EVENT")
 
-def collect_system_events(ts=None, batch_id=None):
+_JOURNAL = get_source("journalctl")
+_SYSLOG = get_source("syslog-tail")
+
+SEVERITIES = ["EMERG", "ALERT", "CRIT", "ERR", "WARNING", "NOTICE", "INFO", "DEBUG"]
+
+# 커서가 없을 때(최초 기동) 가져올 최근 줄 수
+JOURNAL_INITIAL_LINES = 50
+# 한 주기에 커서부터 이어 읽을 최대 줄 수. 밀린 양이 이를 넘으면(로그 폭주) 나머지는 건너뛰고
+# 최근 JOURNAL_TAIL_LINES줄로 점프해 커서가 끝없이 뒤처지지 않도록 함.
+# 건너뛴 구간의 ERR 이상은 그대로 저장하고, 나머지는 (소스, 심각도)별 요약 행으로 기록
+JOURNAL_MAX_LINES = int(os.getenv("JOURNAL_MAX_LINES", "5000"))
+JOURNAL_TAIL_LINES = int(os.getenv("JOURNAL_TAIL_LINES", "200"))
+# 건너뛴 구간을 (소스, 심각도)별로 셀 때 읽을 최대 줄 수. 넘는 부분은 seqnum 차이로 개수만 기록
+JOURNAL_SKIP_SCAN_LINES = int(os.getenv("JOURNAL_SKIP_SCAN_LINES", "100000"))
+
+# 마지막으로 저장까지 끝난 journal 항목의 __CURSOR (다음 주기에 --after-cursor로 이어 읽기)
+_JOURNAL_CURSOR = None
+
+
+def parse_journal_line(line):
     """
-    Collects system events from journalctl in JSON format.
+    journalctl -o json 한 줄을 (SystemEvent 컬럼 dict, PRIORITY, __CURSOR)로 변환합니다. (파싱 실패 시 None)
+    """
+    if not line.strip():
+        return None
+    try:
+        data = json.loads(line)
+        # PRIORITY: 0 (emerg) to 7 (debug)
+        prio = int(data.get('PRIORITY', 6))
+        severity = SEVERITIES[prio]
+
+        # Timestamp in microseconds
+        msg_ts = datetime.fromtimestamp(int(data.get('__REALTIME_TIMESTAMP', 0)) / 1_000_000)
+
+        event = {
+            "ts": msg_ts,
+            "event_type": "journal",
+            "severity": severity,
+            "source": data.get('SYSLOG_IDENTIFIER', 'unknown'),
+            "message": data.get('MESSAGE', ''),
+        }
+        return event, prio, data.get('__CURSOR')
+    except Exception:
+        return None
+
+
+def _dropped_summaries():
+    return [
+        {
+            "ts": last_ts,
+            "event_type": "suppressed",
+            "severity": severity,
+            "source": source,
+            "message": f"{count} similar messages dropped (rate limit)",
+        }
+        for source, severity, count, last_ts in journal_limiter.drain_dropped()
+    ]
+
+
+def journal_context():
+    """
+    sample_system_events()에 넘길 상태. 커서는 저장(커밋)이 끝난 쪽(메인 프로세스)이 관리합니다.
+    """
+    return {"cursor": _JOURNAL_CURSOR}
+
+
+def _cursor_seqnum(cursor):
+    """
+    journal 커서("s=<seqnum_id>;i=<seqnum hex>;...")에서 (seqnum_id, seqnum). 형식이 다르면 None
+    """
+    try:
+        fields = dict(part.split("=", 1) for part in cursor.split(";"))
+        return fields["s"], int(fields["i"], 16)
+    except (AttributeError, KeyError, ValueError):
+        return None
+
+
+def _iter_journal(cmd, after=None, until=None):
+    """
+    journalctl 출력을 줄 단위로 파싱해 (event, prio, cursor, line)을 yield 합니다.
+    after(커서의 seqnum) 이하 항목은 이미 읽은 것으로 보고 건너뛰고,
+    until((seqnum, ts) 경계 항목)에 도달하면 멈춥니다. seqnum 계열이 다르면 발생 시각으로 비교.
+    """
+    for line in stream_command(cmd, timeout=15):
+        parsed = parse_journal_line(line)
+        if parsed is None:
+            continue
+        event, prio, entry_cursor = parsed
+        seq = _cursor_seqnum(entry_cursor)
+        if after is not None and seq is not None and seq[0] == after[0] and seq[1] <= after[1]:
+            continue
+        if until is not None:
+            bound_seq, bound_ts = until
+            if seq is not None and bound_seq is not None and seq[0] == bound_seq[0]:
+                if seq[1] >= bound_seq[1]:
+                    # 제너레이터를 닫으면 journalctl 프로세스는 정리됨
+                    return
+            elif event["ts"] >= bound_ts:
+                return
+        yield event, prio, entry_cursor, line
+
+
+def _admit(events, event, prio, entry_cursor, line):
+    if not LOG_RATE_LIMIT or journal_limiter.admit(
+        event["source"], event["severity"], prio, event["ts"], entry_cursor or line
+    ):
+        events.append(event)
+
+
+def _read_journal(cmd, limit, events):
+    """
+    journalctl 출력을 읽어 제한을 통과한 이벤트를 events에 추가합니다.
+    반환: (마지막 커서, 읽은 줄 수, limit에 도달했는지)
+    """
+    last = None
+    read = 0
+    for event, prio, entry_cursor, line in _iter_journal(cmd):
+        last = entry_cursor or last
+        read += 1
+        _admit(events, event, prio, entry_cursor, line)
+        if read >= limit:
+            return last, read, True
+    return last, read, False
+
+
+def _skip_backlog(ts, cursor, events):
+    """
+    밀린 항목이 한 주기 상한을 넘었을 때 중간을 건너뛰고 최근 JOURNAL_TAIL_LINES줄로 점프합니다.
+    - 건너뛰는 구간의 ERR 이상은 -p err로 따로 읽어 모두 저장 (rate_limit의 NEVER_DROP_PRIORITY 보장 유지)
+    - 나머지는 저장하지 않고 (소스, 심각도)별로 세어 요약 행을 만듦
+    반환: (새 커서, 추가로 읽은 줄 수, 건너뛴 줄 수, 요약 행 목록). 점프할 수 없으면 None
+    """
+    after = _cursor_seqnum(cursor)
+    # --after-cursor와 -n을 함께 쓰면 -n이 앞에서부터의 개수 제한이 되므로 커서 없이 tail을 읽음
+    tail_cmd = ['journalctl', '-n', str(JOURNAL_TAIL_LINES), '--no-pager', '-o', 'json']
+    error_cmd = ['journalctl', '--after-cursor', cursor, '-p', 'err', '--no-pager', '-o', 'json']
+    try:
+        tail = list(_iter_journal(tail_cmd, after=after))
+        if not tail:
+            return None
+        first_event, _, first_cursor, _ = tail[0]
+        until = (_cursor_seqnum(first_cursor), first_event["ts"])
+        # 상한+1개까지 읽어 넘치는지 확인 (넘치면 이번 주기에는 tail로 점프하지 않음)
+        errors = list(islice(_iter_journal(error_cmd, until=until), JOURNAL_MAX_LINES + 1))
+    except (CommandError, OSError) as e:
+        logger.warning(f"journal 밀린 구간 건너뛰기 실패, 다음 주기에 커서부터 이어 읽음: {e}")
+        return None
+
+    in_gap = len(errors)
+    if len(errors) > JOURNAL_MAX_LINES:
+        # 마지막으로 저장한 ERR 항목까지만 전진. 그 뒤는 다음 주기에 커서부터 다시 읽음
+        errors.pop()
+        last_event, _, last_cursor, _ = errors[-1]
+        until = (_cursor_seqnum(last_cursor), last_event["ts"])
+        in_gap = len(errors) - 1
+        tail = []
+    for event, _, _, _ in errors:
+        events.append(event)
+    for entry in tail:
+        _admit(events, *entry)
+    new_cursor = (tail or errors)[-1][2] or cursor
+
+    # 건너뛴 WARNING 이하 항목을 (소스, 심각도)별로 셈. 필요한 필드만 받아 저장 경로보다 훨씬 가벼움
+    count_cmd = ['journalctl', '--after-cursor', cursor, '-p', 'warning..debug', '--no-pager', '-o', 'json',
+                 '--output-fields=SYSLOG_IDENTIFIER,PRIORITY']
+    counts = {}
+    scanned = 0
+    try:
+        for event, _, _, _ in islice(_iter_journal(count_cmd, until=until), JOURNAL_SKIP_SCAN_LINES):
+            entry = counts.setdefault((event["source"], event["severity"]), [0, event["ts"]])
+            entry[0] += 1
+            entry[1] = max(entry[1], event["ts"])
+            scanned += 1
+    except (CommandError, OSError) as e:
+        logger.warning(f"건너뛴 journal 구간 집계 중단: {e}")
+
+    summaries = [
+        {
+            "ts": last_ts,
+            "event_type": "suppressed",
+            "severity": severity,
+            "source": source,
+            "message": f"{count} journal lines skipped (backlog over {JOURNAL_MAX_LINES} lines)",
+        }
+        for (source, severity), (count, last_ts) in counts.items()
+    ]
+    # 집계하지 못한 나머지는 seqnum 차이로만 알 수 있음 (seqnum 계열이 다르면 알 수 없음)
+    bound_seq = until[0]
+    if after is not None and bound_seq is not None and bound_seq[0] == after[0]:
+        unscanned = max(bound_seq[1] - after[1] - 1 - in_gap - scanned, 0)
+    else:
+        unscanned = -1
+    if unscanned:
+        summaries.append({
+            "ts": ts,
+            "event_type": "suppressed",
+            "severity": "WARNING",
+            "source": "journalctl",
+            "message": (
+                f"{unscanned if unscanned > 0 else 'unknown number of'} more journal lines skipped "
+                f"without per-source counts (backlog over {JOURNAL_MAX_LINES} lines)"
+            ),
+        })
+    skipped = scanned + max(unscanned, 0)
+    logger.warning(
+        f"journal 밀린 항목이 {JOURNAL_MAX_LINES}줄을 넘어 "
+        + (f"최근 {len(tail)}줄로 점프" if tail else f"ERR 이상 {len(errors)}줄까지 전진")
+        + f" (ERR 이상 {len(errors)}줄 저장, 건너뜀: {skipped}{'' if unscanned >= 0 else '+알 수 없음'})"
+    )
+    return new_cursor, len(errors) + len(tail), skipped, summaries
+
+
+def sample_system_events(ts, batch_id, cursor=None):
+    """
+    journalctl(실패 시 syslog tail)을 읽어 저장할 SystemEvent 컬럼 dict 목록을 만듭니다. (DB 접근 없음)
+    워커 프로세스 모드에서는 이 단계만 워커에서 실행됩니다.
+    반환: {"events", "cursor", "read", "kept", "skipped", "fallback"} 또는 None
     """
     # Use journalctl with JSON output for better parsing
-    cmd = ['journalctl', '-n', '50', '--no-pager', '-o', 'json']
+    # 직전 주기에 저장한 항목 이후만 읽음 (같은 줄 중복 저장 방지)
+    if cursor:
+        cmd = ['journalctl', '--after-cursor', cursor, '--no-pager', '-o', 'json']
+    else:
+        cmd = ['journalctl', '-n', str(JOURNAL_INITIAL_LINES), '--no-pager', '-o', 'json']
+    events = []
+    read = 0
+    skipped = 0
+    summaries = []
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split('\n')
+        # journalctl이 연속 실패 중이면 백오프 동안 바로 tail 폴백으로
+        if not _JOURNAL.allow():
+            raise RuntimeError("journalctl source open (backoff)")
+        # 출력 전체를 모으지 않고 줄이 도착하는 대로 파싱
+        try:
+            last, read, capped = _read_journal(cmd, JOURNAL_MAX_LINES, events)
+            cursor = last or cursor
+            if capped and cursor:
+                jumped = _skip_backlog(ts, cursor, events)
+                if jumped is not None:
+                    cursor, tail_read, skipped, summaries = jumped
+                    read += tail_read
+        except Exception as e:
+            _JOURNAL.record_failure(e)
+            raise
+        _JOURNAL.record_success()
     except Exception as e:
         logger.warning(f"journalctl failed, falling back to basic tail: {e}")
+        if not _SYSLOG.allow():
+            return None
         try:
-            result = subprocess.run(['tail', '-n', '50', '/var/log/syslog'], capture_output=True, text=True, check=True)
-            lines = result.stdout.strip().split('\n')
-            return parse_basic_syslog(lines, ts)
+            lines = list(stream_command(['tail', '-n', '50', '/var/log/syslog'], timeout=5))
+            _SYSLOG.record_success()
         except Exception as e2:
+            _SYSLOG.record_failure(e2)
             logger.error(f"Failed to collect system logs: {e2}")
             return None
+        events = parse_basic_syslog(lines, ts)
+        return {"events": events, "cursor": None, "read": len(events), "kept": len(events), "skipped": 0,
+                "fallback": True}
+
+    kept = len(events)
+    events.extend(_dropped_summaries())
+    events.extend(summaries)
+    return {"events": events, "cursor": cursor, "read": read, "kept": kept, "skipped": skipped,
+            "fallback": False}
 
+
+def _advance_cursor(cursor):
+    global _JOURNAL_CURSOR
+    _JOURNAL_CURSOR = cursor
+
+
+def store_system_events(ts, batch_id, result):
+    """
+    sample_system_events() 결과를 템플릿 인코딩 후 저장하고, 커밋이 확정되면 journal 커서를 전진시킵니다.
+    """
+    if result is None:
+        return None
+
+    events = [SystemEvent(**row) for row in result["events"]]
     db = SessionLocal()
-    count = 0
+    undo = []
     try:
-        for line in lines:
-            if not line.strip(): continue
-            try:
-                data = json.loads(line)
-                # PRIORITY: 0 (emerg) to 7 (debug)
-                prio = int(data.get('PRIORITY', 6))
-                severity = ["EMERG", "ALERT", "CRIT", "ERR", "WARNING", "NOTICE", "INFO", "DEBUG"][prio]
-                
-                # Timestamp in microseconds
-                msg_ts = datetime.fromtimestamp(int(data.get('__REALTIME_TIMESTAMP', 0)) / 1_000_000)
-                
-                new_event = SystemEvent(
-                    ts=msg_ts,
-                    event_type="journal",
-                    severity=severity,
-                    source=data.get('SYSLOG_IDENTIFIER', 'unknown'),
-                    message=data.get('MESSAGE', '')
-                )
-                db.add(new_event)
-                count += 1
-            except Exception:
-                continue
-        
+        encoded = template_miner.encode(db, events, undo) if LOG_TEMPLATE_MINING else 0
+        db.add_all(events)
         db.commit()
+        # 배치 쓰기(write_batch) 중이면 위 commit은 SAVEPOINT 해제일 뿐이므로 최종 커밋 이후에 확정
+        on_rollback(lambda: template_miner.rollback(undo))
+        if result["fallback"]:
+            return f"System: {len(events)} events collected (fallback)"
+        on_commit(lambda: _advance_cursor(result["cursor"]))
+        dropped = result["read"] - result["kept"] + result.get("skipped", 0)
+        if dropped > 0:
+            logger.warning(f"로그 폭주: {result['read'] + result.get('skipped', 0)}줄 중 {dropped}줄 버림")
+        count = len(events)
         if count > 0:
-            logger.info(f"System events saved: {count} entries")
-            return f"System: {count} events collected"
+            logger.info(f"System events saved: {count} entries ({encoded} templated)")
+            return f"System: {count} events collected" + (f", {dropped} dropped" if dropped > 0 else "")
         return "System: 0 events"
     except Exception as e:
         db.rollback()
+        template_miner.rollback(undo)
         logger.error(f"Error saving system events: {e}")
         return None
     finally:
         db.close()
 
+
+def collect_system_events(ts=None, batch_id=None):
+    """
+    Collects system events from journalctl in JSON format.
+    """
+    ts = ts or datetime.now()
+    return store_system_events(ts, batch_id, sample_system_events(ts, batch_id, **journal_context()))
+
+
 def parse_basic_syslog(lines, ts):
     # Basic fallback parsing logic
-    db = SessionLocal()
-    count = 0
-    try:
-        for line in lines:
-            if not line.strip(): continue
-            new_event = SystemEvent(
-                ts=ts or datetime.now(),
-                event_type="syslog",
-                severity="INFO",
-                source="system",
-                message=line.strip()
-            )
-            db.add(new_event)
-            count += 1
-        db.commit()
-        return f"System: {count} events collected (fallback)"
-    except Exception as e:
-        db.rollback()
-        return None
-    finally:
-        db.close()
+    return [
+        {
+            "ts": ts or datetime.now(),
+            "event_type": "syslog",
+            "severity": "INFO",
+            "source": "system",
+            "message": line.strip(),
+        }
+        for line in lines
+        if line.strip()
+    ]
@@ -0,0 +1,216 @@
+"""
+journal 메시지 템플릿 마이닝 (Drain 방식, He et al. 2017)
+
+대부분의 journal 메시지는 수백 개 템플릿에 변수만 바뀌어 반복되므로,
+원문 대신 템플릿 ID + 파라미터(JSON 배열)만 ops_events.system_events에 저장합니다.
+
+- 파스 트리: 토큰 수 → 앞쪽 DEPTH-2개 토큰(숫자 포함 토큰은 <*>) → 리프의 템플릿 그룹
+- 리프에서 유사도(일치 토큰 비율)가 가장 높은 그룹이 SIM_THRESHOLD 이상이면 병합,
+  서로 다른 자리는 <*>로 일반화합니다.
+- 이미 저장된 행의 파라미터 위치가 어긋나지 않도록 템플릿이 일반화되면 기존 행을 수정하지 않고
+  새 ID를 발급합니다. (이전 템플릿은 superseded_by로 연결만 함)
+  그룹 자체는 최초 템플릿 ID를 cluster_id로 계속 유지하므로, 발생 횟수 집계는 cluster_id로 GROUP BY 합니다.
+- 원문은 공백 하나 단위로 다시 이어 붙여 복원하므로, 그렇게 복원되지 않는 메시지(연속 공백, 탭 등)나
+  '<*>' 토큰을 포함한 메시지는 인코딩하지 않고 message에 원문 그대로 저장합니다. (무손실)
+"""
+import json
+import logging
+import os
+from sqlalchemy import update
+from .models import LogTemplate
+
+logger = logging.getLogger("TEMPLATE")
+
+WILDCARD = "<*>"
+
+LOG_TEMPLATE_MINING = os.getenv("LOG_TEMPLATE_MINING", "true").lower() == "true"
+# 파스 트리 깊이 (토큰 수 노드 + 앞쪽 DEPTH-2개 토큰 노드)
+TEMPLATE_DEPTH = int(os.getenv("LOG_TEMPLATE_DEPTH", "4"))
+TEMPLATE_SIM_THRESHOLD = float(os.getenv("LOG_TEMPLATE_SIM", "0.4"))
+# 노드당 자식 수 제한. 넘으면 새 토큰은 <*> 자식으로 보냄 (트리 폭주 방지)
+TEMPLATE_MAX_CHILDREN = int(os.getenv("LOG_TEMPLATE_MAX_CHILDREN", "100"))
+# 이보다 긴 메시지는 템플릿화하지 않음 (스택 트레이스 등)
+TEMPLATE_MAX_TOKENS = int(os.getenv("LOG_TEMPLATE_MAX_TOKENS", "80"))
+
+
+def _has_digit(token):
+    return any(ch.isdigit() for ch in token)
+
+
+class LogCluster:
+    """
+    템플릿 그룹 하나. template_id가 None이면 아직 DB에 저장되지 않은 상태.
+    cluster_id는 그룹의 최초 템플릿 ID로, 일반화되어 template_id가 바뀌어도 그대로 유지됩니다.
+    """
+    __slots__ = ("tokens", "template_id", "cluster_id", "dirty")
+
+    def __init__(self, tokens, template_id=None, cluster_id=None):
+        self.tokens = list(tokens)
+        self.template_id = template_id
+        self.cluster_id = cluster_id
+        self.dirty = template_id is None
+
+    def similarity(self, tokens):
+        same = 0
+        params = 0
+        for t, token in zip(self.tokens, tokens):
+            if t == WILDCARD:
+                params += 1
+            elif t == token:
+                same += 1
+        return same / len(tokens), params
+
+    def merge(self, tokens):
+        for i, (t, token) in enumerate(zip(self.tokens, tokens)):
+            if t != WILDCARD and t != token:
+                self.tokens[i] = WILDCARD
+                self.dirty = True
+
+    def extract(self, tokens):
+        return [token for t, token in zip(self.tokens, tokens) if t == WILDCARD]
+
+    @property
+    def template(self):
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    def __init__(self, depth=TEMPLATE_DEPTH, sim_threshold=TEMPLATE_SIM_THRESHOLD, max_children=TEMPLATE_MAX_CHILDREN):
+        self.depth = max(depth, 3)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        # {토큰 수: 중첩 dict ... → [LogCluster]}
+        self.root = {}
+        self.loaded = False
+
+    @staticmethod
+    def tokenize(message):
+        """
+        템플릿화 가능한 메시지면 토큰 리스트, 아니면 None
+        """
+        if not message:
+            return None
+        tokens = message.split()
+        if not tokens or len(tokens) > TEMPLATE_MAX_TOKENS or WILDCARD in tokens:
+            return None
+        # 공백 하나로 다시 이어 원문이 그대로 나와야 무손실 복원 가능
+        if " ".join(tokens) != message:
+            return None
+        return tokens
+
+    def _leaf(self, tokens):
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if _has_digit(token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        # 리프 노드의 None 키에 템플릿 그룹 목록 보관
+        return node.setdefault(None, [])
+
+    def _match(self, clusters, tokens):
+        best, best_sim, best_params = None, -1.0, -1
+        for cluster in clusters:
+            sim, params = cluster.similarity(tokens)
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = cluster, sim, params
+        if best is not None and best_sim >= self.sim_threshold:
+            return best
+        return None
+
+    def learn(self, tokens):
+        """
+        토큰 리스트를 트리에 반영하고 속한 LogCluster를 반환합니다.
+        """
+        clusters = self._leaf(tokens)
+        cluster = self._match(clusters, tokens)
+        if cluster is None:
+            cluster = LogCluster(tokens)
+            clusters.append(cluster)
+        else:
+            cluster.merge(tokens)
+        return cluster
+
+    def _insert_loaded(self, tokens, template_id, cluster_id):
+        # 저장된 템플릿의 <*> 자리는 숫자 포함 토큰과 같은 경로(<*> 노드)로 들어감
+        self._leaf(tokens).append(LogCluster(tokens, template_id, cluster_id))
+
+    def load(self, db):
+        """
+        현재 유효한(대체되지 않은) 템플릿으로 트리를 재구성합니다.
+        """
+        rows = (
+            db.query(LogTemplate.id, LogTemplate.template, LogTemplate.cluster_id)
+            .filter(LogTemplate.superseded_by.is_(None))
+            .all()
+        )
+        for template_id, template, cluster_id in rows:
+            self._insert_loaded(template.split(" "), template_id, cluster_id or template_id)
+        self.loaded = True
+        logger.info(f"메시지 템플릿 {len(rows)}개 로드")
+
+    def _persist(self, db, clusters, undo):
+        """
+        새로 생겼거나 일반화된 템플릿에 ID를 발급합니다. 롤백용 (cluster, 이전 ID, 이전 그룹 ID)를 undo에 쌓습니다.
+        """
+        for cluster in clusters:
+            if not cluster.dirty:
+                continue
+            undo.append((cluster, cluster.template_id, cluster.cluster_id))
+            row = LogTemplate(template=cluster.template, token_count=len(cluster.tokens), cluster_id=cluster.cluster_id)
+            db.add(row)
+            db.flush()
+            if cluster.template_id is not None:
+                db.execute(
+                    update(LogTemplate).where(LogTemplate.id == cluster.template_id).values(superseded_by=row.id)
+                )
+            if cluster.cluster_id is None:
+                # 새 그룹: 최초 템플릿 ID가 그룹 ID
+                row.cluster_id = row.id
+            cluster.template_id = row.id
+            cluster.cluster_id = row.cluster_id
+            cluster.dirty = False
+
+    def encode(self, db, events, undo):
+        """
+        journal 이벤트들의 message를 template_id + params로 바꿉니다. (db 세션 안에서 호출, 커밋은 호출 측)
+        커밋이 실패하면 undo 목록을 rollback(undo)에 넘겨 ID 발급을 되돌립니다.
+        """
+        if not self.loaded:
+            self.load(db)
+
+        # 1) 배치 전체를 먼저 학습: 같은 배치 안에서 템플릿이 일반화되어도 최종 템플릿 기준으로 파라미터 추출
+        encoded = []
+        for event in events:
+            tokens = self.tokenize(event.message)
+            if tokens is not None:
+                encoded.append((event, tokens, self.learn(tokens)))
+
+        # 2) 변경된 템플릿만 ID 발급
+        self._persist(db, {id(c): c for _, _, c in encoded}.values(), undo)
+
+        # 3) 최종 템플릿 기준 파라미터 추출 (일반화만 일어나므로 배치 내 이전 메시지도 일치)
+        for event, tokens, cluster in encoded:
+            event.template_id = cluster.template_id
+            event.cluster_id = cluster.cluster_id
+            event.params = json.dumps(cluster.extract(tokens), ensure_ascii=False)
+            event.message = None
+        return len(encoded)
+
+    @staticmethod
+    def rollback(undo):
+        for cluster, previous_id, previous_cluster_id in undo:
+            cluster.template_id = previous_id
+            cluster.cluster_id = previous_cluster_id
+            cluster.dirty = True
+
+
+def render(template, params):
+    """
+    템플릿 + 파라미터 → 원문 (ops_events.render_template()과 동일한 규칙)
+    """
+    values = iter(json.loads(params) if isinstance(params, str) else params)
+    return " ".join(next(values, "") if t == WILDCARD else t for t in template.split(" "))
+
+
+template_miner = TemplateMiner()
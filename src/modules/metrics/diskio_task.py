@@ -0,0 +1,155 @@
+"""
+디스크 I/O 처리량/지연 수집 모듈 (/proc/diskstats)
+
+용량(metrics_disk)만으로는 I/O 포화를 알 수 없으므로, 매 틱 /proc/diskstats를 한 번 읽어
+직전 틱 카운터와의 차분으로 디바이스별 IOPS, 처리량, 평균 대기 시간(await), 사용률을 계산합니다.
+
+- 카운터는 커널/필드에 따라 32비트 또는 64비트이므로 감소하면 랩어라운드로 보정합니다.
+  (보정값이 비정상적으로 크면 디바이스 재등록/카운터 초기화로 보고 현재값을 증가분으로 사용)
+- 파티션은 제외하고 /sys/block에 있는 전체 디바이스만 기록합니다. (이중 집계 방지)
+- 첫 틱은 기준값만 저장합니다.
+"""
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from src.database.connection import SessionLocal
+from src.modules.analysis.pipeline import Sample, publish_samples
+from .models import DiskIoMetric
+
+logger = logging.getLogger("DISK_IO")
+
+PROC_ROOT = os.getenv("PROC_ROOT", "/proc")
+SYS_BLOCK = os.getenv("SYS_BLOCK", "/sys/block")
+# 기록하지 않을 디바이스 (루프/램디스크/광학 드라이브 등)
+DISKIO_EXCLUDE = re.compile(os.getenv("DISKIO_EXCLUDE", r"^(loop|ram|zram|fd|sr)\d*$"))
+
+# /proc/diskstats 섹터 단위는 디바이스와 무관하게 항상 512바이트
+SECTOR_BYTES = 512
+
+# device -> read_diskstats() 튜플 (직전 틱)
+_LAST_DISK_IO = {}
+_LAST_DISK_IO_TS = None
+
+
+def _counter_delta(cur, prev):
+    """
+    누적 카운터 증가분. 값이 줄었으면 32비트(직전값이 2^32 미만) 또는 64비트 랩어라운드로 보정합니다.
+    """
+    if cur >= prev:
+        return cur - prev
+    width = 1 << 32 if prev < (1 << 32) else 1 << 64
+    wrapped = cur + width - prev
+    # 카운터 범위의 절반 이상 증가했다면 랩어라운드가 아니라 초기화(디바이스 재등록)
+    return wrapped if wrapped < width // 2 else cur
+
+
+def _whole_devices():
+    try:
+        return set(os.listdir(SYS_BLOCK))
+    except OSError:
+        return None
+
+
+def read_diskstats():
+    """
+    {device: (reads, sectors_read, ms_reading, writes, sectors_written, ms_writing, in_flight, ms_io, weighted_ms)}
+    """
+    whole = _whole_devices()
+    stats = {}
+    with open(f"{PROC_ROOT}/diskstats") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            device = fields[2]
+            if DISKIO_EXCLUDE.match(device):
+                continue
+            # /sys/block 조회가 안 되면 파티션 구분 없이 모두 기록
+            if whole is not None and device not in whole:
+                continue
+            v = fields[3:14]
+            stats[device] = (
+                int(v[0]), int(v[2]), int(v[3]),   # reads completed, sectors read, ms reading
+                int(v[4]), int(v[6]), int(v[7]),   # writes completed, sectors written, ms writing
+                int(v[8]), int(v[9]), int(v[10]),  # in flight, ms doing I/O, weighted ms
+            )
+    return stats
+
+
+def collect_disk_io_metrics(ts=None, batch_id=None):
+    global _LAST_DISK_IO, _LAST_DISK_IO_TS
+
+    metric_time = ts if ts else datetime.now()
+    batch_id = batch_id or metric_time.isoformat()
+    now_ts = time.monotonic()
+    try:
+        stats = read_diskstats()
+    except OSError as e:
+        logger.error(f"/proc/diskstats 읽기 실패: {e}")
+        return None
+
+    prev_stats, prev_ts = _LAST_DISK_IO, _LAST_DISK_IO_TS
+    _LAST_DISK_IO, _LAST_DISK_IO_TS = stats, now_ts
+    if prev_ts is None:
+        return None
+    dt = now_ts - prev_ts
+    if dt <= 0:
+        return None
+
+    metrics_to_save = []
+    for device, cur in stats.items():
+        prev = prev_stats.get(device)
+        if prev is None:
+            continue
+        reads, sectors_read, ms_reading, writes, sectors_written, ms_writing, in_flight, ms_io, weighted_ms = cur
+        d_reads = _counter_delta(reads, prev[0])
+        d_sectors_read = _counter_delta(sectors_read, prev[1])
+        d_ms_reading = _counter_delta(ms_reading, prev[2])
+        d_writes = _counter_delta(writes, prev[3])
+        d_sectors_written = _counter_delta(sectors_written, prev[4])
+        d_ms_writing = _counter_delta(ms_writing, prev[5])
+        d_ms_io = _counter_delta(ms_io, prev[7])
+        d_weighted_ms = _counter_delta(weighted_ms, prev[8])
+
+        metrics_to_save.append(DiskIoMetric(
+            ts=metric_time,
+            batch_id=batch_id,
+            device=device,
+            read_iops=round(d_reads / dt, 2),
+            write_iops=round(d_writes / dt, 2),
+            read_bps=round(d_sectors_read * SECTOR_BYTES / dt, 2),
+            write_bps=round(d_sectors_written * SECTOR_BYTES / dt, 2),
+            read_await_ms=round(d_ms_reading / d_reads, 2) if d_reads else 0.0,
+            write_await_ms=round(d_ms_writing / d_writes, 2) if d_writes else 0.0,
+            util_percent=round(min(d_ms_io / (dt * 1000) * 100, 100.0), 2),
+            queue_depth=round(d_weighted_ms / (dt * 1000), 2),
+            in_flight=in_flight,
+        ))
+
+    if not metrics_to_save:
+        return None
+
+    db = SessionLocal()
+    try:
+        db.bulk_save_objects(metrics_to_save)
+        db.commit()
+        publish_samples(metric_time, [
+            sample
+            for m in metrics_to_save
+            for sample in (
+                Sample("disk_util_percent", m.util_percent, "device", m.device),
+                Sample("disk_read_await_ms", m.read_await_ms, "device", m.device),
+                Sample("disk_write_await_ms", m.write_await_ms, "device", m.device),
+            )
+        ])
+        busiest = max(metrics_to_save, key=lambda m: m.util_percent)
+        logger.info(f"디스크 I/O 지표 저장 완료 ({len(metrics_to_save)}개 디바이스)")
+        return f"Disk I/O: {len(metrics_to_save)} devices (max util {busiest.device} {busiest.util_percent}%)"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"디스크 I/O 저장 중 오류 발생: {e}")
+        return None
+    finally:
+        db.close()
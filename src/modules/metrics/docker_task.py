@@ -1,29 +1,36 @@
 """
 Docker 메트릭 수집 모듈 (CLI 버전)
 
-파이썬 docker 라이브러리 대신, subprocess를 통해 docker CLI를 직접 호출합니다.
+파이썬 docker 라이브러리 대신, 공용 명령 실행기를 통해 docker CLI를 직접 호출합니다.
 이 방식은 서버의 도커 컨텍스트 설정과 무관하게 작동합니다.
 """
-import subprocess
 import json
 import logging
+import os
 from datetime import datetime
+from src.common.health import get_source
+from src.common.subprocess_runner import run_command
 from src.database.connection import SessionLocal
+from src.modules.analysis.pipeline import Sample, publish_samples
 from .models import DockerMetric
 
 logger = logging.getLogger("DOCKER")
 
+# docker stats는 보통 2초 내외. 10초 틱 안에 끝나도록 틱보다 짧게 잡음
+DOCKER_STATS_TIMEOUT = float(os.getenv("DOCKER_STATS_TIMEOUT", "8"))
 
-def collect_docker_metrics(ts=None, batch_id=None):
+_DOCKER_CLI = get_source("docker-cli")
+
+
+def sample_docker_metrics(ts, batch_id):
     """
-    docker CLI를 통해 실행 중인 컨테이너의 지표를 수집하여 DB에 저장합니다.
-    ts: main.py에서 전달받은 동기화된 타임스탬프
+    docker stats를 실행/파싱해 DockerMetric 컬럼 dict 목록을 반환합니다. (DB 접근 없음, 실패 시 None)
+    워커 프로세스 모드에서는 이 단계만 워커에서 실행됩니다.
     """
-    if ts is None:
-        ts = datetime.now()
-    batch_id = batch_id or ts.isoformat()
+    # docker CLI/데몬이 연속 실패 중이면 백오프가 끝날 때까지 즉시 건너뜀
+    if not _DOCKER_CLI.allow():
+        return None
 
-    db = SessionLocal()
     try:
         # docker stats 명령어 실행 (JSON 형식으로 1회 스냅샷)
         # --no-stream 옵션으로 1회만 출력하고 종료
@@ -33,81 +40,116 @@ def collect_docker_metrics(ts=None, batch_id=None):
             '--format', '{{json .}}'
         ]
         
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
-            text=True, 
-            timeout=30
-        )
-        
-        if result.returncode != 0:
-            logger.error(f"docker stats 명령 실패: {result.stderr}")
-            return None
-            
-        if not result.stdout.strip():
-            logger.info("실행 중인 컨테이너가 없습니다.")
-            return "Docker: 0 containers"
-
-        metrics_to_save = []
-        for line in result.stdout.strip().split('\n'):
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
-                
-                # CPU 사용률 파싱 (예: "0.50%")
-                cpu_str = data.get('CPUPerc', '0%').replace('%', '')
-                cpu_percent = float(cpu_str) if cpu_str else 0.0
-                
-                # 메모리 사용량 파싱 (예: "50MiB / 7.66GiB")
-                mem_str = data.get('MemUsage', '0MiB / 0GiB')
-                mem_used_str = mem_str.split('/')[0].strip()
-                
-                # MiB, GiB, KiB 단위 처리
-                mem_used_mb = 0.0
-                if 'GiB' in mem_used_str:
-                    mem_used_mb = float(mem_used_str.replace('GiB', '').strip()) * 1024
-                elif 'MiB' in mem_used_str:
-                    mem_used_mb = float(mem_used_str.replace('MiB', '').strip())
-                elif 'KiB' in mem_used_str:
-                    mem_used_mb = float(mem_used_str.replace('KiB', '').strip()) / 1024
-                
-                # 메모리 퍼센트 파싱 (예: "0.64%")
-                mem_percent_str = data.get('MemPerc', '0%').replace('%', '')
-                mem_percent = float(mem_percent_str) if mem_percent_str else 0.0
-                
-                new_metric = DockerMetric(
-                    ts=ts,
-                    batch_id=batch_id,
-                    container_id=data.get('ID', 'unknown')[:12],
-                    container_name=data.get('Name', 'unknown'),
-                    cpu_percent=cpu_percent,
-                    mem_used_mb=mem_used_mb,
-                    mem_percent=mem_percent
-                )
-                metrics_to_save.append(new_metric)
-                
-            except (json.JSONDecodeError, ValueError, KeyError) as e:
-                logger.warning(f"컨테이너 데이터 파싱 실패: {e}")
-                continue
+        result = run_command(cmd, timeout=DOCKER_STATS_TIMEOUT)
+    except FileNotFoundError as e:
+        _DOCKER_CLI.record_failure(e)
+        logger.error("docker 명령을 찾을 수 없습니다. 컨테이너에 docker CLI가 설치되어 있는지 확인하세요.")
+        return None
+    except Exception as e:
+        # 어떤 예외든 실패로 기록해야 half-open 시험 호출이 끝남
+        _DOCKER_CLI.record_failure(e)
+        logger.error(f"docker stats 실행 중 오류 발생: {e}")
+        return None
 
-        if metrics_to_save:
-            db.bulk_save_objects(metrics_to_save)
-            db.commit()
-            logger.info(f"도커 지표 저장 완료 ({len(metrics_to_save)}개 컨테이너)")
-            return f"Docker: {len(metrics_to_save)} containers collected"
-        
-        return "Docker: 0 containers"
-        
-    except subprocess.TimeoutExpired:
+    if result.timed_out:
+        _DOCKER_CLI.record_failure("docker stats timeout")
         logger.error("docker stats 명령이 시간 초과되었습니다.")
         return None
-    except FileNotFoundError:
-        logger.error("docker 명령을 찾을 수 없습니다. 컨테이너에 docker CLI가 설치되어 있는지 확인하세요.")
+    if result.returncode != 0:
+        _DOCKER_CLI.record_failure(result.stderr)
+        logger.error(f"docker stats 명령 실패: {result.stderr}")
         return None
+    _DOCKER_CLI.record_success()
+
+    rows = []
+    for line in result.stdout.strip().split('\n'):
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            
+            # CPU 사용률 파싱 (예: "0.50%")
+            cpu_str = data.get('CPUPerc', '0%').replace('%', '')
+            cpu_percent = float(cpu_str) if cpu_str else 0.0
+            
+            # 메모리 사용량 파싱 (예: "50MiB / 7.66GiB")
+            mem_str = data.get('MemUsage', '0MiB / 0GiB')
+            mem_used_str = mem_str.split('/')[0].strip()
+            
+            # MiB, GiB, KiB 단위 처리
+            mem_used_mb = 0.0
+            if 'GiB' in mem_used_str:
+                mem_used_mb = float(mem_used_str.replace('GiB', '').strip()) * 1024
+            elif 'MiB' in mem_used_str:
+                mem_used_mb = float(mem_used_str.replace('MiB', '').strip())
+            elif 'KiB' in mem_used_str:
+                mem_used_mb = float(mem_used_str.replace('KiB', '').strip()) / 1024
+            
+            # 메모리 퍼센트 파싱 (예: "0.64%")
+            mem_percent_str = data.get('MemPerc', '0%').replace('%', '')
+            mem_percent = float(mem_percent_str) if mem_percent_str else 0.0
+            
+            rows.append({
+                "ts": ts,
+                "batch_id": batch_id,
+                "container_id": data.get('ID', 'unknown')[:12],
+                "container_name": data.get('Name', 'unknown'),
+                "cpu_percent": cpu_percent,
+                "mem_used_mb": mem_used_mb,
+                "mem_percent": mem_percent,
+            })
+            
+        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            logger.warning(f"컨테이너 데이터 파싱 실패: {e}")
+            continue
+    return rows
+
+
+def store_docker_metrics(ts, batch_id, rows):
+    """
+    sample_docker_metrics() 결과를 저장하고 분석 파이프라인에 전달합니다.
+    """
+    if rows is None:
+        return None
+    if not rows:
+        logger.info("실행 중인 컨테이너가 없습니다.")
+        return "Docker: 0 containers"
+
+    db = SessionLocal()
+    try:
+        metrics_to_save = [DockerMetric(**row) for row in rows]
+        db.bulk_save_objects(metrics_to_save)
+        db.commit()
+        publish_samples(ts, [
+            sample
+            for m in metrics_to_save
+            for sample in (
+                Sample("cpu_percent", m.cpu_percent, "container", m.container_name),
+                Sample("mem_percent", m.mem_percent, "container", m.container_name),
+                Sample("mem_used_mb", m.mem_used_mb, "container", m.container_name),
+            )
+        ])
+        logger.info(f"도커 지표 저장 완료 ({len(metrics_to_save)}개 컨테이너)")
+        return f"Docker: {len(metrics_to_save)} containers collected"
     except Exception as e:
         db.rollback()
         logger.error(f"도커 수집 중 오류 발생: {e}")
         return None
     finally:
         db.close()
+
+
+def collect_docker_metrics(ts=None, batch_id=None):
+    """
+    docker CLI를 통해 실행 중인 컨테이너의 지표를 수집하여 DB에 저장합니다.
+    ts: main.py에서 전달받은 동기화된 타임스탬프
+    """
+    if ts is None:
+        ts = datetime.now()
+    batch_id = batch_id or ts.isoformat()
+    try:
+        rows = sample_docker_metrics(ts, batch_id)
+    except Exception as e:
+        logger.error(f"도커 수집 중 오류 발생: {e}")
+        return None
+    return store_docker_metrics(ts, batch_id, rows)
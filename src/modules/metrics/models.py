@@ -19,8 +19,8 @@ class CpuMetric(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
-    batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
     core_count = Column(Integer, comment="논리 코어 수.")
     cpu_percent = Column(Float, comment="전체 CPU 사용률(%).")
@@ -32,6 +32,9 @@ class CpuMetric(Base):
     load_15min = Column(Float, comment="15분 평균 부하(load average).")
 
 
+Index("brin_cpu_ts", CpuMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+
+
 class MemoryMetric(Base):
     """
     메모리 상세 정보
@@ -43,7 +46,7 @@ class MemoryMetric(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
     batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
     mem_total_mb = Column(Float, comment="총 메모리 용량(MB).")
@@ -56,6 +59,9 @@ class MemoryMetric(Base):
     swap_used_mb = Column(Float, comment="사용 중 스왑 메모리(MB).")
 
 
+Index("brin_memory_ts", MemoryMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+
+
 class DiskMetric(Base):
     """
     마운트 포인트별 디스크 사용량
@@ -67,7 +73,7 @@ class DiskMetric(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
     batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
     mount = Column(Text, nullable=False, comment="마운트 지점(예: /, /home).")
@@ -77,7 +83,86 @@ class DiskMetric(Base):
     disk_percent = Column(Float, comment="디스크 사용률(%).")
 
 
-Index("idx_disk_mount", DiskMetric.mount)
+Index("brin_disk_ts", DiskMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+# "마운트 X의 최근 N시간" 조회를 인덱스만으로 처리 (Index Only Scan)
+Index(
+    "idx_disk_mount_ts",
+    DiskMetric.mount,
+    DiskMetric.ts,
+    postgresql_include=["disk_percent", "disk_used_gb"],
+)
+
+
+class DiskIoMetric(Base):
+    """
+    블록 디바이스별 I/O 처리량/지연 (/proc/diskstats)
+    """
+    __tablename__ = "metrics_disk_io"
+    __table_args__ = {
+        "schema": "ops_metrics",
+        "comment": "블록 디바이스별 IOPS/처리량/평균 대기 시간/사용률을 저장하는 테이블. /proc/diskstats 누적 카운터의 직전 주기 대비 차분.",
+    }
+
+    id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+
+    device = Column(Text, nullable=False, comment="블록 디바이스명(예: sda, nvme0n1).")
+    read_iops = Column(Float, comment="초당 완료된 읽기 요청 수.")
+    write_iops = Column(Float, comment="초당 완료된 쓰기 요청 수.")
+    read_bps = Column(Float, comment="초당 읽기 바이트(bytes/s).")
+    write_bps = Column(Float, comment="초당 쓰기 바이트(bytes/s).")
+    read_await_ms = Column(Float, comment="읽기 요청당 평균 소요 시간(ms, 대기+처리).")
+    write_await_ms = Column(Float, comment="쓰기 요청당 평균 소요 시간(ms, 대기+처리).")
+    util_percent = Column(Float, comment="디바이스가 I/O를 처리 중이던 시간 비율(%). 100%에 가까우면 포화.")
+    queue_depth = Column(Float, comment="평균 대기열 길이 (가중 I/O 시간 / 경과 시간).")
+    in_flight = Column(Integer, comment="수집 시점에 처리 중인 I/O 수.")
+
+
+Index("brin_disk_io_ts", DiskIoMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index(
+    "idx_disk_io_device_ts",
+    DiskIoMetric.device,
+    DiskIoMetric.ts,
+    postgresql_include=["util_percent", "read_await_ms", "write_await_ms"],
+)
+
+
+class PressureMetric(Base):
+    """
+    PSI(Pressure Stall Information) - 자원 부족으로 태스크가 멈춘 시간 비율
+    """
+    __tablename__ = "metrics_pressure"
+    __table_args__ = {
+        "schema": "ops_metrics",
+        "comment": "호스트(/proc/pressure)와 컨테이너(cgroup v2 *.pressure)의 CPU/메모리/IO 압력(PSI) 테이블. 사용률보다 먼저 포화를 드러냄.",
+    }
+
+    id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+
+    scope = Column(Text, nullable=False, comment="범위 (host / container).")
+    entity = Column(Text, comment="컨테이너 이름 (host는 NULL).")
+    container_id = Column(Text, comment="도커 컨테이너 ID(12자리). host는 NULL.")
+    resource = Column(Text, nullable=False, comment="자원 (cpu / memory / io).")
+    some_avg10 = Column(Float, comment="일부 태스크가 멈춰 있던 시간 비율(%), 10초 평균.")
+    some_avg60 = Column(Float, comment="일부 태스크가 멈춰 있던 시간 비율(%), 60초 평균.")
+    some_stall_ms = Column(Float, comment="직전 수집 이후 'some' 누적 정체 시간 증가분(ms).")
+    full_avg10 = Column(Float, comment="모든 태스크가 멈춰 있던 시간 비율(%), 10초 평균. (host cpu는 커널에 따라 0)")
+    full_avg60 = Column(Float, comment="모든 태스크가 멈춰 있던 시간 비율(%), 60초 평균.")
+    full_stall_ms = Column(Float, comment="직전 수집 이후 'full' 누적 정체 시간 증가분(ms).")
+
+
+Index("brin_pressure_ts", PressureMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index(
+    "idx_pressure_entity_ts",
+    PressureMetric.scope,
+    PressureMetric.entity,
+    PressureMetric.resource,
+    PressureMetric.ts,
+    postgresql_include=["some_avg10", "full_avg10"],
+)
 
 
 class NetworkMetric(Base):
@@ -91,17 +176,23 @@ class NetworkMetric(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
     batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
-    interface = Column(Text, nullable=False, comment="네트워크 인터페이스명(예: eth0).")
+    interface = Column(Text, nullable=False, comment="네트워크 인터페이스명(예: eth0). veth 등 가상 인터페이스는 브리지별 합계 행(virtual@docker0)으로 저장.")
     rx_bytes = Column(BigInteger, comment="누적 수신 바이트.")
     tx_bytes = Column(BigInteger, comment="누적 송신 바이트.")
     rx_rate_bps = Column(Float, comment="초당 수신 속도(bps).")
     tx_rate_bps = Column(Float, comment="초당 송신 속도(bps).")
 
 
-Index("idx_network_interface", NetworkMetric.interface)
+Index("brin_network_ts", NetworkMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index(
+    "idx_network_interface_ts",
+    NetworkMetric.interface,
+    NetworkMetric.ts,
+    postgresql_include=["rx_rate_bps", "tx_rate_bps"],
+)
 
 
 class DockerMetric(Base):
@@ -115,12 +206,56 @@ class DockerMetric(Base):
     )
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
-    batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
     container_id = Column(Text, nullable=False, comment="도커 컨테이너 ID.")
-    container_name = Column(Text, nullable=False, index=True, comment="도커 컨테이너 이름.")
+    container_name = Column(Text, nullable=False, comment="도커 컨테이너 이름.")
 
     cpu_percent = Column(Float, comment="컨테이너 CPU 사용률(%).")
     mem_used_mb = Column(Float, comment="컨테이너 메모리 사용량(MB).")
     mem_percent = Column(Float, comment="컨테이너 메모리 사용률(%).")
+
+
+Index("brin_docker_ts", DockerMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+# "컨테이너 X의 최근 1시간" 조회용 복합 인덱스
+Index(
+    "idx_docker_container_ts",
+    DockerMetric.container_name,
+    DockerMetric.ts,
+    postgresql_include=["cpu_percent", "mem_percent", "mem_used_mb"],
+)
+
+
+class ProcessMetric(Base):
+    """
+    프로세스별 자원 사용량 Top-N 스냅샷
+    """
+    __tablename__ = "metrics_process"
+    __table_args__ = {
+        "schema": "ops_metrics",
+        "comment": "매 수집 주기마다 CPU/RSS/IO 기준 상위 N개 프로세스를 저장하는 테이블. 호스트 자원을 '무엇이' 쓰는지 추적용.",
+    }
+
+    id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+
+    pid = Column(Integer, nullable=False, comment="프로세스 ID.")
+    process_name = Column(Text, nullable=False, comment="프로세스 이름(comm).")
+    cmdline = Column(Text, comment="실행 명령줄(최대 512바이트).")
+    user_name = Column(Text, comment="프로세스 소유 사용자.")
+    cpu_percent = Column(Float, comment="직전 주기 대비 CPU 사용률(%). 코어 1개 = 100%.")
+    rss_mb = Column(Float, comment="상주 메모리(RSS, MB).")
+    read_rate_bps = Column(Float, comment="초당 디스크 읽기(bytes/s).")
+    write_rate_bps = Column(Float, comment="초당 디스크 쓰기(bytes/s).")
+    rank_by = Column(Text, comment="선정 기준 (cpu/rss/io 중 하나 이상, 쉼표 구분).")
+
+
+Index("brin_process_ts", ProcessMetric.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index(
+    "idx_process_name_ts",
+    ProcessMetric.process_name,
+    ProcessMetric.ts,
+    postgresql_include=["cpu_percent", "rss_mb"],
+)
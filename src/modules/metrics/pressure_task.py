@@ -0,0 +1,239 @@
+"""
+PSI(Pressure Stall Information) 수집 모듈
+
+load average/CPU%만으로는 태스크가 실제로 자원을 기다리며 멈춰 있는지 알 수 없으므로,
+커널의 PSI 지표를 매 틱 기록합니다.
+- 호스트   : /proc/pressure/{cpu,memory,io}
+- 컨테이너 : cgroup v2의 <컨테이너 cgroup>/{cpu,memory}.pressure
+
+파일 핸들은 한 번 열어 두고 매 틱 os.pread(fd, ..., 0)로 다시 읽습니다. (open/close 없이 시스템 콜 1회)
+컨테이너 cgroup 목록은 PSI_RESCAN_SECONDS마다 다시 스캔하며, cgroup이 사라진 핸들은 닫습니다.
+total(누적 정체 시간, µs)은 직전 틱과의 차분을 ms로 저장합니다.
+
+컨테이너 안에서 실행할 때는 호스트 cgroup 트리를 마운트하고 CGROUP_ROOT로 지정합니다.
+    volumes: - /sys/fs/cgroup:/host/sys/fs/cgroup:ro
+    CGROUP_ROOT=/host/sys/fs/cgroup
+"""
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from src.common.health import get_source
+from src.database.connection import SessionLocal
+from src.modules.analysis.pipeline import Sample, publish_samples
+from src.modules.events.docker_event_task import DOCKER_SOCKET, UnixHTTPConnection
+from .models import PressureMetric
+
+logger = logging.getLogger("PRESSURE")
+
+PROC_ROOT = os.getenv("PROC_ROOT", "/proc")
+CGROUP_ROOT = os.getenv("CGROUP_ROOT", "/sys/fs/cgroup")
+PSI_RESCAN_SECONDS = float(os.getenv("PSI_RESCAN_SECONDS", "60"))
+
+HOST_RESOURCES = ("cpu", "memory", "io")
+CONTAINER_RESOURCES = ("cpu", "memory")
+READ_SIZE = 256
+
+# systemd 드라이버: system.slice/docker-<id>.scope, cgroupfs 드라이버: docker/<id>
+_CONTAINER_CGROUP = re.compile(r"^(?:docker-)?([0-9a-f]{64})(?:\.scope)?$")
+_CONTAINER_PARENTS = ("system.slice", "docker")
+
+_DOCKER_API = get_source("docker-api")
+
+# path -> fd
+_FDS = {}
+# (scope, container_id, resource) -> (some_total_us, full_total_us)
+_LAST_PSI = {}
+# 컨테이너 ID(64자리) -> 이름
+_CONTAINER_NAMES = {}
+# [(container_id, cgroup 디렉토리)]
+_CONTAINER_CGROUPS = []
+_LAST_SCAN = None
+_LAST_PSI_TS = None
+
+
+def _cgroup_root():
+    # cgroup v1/v2 하이브리드 시스템은 unified 아래에 v2 트리가 있음
+    if not os.path.exists(f"{CGROUP_ROOT}/cgroup.controllers") and os.path.exists(f"{CGROUP_ROOT}/unified/cgroup.controllers"):
+        return f"{CGROUP_ROOT}/unified"
+    return CGROUP_ROOT
+
+
+def parse_pressure(text):
+    """
+    'some avg10=0.12 avg60=0.05 avg300=0.01 total=12345' 형식 → {"some": {...}, "full": {...}}
+    """
+    result = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        kind, *pairs = line.split()
+        values = {}
+        for pair in pairs:
+            key, _, value = pair.partition("=")
+            values[key] = int(value) if key == "total" else float(value)
+        result[kind] = values
+    return result
+
+
+def _read(path):
+    """
+    열어 둔 핸들로 다시 읽습니다. 파일이 사라졌으면(cgroup 삭제) 핸들을 닫고 None.
+    """
+    fd = _FDS.get(path)
+    try:
+        if fd is None:
+            fd = _FDS[path] = os.open(path, os.O_RDONLY)
+        return os.pread(fd, READ_SIZE, 0).decode()
+    except OSError:
+        _close(path)
+        return None
+
+
+def _close(path):
+    fd = _FDS.pop(path, None)
+    if fd is not None:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def _scan_containers():
+    root = _cgroup_root()
+    found = []
+    for parent in _CONTAINER_PARENTS:
+        try:
+            entries = os.listdir(f"{root}/{parent}")
+        except OSError:
+            continue
+        for entry in entries:
+            match = _CONTAINER_CGROUP.match(entry)
+            if match:
+                found.append((match.group(1), f"{root}/{parent}/{entry}"))
+    # 사라진 컨테이너의 핸들/기준값 정리
+    alive = {path for _, path in found}
+    for path in [p for p in _FDS if p.startswith(root) and os.path.dirname(p) not in alive]:
+        _close(path)
+    ids = {cid for cid, _ in found}
+    for key in [k for k in _LAST_PSI if k[0] == "container" and k[1] not in ids]:
+        del _LAST_PSI[key]
+    return found
+
+
+def _refresh_container_names(ids):
+    """
+    모르는 컨테이너 ID가 있을 때만 docker API(/containers/json)로 이름을 갱신합니다.
+    """
+    if not _DOCKER_API.allow():
+        return
+    conn = UnixHTTPConnection(DOCKER_SOCKET, timeout=3)
+    try:
+        conn.request("GET", "/containers/json")
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status != 200:
+            raise OSError(f"docker API HTTP {resp.status}: {body[:200]!r}")
+        containers = json.loads(body)
+        if not isinstance(containers, list):
+            raise ValueError(f"docker API 응답 형식 오류: {type(containers).__name__}")
+        _DOCKER_API.record_success()
+    except Exception as e:
+        _DOCKER_API.record_failure(e)
+        return
+    finally:
+        conn.close()
+    for c in containers:
+        if not isinstance(c, dict) or not isinstance(c.get("Id"), str):
+            continue
+        names = c.get("Names") or []
+        _CONTAINER_NAMES[c["Id"]] = names[0].lstrip("/") if names else c["Id"][:12]
+    for cid in ids:
+        # 목록에 없으면(이미 종료 등) 다음 스캔 때 다시 묻지 않도록 ID로 대체
+        _CONTAINER_NAMES.setdefault(cid, cid[:12])
+
+
+def _row(scope, container_id, resource, psi, dt, metric_time, batch_id, entity=None):
+    some = psi.get("some", {})
+    full = psi.get("full", {})
+    key = (scope, container_id, resource)
+    prev = _LAST_PSI.get(key)
+    totals = (some.get("total", 0), full.get("total", 0))
+    _LAST_PSI[key] = totals
+    if prev is None or dt is None:
+        return None
+    return PressureMetric(
+        ts=metric_time,
+        batch_id=batch_id,
+        scope=scope,
+        entity=entity,
+        container_id=container_id[:12] if container_id else None,
+        resource=resource,
+        some_avg10=some.get("avg10"),
+        some_avg60=some.get("avg60"),
+        some_stall_ms=round(max(totals[0] - prev[0], 0) / 1000, 3),
+        full_avg10=full.get("avg10"),
+        full_avg60=full.get("avg60"),
+        full_stall_ms=round(max(totals[1] - prev[1], 0) / 1000, 3),
+    )
+
+
+def collect_pressure_metrics(ts=None, batch_id=None):
+    global _CONTAINER_CGROUPS, _LAST_SCAN, _LAST_PSI_TS
+
+    metric_time = ts if ts else datetime.now()
+    batch_id = batch_id or metric_time.isoformat()
+    now = time.monotonic()
+    dt = now - _LAST_PSI_TS if _LAST_PSI_TS is not None else None
+    _LAST_PSI_TS = now
+
+    rows = []
+    for resource in HOST_RESOURCES:
+        text = _read(f"{PROC_ROOT}/pressure/{resource}")
+        if text is None:
+            continue
+        row = _row("host", None, resource, parse_pressure(text), dt, metric_time, batch_id)
+        if row:
+            rows.append(row)
+
+    if _LAST_SCAN is None or now - _LAST_SCAN >= PSI_RESCAN_SECONDS:
+        _CONTAINER_CGROUPS = _scan_containers()
+        _LAST_SCAN = now
+        unknown = [cid for cid, _ in _CONTAINER_CGROUPS if cid not in _CONTAINER_NAMES]
+        if unknown:
+            _refresh_container_names(unknown)
+
+    for cid, path in _CONTAINER_CGROUPS:
+        for resource in CONTAINER_RESOURCES:
+            text = _read(f"{path}/{resource}.pressure")
+            if text is None:
+                continue
+            name = _CONTAINER_NAMES.get(cid, cid[:12])
+            row = _row("container", cid, resource, parse_pressure(text), dt, metric_time, batch_id, entity=name)
+            if row:
+                rows.append(row)
+
+    if not rows:
+        # PSI 미지원 커널(CONFIG_PSI=n)이거나 첫 틱(기준값만 저장)
+        return None
+
+    db = SessionLocal()
+    try:
+        db.bulk_save_objects(rows)
+        db.commit()
+        publish_samples(metric_time, [
+            Sample(f"psi_{r.resource}_some", r.some_avg10, r.scope, r.entity)
+            for r in rows
+            if r.some_avg10 is not None
+        ])
+        host = {r.resource: r.some_avg10 for r in rows if r.scope == "host"}
+        logger.info(f"PSI 지표 저장 완료 ({len(rows)}행)")
+        return "PSI: " + ", ".join(f"{k} {v}%" for k, v in host.items()) + f" (+{len(rows) - len(host)} container rows)"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"PSI 저장 중 오류 발생: {e}")
+        return None
+    finally:
+        db.close()
@@ -0,0 +1,236 @@
+"""
+프로세스별 자원 사용량 Top-N 수집 모듈
+
+호스트 CPU/RAM 지표만으로는 "무엇이" 자원을 쓰는지 알 수 없으므로,
+매 틱마다 CPU/RSS/IO 기준 상위 N개 프로세스를 기록합니다.
+
+- /proc/<pid>/stat, /proc/<pid>/io만 매 틱 읽고, CPU/IO는 직전 틱과의 차분으로 계산합니다.
+- cmdline/사용자 정보는 새로 나타난 PID(또는 PID 재사용)일 때만 읽습니다.
+- psutil.process_iter()처럼 프로세스마다 객체를 만들지 않으므로 프로세스가 수천 개여도 비용이 일정합니다.
+"""
+import heapq
+import logging
+import os
+import pwd
+import time
+from datetime import datetime
+from src.database.connection import SessionLocal
+from .models import ProcessMetric
+
+logger = logging.getLogger("PROCESS")
+
+PROC_ROOT = os.getenv("PROC_ROOT", "/proc")
+PROCESS_TOP_N = int(os.getenv("PROCESS_TOP_N", "10"))
+CMDLINE_MAX_LEN = 512
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# pid -> {starttime, cpu_ticks, read_bytes, write_bytes, name, cmdline, user}
+_PROC_STATE = {}
+_LAST_PROC_TS = None
+_USER_CACHE = {}
+
+
+def _read_stat(pid):
+    """
+    /proc/<pid>/stat 에서 (comm, utime+stime, starttime, rss_pages)를 읽습니다.
+    comm에 공백/괄호가 들어갈 수 있으므로 마지막 ')' 기준으로 자릅니다.
+    """
+    with open(f"{PROC_ROOT}/{pid}/stat", "rb") as f:
+        raw = f.read()
+    lpar = raw.index(b"(")
+    rpar = raw.rindex(b")")
+    comm = raw[lpar + 1:rpar].decode("utf-8", "replace")
+    fields = raw[rpar + 2:].split()
+    # fields[0]은 state(3번째 필드) → utime=14, stime=15, starttime=22, rss=24
+    utime, stime = int(fields[11]), int(fields[12])
+    starttime = int(fields[19])
+    rss_pages = int(fields[21])
+    return comm, utime + stime, starttime, rss_pages
+
+
+def _read_io(pid):
+    try:
+        with open(f"{PROC_ROOT}/{pid}/io", "rb") as f:
+            read_bytes = write_bytes = None
+            for line in f:
+                if line.startswith(b"read_bytes:"):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith(b"write_bytes:"):
+                    write_bytes = int(line.split()[1])
+            return read_bytes, write_bytes
+    except (PermissionError, FileNotFoundError, ProcessLookupError):
+        return None, None
+
+
+def _user_name(uid):
+    if uid not in _USER_CACHE:
+        try:
+            _USER_CACHE[uid] = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            _USER_CACHE[uid] = str(uid)
+    return _USER_CACHE[uid]
+
+
+def _scan_identity(pid, comm):
+    """
+    새 PID에 대해서만 cmdline과 소유 사용자를 읽습니다.
+    """
+    cmdline = ""
+    try:
+        with open(f"{PROC_ROOT}/{pid}/cmdline", "rb") as f:
+            cmdline = f.read(CMDLINE_MAX_LEN).replace(b"\0", b" ").decode("utf-8", "replace").strip()
+    except (PermissionError, FileNotFoundError, ProcessLookupError):
+        pass
+    try:
+        user = _user_name(os.stat(f"{PROC_ROOT}/{pid}").st_uid)
+    except FileNotFoundError:
+        user = None
+    return {"name": comm, "cmdline": cmdline or f"[{comm}]", "user": user}
+
+
+def sample_processes():
+    """
+    /proc 전체를 한 번 훑어 PID별 CPU%/RSS/IO 속도를 계산합니다.
+    반환: [{pid, name, cmdline, user, cpu_percent, rss_mb, read_bps, write_bps}, ...]
+    """
+    global _PROC_STATE, _LAST_PROC_TS
+
+    now = time.monotonic()
+    dt = (now - _LAST_PROC_TS) if _LAST_PROC_TS else None
+    new_state = {}
+    samples = []
+
+    with os.scandir(PROC_ROOT) as it:
+        for entry in it:
+            if not entry.name.isdigit():
+                continue
+            pid = int(entry.name)
+            try:
+                comm, cpu_ticks, starttime, rss_pages = _read_stat(pid)
+            except (FileNotFoundError, ProcessLookupError, PermissionError, ValueError, IndexError):
+                continue
+
+            prev = _PROC_STATE.get(pid)
+            if prev is None or prev["starttime"] != starttime:
+                # 새 프로세스 또는 PID 재사용
+                identity = _scan_identity(pid, comm)
+                prev = None
+            else:
+                identity = prev
+            read_bytes, write_bytes = _read_io(pid)
+
+            cpu_percent = read_bps = write_bps = 0.0
+            if prev is not None and dt:
+                cpu_percent = max(cpu_ticks - prev["cpu_ticks"], 0) / _CLK_TCK / dt * 100.0
+                if read_bytes is not None and prev["read_bytes"] is not None:
+                    read_bps = max(read_bytes - prev["read_bytes"], 0) / dt
+                    write_bps = max(write_bytes - prev["write_bytes"], 0) / dt
+
+            new_state[pid] = {
+                "starttime": starttime,
+                "cpu_ticks": cpu_ticks,
+                "read_bytes": read_bytes,
+                "write_bytes": write_bytes,
+                "name": identity["name"],
+                "cmdline": identity["cmdline"],
+                "user": identity["user"],
+            }
+            samples.append({
+                "pid": pid,
+                "name": identity["name"],
+                "cmdline": identity["cmdline"],
+                "user": identity["user"],
+                "cpu_percent": cpu_percent,
+                "rss_mb": rss_pages * _PAGE_SIZE / (1024 * 1024),
+                "read_bps": read_bps,
+                "write_bps": write_bps,
+            })
+
+    # 사라진 PID의 상태는 자연스럽게 제거됨
+    _PROC_STATE = new_state
+    _LAST_PROC_TS = now
+    return samples if dt else []
+
+
+def select_top_processes(samples, n=PROCESS_TOP_N):
+    """
+    CPU/RSS/IO 각각의 상위 N개를 합집합으로 고르고, 어떤 기준으로 뽑혔는지 표시합니다.
+    """
+    rankings = {
+        "cpu": heapq.nlargest(n, samples, key=lambda s: s["cpu_percent"]),
+        "rss": heapq.nlargest(n, samples, key=lambda s: s["rss_mb"]),
+        "io": heapq.nlargest(n, samples, key=lambda s: s["read_bps"] + s["write_bps"]),
+    }
+    selected = {}
+    for rank_by, top in rankings.items():
+        for s in top:
+            if rank_by == "io" and s["read_bps"] + s["write_bps"] <= 0:
+                continue
+            selected.setdefault(s["pid"], (s, []))[1].append(rank_by)
+    return selected.values()
+
+
+def sample_process_metrics(ts, batch_id):
+    """
+    /proc 스캔 후 상위 N개 프로세스의 ProcessMetric 컬럼 dict 목록을 반환합니다. (DB 접근 없음)
+    워커 프로세스 모드에서는 이 단계만 워커에서 실행됩니다. (첫 틱은 기준값만 저장하므로 None)
+    """
+    samples = sample_processes()
+    if not samples:
+        return None
+    rows = [
+        {
+            "ts": ts,
+            "batch_id": batch_id,
+            "pid": s["pid"],
+            "process_name": s["name"],
+            "cmdline": s["cmdline"],
+            "user_name": s["user"],
+            "cpu_percent": round(s["cpu_percent"], 2),
+            "rss_mb": round(s["rss_mb"], 1),
+            "read_rate_bps": round(s["read_bps"], 2),
+            "write_rate_bps": round(s["write_bps"], 2),
+            "rank_by": ",".join(rank_by),
+        }
+        for s, rank_by in select_top_processes(samples)
+    ]
+    return {"rows": rows, "scanned": len(samples)}
+
+
+def store_process_metrics(ts, batch_id, result):
+    """
+    sample_process_metrics() 결과를 한 번의 bulk insert로 저장합니다.
+    """
+    if not result:
+        return None
+
+    db = SessionLocal()
+    try:
+        metrics_to_save = [ProcessMetric(**row) for row in result["rows"]]
+        db.bulk_save_objects(metrics_to_save)
+        db.commit()
+        logger.info(f"프로세스 지표 저장 완료 ({len(metrics_to_save)}개 / 전체 {result['scanned']}개)")
+        return f"Process: top {len(metrics_to_save)} of {result['scanned']}"
+    except Exception as e:
+        db.rollback()
+        logger.error(f"프로세스 저장 중 오류 발생: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def collect_process_metrics(ts=None, batch_id=None):
+    """
+    상위 N개 프로세스를 한 번의 bulk insert로 저장합니다. (첫 틱은 기준값만 저장)
+    """
+    metric_time = ts if ts else datetime.now()
+    batch_id = batch_id or metric_time.isoformat()
+
+    try:
+        result = sample_process_metrics(metric_time, batch_id)
+    except Exception as e:
+        logger.error(f"프로세스 스캔 중 오류 발생: {e}")
+        return None
+    return store_process_metrics(metric_time, batch_id, result)
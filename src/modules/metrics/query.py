@@ -0,0 +1,204 @@
+"""
+메트릭 범위 조회 + 서버 측 다운샘플링
+
+대시보드가 일주일치 10초 데이터(수십만 점)를 그대로 가져가지 않도록,
+시리즈/시간 범위/목표 점 개수를 받아 줄인 결과만 반환합니다.
+
+- lttb   : Largest-Triangle-Three-Buckets. 시각적 형태를 가장 잘 보존 (기본값)
+- minmax : 시간 버킷마다 최솟값/최댓값 두 점. 스파이크를 절대 놓치지 않음
+
+원본 점 수가 목표의 OVERSAMPLE배를 넘으면 DB에서 먼저 시간 버킷별 min/max로 집계한 뒤
+(전송량 감소) 그 결과를 다시 다운샘플링합니다. 계산은 numpy 벡터 연산으로 처리합니다.
+(DB 버킷 집계는 width_bucket()을 쓰므로 PostgreSQL 전용. SQLite 백엔드는 항상 원본 조회)
+
+    query_series("cpu_percent", start, end, points=800)
+    query_series("container.mem_percent", start, end, entity="web", method="minmax")
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from src.database.connection import engine
+from .models import CpuMetric, MemoryMetric, DiskMetric, DiskIoMetric, NetworkMetric, DockerMetric
+
+# model, value 컬럼, 엔티티 컬럼, 엔티티 미지정 시 같은 시각 값 합산 방식
+SeriesSpec = namedtuple("SeriesSpec", ["model", "column", "entity_column", "agg"])
+
+SERIES = {
+    "cpu_percent": SeriesSpec(CpuMetric, "cpu_percent", None, None),
+    "cpu_user": SeriesSpec(CpuMetric, "cpu_user", None, None),
+    "cpu_system": SeriesSpec(CpuMetric, "cpu_system", None, None),
+    "cpu_iowait": SeriesSpec(CpuMetric, "cpu_iowait", None, None),
+    "load_1min": SeriesSpec(CpuMetric, "load_1min", None, None),
+    "mem_percent": SeriesSpec(MemoryMetric, "mem_percent", None, None),
+    "mem_used_mb": SeriesSpec(MemoryMetric, "mem_used_mb", None, None),
+    "swap_used_mb": SeriesSpec(MemoryMetric, "swap_used_mb", None, None),
+    "disk_percent": SeriesSpec(DiskMetric, "disk_percent", "mount", func.max),
+    "disk_util_percent": SeriesSpec(DiskIoMetric, "util_percent", "device", func.max),
+    "disk_read_bps": SeriesSpec(DiskIoMetric, "read_bps", "device", func.sum),
+    "disk_write_bps": SeriesSpec(DiskIoMetric, "write_bps", "device", func.sum),
+    "disk_read_await_ms": SeriesSpec(DiskIoMetric, "read_await_ms", "device", func.max),
+    "disk_write_await_ms": SeriesSpec(DiskIoMetric, "write_await_ms", "device", func.max),
+    "rx_rate_bps": SeriesSpec(NetworkMetric, "rx_rate_bps", "interface", func.sum),
+    "tx_rate_bps": SeriesSpec(NetworkMetric, "tx_rate_bps", "interface", func.sum),
+    "container.cpu_percent": SeriesSpec(DockerMetric, "cpu_percent", "container_name", func.sum),
+    "container.mem_percent": SeriesSpec(DockerMetric, "mem_percent", "container_name", func.sum),
+    "container.mem_used_mb": SeriesSpec(DockerMetric, "mem_used_mb", "container_name", func.sum),
+}
+
+# Tier 1 수집 주기(초). 원본 점 개수 추정에 사용 (COUNT 쿼리 생략)
+SAMPLE_INTERVAL = 10
+# 원본이 목표 점 수의 이 배수를 넘으면 DB에서 먼저 버킷 집계
+OVERSAMPLE = 4
+
+
+def _epoch(dt):
+    if dt.tzinfo is None:
+        return dt.timestamp()
+    return dt.astimezone(timezone.utc).timestamp()
+
+
+def _value_query(spec, start, end, entity):
+    model = spec.model
+    value = getattr(model, spec.column)
+    if spec.entity_column is None or entity is not None:
+        stmt = select(model.ts, value).where(model.ts >= start, model.ts < end)
+        if entity is not None:
+            stmt = stmt.where(getattr(model, spec.entity_column) == entity)
+        return stmt, model.ts, value
+    # 엔티티 미지정: 같은 시각의 엔티티 값을 합산(또는 최댓값)
+    ts = model.ts.label("ts")
+    agg_value = spec.agg(value).label("value")
+    sub = (
+        select(ts, agg_value)
+        .where(model.ts >= start, model.ts < end)
+        .group_by(model.ts)
+        .subquery()
+    )
+    return select(sub.c.ts, sub.c.value), sub.c.ts, sub.c.value
+
+
+def _fetch_raw(conn, spec, start, end, entity):
+    stmt, ts_col, _ = _value_query(spec, start, end, entity)
+    rows = conn.execute(stmt.order_by(ts_col)).all()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    ts = np.fromiter((_epoch(r[0]) for r in rows), dtype=np.float64, count=len(rows))
+    values = np.array([r[1] for r in rows], dtype=np.float64)
+    valid = ~np.isnan(values)
+    return ts[valid], values[valid]
+
+
+def _fetch_buckets(conn, spec, start, end, entity, n_buckets):
+    """
+    DB에서 시간 버킷별 최솟값/최댓값과 각각의 실제 시각을 집계해 점 2개씩(시간 순)으로 펼칩니다.
+    """
+    stmt, ts_col, value_col = _value_query(spec, start, end, entity)
+    sub = stmt.subquery()
+    ts_col, value_col = sub.c[ts_col.name], sub.c[value_col.name]
+    bucket = func.width_bucket(func.extract("epoch", ts_col), _epoch(start), _epoch(end), n_buckets).label("bucket")
+    # 값 기준으로 정렬한 ts 배열의 첫 원소 = 최솟값/최댓값이 나온 시각
+    t_min = func.array_agg(aggregate_order_by(ts_col, value_col.asc(), ts_col.asc()))[1]
+    t_max = func.array_agg(aggregate_order_by(ts_col, value_col.desc(), ts_col.asc()))[1]
+    rows = conn.execute(
+        select(bucket, t_min, func.min(value_col), t_max, func.max(value_col))
+        .where(value_col.isnot(None), value_col != float("nan"))
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+    ts = []
+    values = []
+    for _, t_lo, v_min, t_hi, v_max in rows:
+        points = sorted({(_epoch(t_lo), v_min), (_epoch(t_hi), v_max)})
+        for t, v in points:
+            ts.append(t)
+            values.append(v)
+    return np.array(ts, dtype=np.float64), np.array(values, dtype=np.float64)
+
+
+def minmax_downsample(ts, values, n_out):
+    """
+    n_out/2개 시간 버킷마다 최솟값·최댓값 점을 시간 순서대로 남깁니다.
+    """
+    n = len(ts)
+    if n <= n_out or n_out < 2:
+        return ts, values
+    n_buckets = n_out // 2
+    edges = np.linspace(ts[0], ts[-1], n_buckets + 1)
+    bucket = np.clip(np.searchsorted(edges, ts, side="right") - 1, 0, n_buckets - 1)
+
+    # (버킷, 값) 정렬 → 버킷별 첫 원소 = 최솟값, 마지막 원소 = 최댓값
+    order = np.lexsort((values, bucket))
+    sorted_bucket = bucket[order]
+    starts = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    picks = np.unique(np.concatenate([order[starts], order[ends]]))
+    return ts[picks], values[picks]
+
+
+def lttb_downsample(ts, values, n_out):
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+    버킷 간 의존성(직전 선택 점) 때문에 버킷 루프는 남지만, 버킷 내부 면적 계산은 벡터화.
+    """
+    n = len(ts)
+    if n <= n_out or n_out < 3:
+        return ts, values
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    picks = np.empty(n_out, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 다음 버킷 평균점 (마지막 버킷은 끝점)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_t = ts[nlo:nhi].mean()
+        avg_v = values[nlo:nhi].mean()
+        bt = ts[lo:hi]
+        bv = values[lo:hi]
+        area = np.abs((ts[a] - avg_t) * (bv - values[a]) - (ts[a] - bt) * (avg_v - values[a]))
+        a = lo + int(np.argmax(area))
+        picks[i + 1] = a
+    return ts[picks], values[picks]
+
+
+def query_series(series, start, end, points=1000, entity=None, method="lttb"):
+    """
+    시리즈를 조회해 최대 points개로 다운샘플링합니다.
+    반환: {"series", "entity", "method", "source", "points": [(datetime, value), ...]}
+    """
+    spec = SERIES.get(series)
+    if spec is None:
+        raise ValueError(f"알 수 없는 시리즈: {series} (가능: {', '.join(sorted(SERIES))})")
+    if method not in ("lttb", "minmax"):
+        raise ValueError(f"지원하지 않는 다운샘플링 방식: {method}")
+    if end <= start:
+        raise ValueError("end는 start보다 커야 합니다.")
+
+    expected = (end - start).total_seconds() / SAMPLE_INTERVAL
+    with engine.connect() as conn:
+        if expected > points * OVERSAMPLE and conn.dialect.name == "postgresql":
+            ts, values = _fetch_buckets(conn, spec, start, end, entity, points * OVERSAMPLE // 2)
+            source = "db_buckets"
+        else:
+            ts, values = _fetch_raw(conn, spec, start, end, entity)
+            source = "raw"
+
+    if method == "lttb":
+        ts, values = lttb_downsample(ts, values, points)
+    else:
+        ts, values = minmax_downsample(ts, values, points)
+
+    tz = start.tzinfo
+    return {
+        "series": series,
+        "entity": entity,
+        "method": method,
+        "source": source,
+        "points": [
+            (datetime.fromtimestamp(t, tz=timezone.utc).astimezone(tz) if tz else datetime.fromtimestamp(t), float(v))
+            for t, v in zip(ts.tolist(), values.tolist())
+        ],
+    }
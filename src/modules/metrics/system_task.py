@@ -1,12 +1,15 @@
 import logging
 import os
+import re
 import time
 from datetime import datetime
 
 import psutil
 import requests
 
+from src.common.health import get_source
 from src.database.connection import SessionLocal
+from src.modules.analysis.pipeline import Sample, publish_samples
 from .models import CpuMetric, MemoryMetric, DiskMetric, NetworkMetric
 
 logger = logging.getLogger("SYSTEM")
@@ -15,19 +18,52 @@ logger = logging.getLogger("SYSTEM")
 NETDATA_HOST = os.getenv("NETDATA_HOST", "localhost")
 BASE_URL = f"http://{NETDATA_HOST}:19999/api/v1/data?after=-1&points=1&format=json&chart="
 
+_NETDATA = get_source("netdata")
+
+
+def _pattern(name, default=""):
+    value = os.getenv(name, default)
+    return re.compile(value) if value else None
+
+
+# 인터페이스/마운트 필터 (정규식, 비어 있으면 미적용). include를 먼저 적용한 뒤 exclude로 제외
+NET_INCLUDE = _pattern("NET_INCLUDE")
+NET_EXCLUDE = _pattern("NET_EXCLUDE")
+# 컨테이너마다 생겼다 사라지는 가상 인터페이스는 개별 행 대신 연결된 브리지(master)별 합계 1행으로 저장
+# (예: veth1a2b.. → interface "virtual@docker0", "virtual@br-3f9e..", 브리지 없음 → "virtual@none")
+NET_AGGREGATE = _pattern("NET_AGGREGATE", r"^veth")
+SYS_CLASS_NET = os.getenv("SYS_CLASS_NET", "/sys/class/net")
+
+DISK_MOUNT_INCLUDE = _pattern("DISK_MOUNT_INCLUDE")
+DISK_MOUNT_EXCLUDE = _pattern("DISK_MOUNT_EXCLUDE", r"^/(snap|var/lib/docker|var/snap)(/|$)")
+# snap 패키지(squashfs)와 컨테이너 레이어(overlay)는 항상 100%이거나 호스트 디스크와 중복
+DISK_FSTYPE_EXCLUDE = {t.strip() for t in os.getenv("DISK_FSTYPE_EXCLUDE", "squashfs,overlay").split(",") if t.strip()}
+
+# 인터페이스 -> 직전 틱 카운터 (이번 틱에 보인 대상 인터페이스만 유지)
 _LAST_NET_IF_STATS = {}
 _LAST_NET_TS = None
+# 집계 그룹 -> [누적 rx, 누적 tx] (구성원 증가분의 합, 에이전트 기동 이후)
+_NET_AGGREGATE_TOTALS = {}
 
 def get_netdata(chart):
+    # Netdata가 죽어 있으면 차트마다 타임아웃을 기다리지 않고 즉시 None
+    if not _NETDATA.allow():
+        return None
     try:
         r = requests.get(BASE_URL + chart, timeout=5)
         data = r.json()
+    except Exception as e:
+        _NETDATA.record_failure(e)
+        logger.error(f"Netdata 연결 실패 ({chart}): {e}")
+        return None
+    _NETDATA.record_success()
+    try:
         if not data.get('data'): return None
         cols = data['labels']
         vals = data['data'][0]
         return {cols[i]: vals[i] for i in range(len(cols))}
-    except Exception as e:
-        logger.error(f"Netdata 연결 실패 ({chart}): {e}")
+    except (AttributeError, KeyError, IndexError) as e:
+        logger.error(f"Netdata 응답 형식 오류 ({chart}): {e}")
         return None
 
 def collect_cpu_metrics(ts=None, batch_id=None):
@@ -70,6 +106,11 @@ def collect_cpu_metrics(ts=None, batch_id=None):
 
         db.add(new_metric)
         db.commit()
+        publish_samples(metric_time, [
+            Sample("cpu_percent", cpu_total),
+            Sample("cpu_iowait", cpu_iowait),
+            Sample("load_1min", new_metric.load_1min),
+        ])
 
         logger.info(f"CPU 지표 저장 완료 (CPU: {new_metric.cpu_percent}%)")
         return f"CPU: {new_metric.cpu_percent}%"
@@ -120,6 +161,10 @@ def collect_memory_metrics(ts=None, batch_id=None):
 
         db.add(new_metric)
         db.commit()
+        publish_samples(metric_time, [
+            Sample("mem_percent", mem_percent),
+            Sample("swap_used_mb", swap_used),
+        ])
 
         logger.info(f"메모리 지표 저장 완료 (RAM: {new_metric.mem_percent}%)")
         return f"RAM: {new_metric.mem_percent}%"
@@ -134,10 +179,19 @@ def collect_memory_metrics(ts=None, batch_id=None):
         db.close()
 
 
+def _selected(name, include, exclude):
+    if include is not None and not include.search(name):
+        return False
+    return exclude is None or not exclude.search(name)
+
+
 def collect_disk_metrics(ts=None, batch_id=None):
     metric_time = ts if ts else datetime.now()
     batch_id = batch_id or metric_time.isoformat()
-    partitions = psutil.disk_partitions(all=False)
+    partitions = [
+        p for p in psutil.disk_partitions(all=False)
+        if p.fstype not in DISK_FSTYPE_EXCLUDE and _selected(p.mountpoint, DISK_MOUNT_INCLUDE, DISK_MOUNT_EXCLUDE)
+    ]
 
     db = SessionLocal()
     try:
@@ -162,6 +216,9 @@ def collect_disk_metrics(ts=None, batch_id=None):
         if metrics_to_save:
             db.bulk_save_objects(metrics_to_save)
             db.commit()
+            publish_samples(metric_time, [
+                Sample("disk_percent", m.disk_percent, "mount", m.mount) for m in metrics_to_save
+            ])
             logger.info(f"디스크 지표 저장 완료 ({len(metrics_to_save)}개 마운트)")
             return f"Disk: {len(metrics_to_save)} mounts"
         return None
@@ -173,27 +230,51 @@ def collect_disk_metrics(ts=None, batch_id=None):
         db.close()
 
 
+def _bridge_of(iface):
+    try:
+        return os.path.basename(os.readlink(f"{SYS_CLASS_NET}/{iface}/master"))
+    except OSError:
+        return None
+
+
+def _counter_delta(cur, prev):
+    # 카운터가 줄었으면 인터페이스 재생성(같은 이름)으로 보고 현재값을 증가분으로 사용
+    return cur - prev if cur >= prev else cur
+
+
 def collect_network_metrics(ts=None, batch_id=None):
     global _LAST_NET_IF_STATS, _LAST_NET_TS
 
     metric_time = ts if ts else datetime.now()
     batch_id = batch_id or metric_time.isoformat()
     now_ts = time.time()
-    counters = psutil.net_io_counters(pernic=True)
+    counters = {
+        iface: stats
+        for iface, stats in psutil.net_io_counters(pernic=True).items()
+        if _selected(iface, NET_INCLUDE, NET_EXCLUDE)
+    }
+    dt = now_ts - _LAST_NET_TS if _LAST_NET_TS else None
 
     db = SessionLocal()
     try:
         metrics_to_save = []
+        # 집계 그룹 -> [rx 증가분, tx 증가분]
+        groups = {}
         for iface, stats in counters.items():
             prev = _LAST_NET_IF_STATS.get(iface)
-            rate_rx = 0.0
-            rate_tx = 0.0
-            if prev and _LAST_NET_TS:
-                dt = now_ts - _LAST_NET_TS
-                if dt > 0:
-                    rate_rx = (stats.bytes_recv - prev.bytes_recv) / dt
-                    rate_tx = (stats.bytes_sent - prev.bytes_sent) / dt
+            d_rx = _counter_delta(stats.bytes_recv, prev.bytes_recv) if prev else 0
+            d_tx = _counter_delta(stats.bytes_sent, prev.bytes_sent) if prev else 0
+
+            if NET_AGGREGATE is not None and NET_AGGREGATE.search(iface):
+                # 새로 생긴 구성원은 기준값만 잡고(증가분 0), 사라진 구성원은 그룹에서 빠짐
+                group = f"virtual@{_bridge_of(iface) or 'none'}"
+                delta = groups.setdefault(group, [0, 0])
+                delta[0] += d_rx
+                delta[1] += d_tx
+                continue
 
+            rate_rx = d_rx / dt if dt and dt > 0 else 0.0
+            rate_tx = d_tx / dt if dt and dt > 0 else 0.0
             new_metric = NetworkMetric(
                 ts=metric_time,
                 batch_id=batch_id,
@@ -205,10 +286,37 @@ def collect_network_metrics(ts=None, batch_id=None):
             )
             metrics_to_save.append(new_metric)
 
+        for group, (d_rx, d_tx) in groups.items():
+            totals = _NET_AGGREGATE_TOTALS.setdefault(group, [0, 0])
+            totals[0] += d_rx
+            totals[1] += d_tx
+            metrics_to_save.append(NetworkMetric(
+                ts=metric_time,
+                batch_id=batch_id,
+                interface=group,
+                rx_bytes=totals[0],
+                tx_bytes=totals[1],
+                rx_rate_bps=round(d_rx / dt, 2) if dt and dt > 0 else 0.0,
+                tx_rate_bps=round(d_tx / dt, 2) if dt and dt > 0 else 0.0,
+            ))
+        # 구성원이 모두 사라진 그룹(브리지 삭제 등)의 누적값 정리
+        for group in [g for g in _NET_AGGREGATE_TOTALS if g not in groups]:
+            del _NET_AGGREGATE_TOTALS[group]
+
         if metrics_to_save:
             db.bulk_save_objects(metrics_to_save)
             db.commit()
-            logger.info(f"네트워크 지표 저장 완료 ({len(metrics_to_save)}개 인터페이스)")
+            if _LAST_NET_TS:
+                # 첫 틱은 기준값만 있으므로(속도 0) 분석기로 넘기지 않음
+                publish_samples(metric_time, [
+                    sample
+                    for m in metrics_to_save
+                    for sample in (
+                        Sample("rx_rate_bps", m.rx_rate_bps, "interface", m.interface),
+                        Sample("tx_rate_bps", m.tx_rate_bps, "interface", m.interface),
+                    )
+                ])
+            logger.info(f"네트워크 지표 저장 완료 ({len(metrics_to_save)}개 인터페이스, 집계 {len(groups)}개)")
             return f"Network: {len(metrics_to_save)} interfaces"
         return None
     except Exception as e:
@@ -216,6 +324,7 @@ def collect_network_metrics(ts=None, batch_id=None):
         logger.error(f"네트워크 저장 중 오류 발생: {e}")
         return None
     finally:
+        # 필터를 통과한 현재 인터페이스만 남기므로 사라진 veth 기준값은 자동으로 정리됨
         _LAST_NET_IF_STATS = counters
         _LAST_NET_TS = now_ts
         db.close()
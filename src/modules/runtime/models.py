@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, Text, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from src.database.connection import Base
 
@@ -17,10 +17,16 @@ class TmuxSession(Base):
     }
 
     id = Column(Integer, primary_key=True, comment="행 식별자(PK). 조인에는 사용하지 않음.")
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="수집 시각. 시간 범위 필터/정렬에 사용.")
-    batch_id = Column(Text, index=True, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
+    ts = Column(DateTime(timezone=True), server_default=func.now(), comment="수집 시각. 시간 범위 필터/정렬에 사용(BRIN).")
+    batch_id = Column(Text, comment="동일 수집 사이클 식별자. ts 미세 오차로 조인이 실패하는 것을 방지하기 위해 사용.")
 
-    session_name = Column(Text, nullable=False, index=True, comment="tmux 세션 이름.")
+    session_name = Column(Text, nullable=False, comment="tmux 세션 이름.")
     attached = Column(Boolean, comment="현재 세션에 접속 중인지 여부.")
     windows = Column(Integer, comment="세션 내 윈도우 개수.")
     created_at = Column(DateTime(timezone=True), comment="tmux 세션 생성 시각.")
+    event = Column(Text, comment="기록 사유 (snapshot: 접속 직후 전체 상태 / created / changed / closed).")
+    socket_path = Column(Text, comment="세션이 속한 tmux 서버 소켓 경로 (UID별 /tmp/tmux-<uid>/...).")
+
+
+Index("brin_tmux_ts", TmuxSession.ts, postgresql_using="brin", postgresql_with={"pages_per_range": 32})
+Index("idx_tmux_session_ts", TmuxSession.session_name, TmuxSession.ts, postgresql_include=["attached", "windows"])
@@ -1,106 +1,370 @@
-import subprocess
+"""
+Tmux 런타임 모니터링 모듈 (control mode 버전)
+
+1분마다 `tmux list-sessions`를 실행하는 대신, tmux 서버 소켓마다
+`tmux -C` control mode 클라이언트를 하나씩 상주시켜 서버가 보내는
+알림(%sessions-changed, %window-add, %session-closed 등)을 받아
+상태가 바뀐 순간에만 DB에 기록합니다.
+전체 스냅샷은 최초 접속 직후(또는 서버에 접근할 수 없었던 뒤 재접속 시) 한 번만 저장합니다.
+붙어 있던 세션이 종료되어 연결이 끊기면 list-sessions로 실제 목록을 확인해 사라진 세션만 closed로 기록하고
+남은 세션으로 바로 다시 붙습니다.
+"""
+import glob
 import logging
+import os
+import stat
+import subprocess
+import threading
+import time
+from collections import deque
 from datetime import datetime
+from src.common.subprocess_runner import run_command
 from src.database.connection import SessionLocal
 from .models import TmuxSession
 
 logger = logging.getLogger("RUNTIME")
 
-def get_tmux_sessions():
+# 모든 UID의 tmux 소켓 디렉토리 (/tmp/tmux-<uid>/<socket>)
+TMUX_SOCKET_GLOB = os.getenv("TMUX_SOCKET_GLOB", "/tmp/tmux-*/*")
+
+# 세션 목록 갱신이 필요한 control mode 알림
+REFRESH_NOTIFICATIONS = (
+    "%sessions-changed",
+    "%session-closed",
+    "%session-renamed",
+    "%window-add",
+    "%window-close",
+    "%unlinked-window-add",
+    "%unlinked-window-close",
+    "%client-session-changed",
+    "%client-detached",
+)
+
+# 세션 이름에 ':'가 들어갈 수 있으므로 이름은 마지막 필드로 둔다
+LIST_SESSIONS_FORMAT = "#{session_id}:#{session_attached}:#{session_windows}:#{session_created}:#{session_name}"
+
+# 재접속 백오프 (초)
+RECONNECT_MIN_DELAY = 5
+RECONNECT_MAX_DELAY = 300
+
+_CLIENTS = {}
+
+
+def discover_tmux_sockets():
     """
-    tmux list-sessions 명령을 통해 세션 정보를 가져옴.
-    호스트(UID 1000)의 세션을 보기 위해 소켓 경로를 명시적으로 지정함.
+    /tmp/tmux-*/ 아래의 모든 유닉스 소켓을 찾습니다. (UID 1000 고정 X)
     """
-    sessions = []
-    
-    # 호스트의 Tmux 소켓 경로 후보 (UID 1000 기준)
-    # 보통 /tmp/tmux-1000/default 형식이지만, 파일명이 다를 수 있으므로 검색
-    socket_path = None
-    possible_dir = "/tmp/tmux-1000"
-    
-    import os
-    if os.path.isdir(possible_dir):
+    sockets = []
+    for path in glob.glob(TMUX_SOCKET_GLOB):
         try:
-            # 디렉토리 내의 첫 번째 파일을 소켓으로 가정 (보통 'default')
-            files = os.listdir(possible_dir)
-            if files:
-                socket_path = os.path.join(possible_dir, files[0])
-                logger.info(f"호스트 Tmux 소켓 발견: {socket_path}")
-        except PermissionError:
-             logger.warning(f"소켓 디렉토리({possible_dir}) 접근 권한이 없습니다. (컨테이너가 root인지 확인 필요)")
-
-    # 명령 명령어 구성 (-S 옵션 사용)
-    cmd = ['tmux']
-    if socket_path:
-        cmd.extend(['-S', socket_path])
-    cmd.extend(['list-sessions', '-F', '#{session_name}:#{session_attached}:#{session_windows}'])
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                sockets.append(path)
+        except (PermissionError, FileNotFoundError):
+            continue
+    return sorted(sockets)
 
-    try:
-        # 포맷: 이름:접속여부(1 or 0):윈도우개수
-        result = subprocess.check_output(
-            cmd,
+
+def parse_session_line(line):
+    """
+    LIST_SESSIONS_FORMAT 한 줄을 dict로 변환합니다.
+    """
+    parts = line.split(':', 4)
+    if len(parts) < 5:
+        return None
+    session_id, attached, windows, created, name = parts
+    return {
+        "id": session_id,
+        "name": name,
+        "attached": int(attached) if attached.isdigit() else 0,
+        "windows": int(windows) if windows.isdigit() else 0,
+        "created_at": datetime.fromtimestamp(int(created)) if created.isdigit() else None,
+    }
+
+
+class TmuxControlClient(threading.Thread):
+    """
+    tmux 서버 소켓 하나에 붙는 read-only control mode 클라이언트.
+    """
+
+    def __init__(self, socket_path):
+        super().__init__(name=f"tmux-control:{socket_path}", daemon=True)
+        self.socket_path = socket_path
+        self.sessions = {}
+        self._proc = None
+        self._stop_event = threading.Event()
+        self._own_session_id = None
+        # 응답 대기 중인 명령 핸들러 (%begin/%end 블록 순서대로 매칭)
+        self._pending = deque()
+        self._refresh_in_flight = False
+        self._refresh_dirty = False
+        self._snapshot_written = False
+
+    # ------------------------------------------------------------------
+    # 프로세스/프로토콜 처리
+    # ------------------------------------------------------------------
+    def run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self._session_loop()
+            except FileNotFoundError:
+                logger.warning("Tmux 명령어를 찾을 수 없습니다. (설치되어 있나요?)")
+                return
+            except Exception as e:
+                logger.error(f"Tmux control 클라이언트 오류 ({self.socket_path}): {e}")
+
+            if self._stop_event.is_set():
+                self._close_all_sessions()
+                break
+            # 붙어 있던 세션만 종료된 경우(서버는 살아 있음): 사라진 세션만 closed로 기록하고 다른 세션으로 즉시 재접속
+            # 단, 접속 직후 바로 끊기는 경우는 재접속이 헛돌지 않도록 아래 백오프를 따름
+            if self._reconcile() and time.monotonic() - started >= 1:
+                delay = RECONNECT_MIN_DELAY
+                continue
+            if not os.path.exists(self.socket_path):
+                break
+            # 오래 유지됐던 연결이 끊긴 경우엔 바로 재접속, 연속 실패 시 지수 백오프
+            delay = RECONNECT_MIN_DELAY if time.monotonic() - started > RECONNECT_MAX_DELAY else min(delay * 2, RECONNECT_MAX_DELAY)
+            self._stop_event.wait(delay)
+
+        logger.info(f"Tmux control 클라이언트 종료 ({self.socket_path})")
+
+    def _session_loop(self):
+        self._pending.clear()
+        self._refresh_in_flight = False
+        self._refresh_dirty = False
+        self._own_session_id = None
+
+        # -r/-f read-only: 입력 불가, ignore-size: 다른 클라이언트 창 크기에 영향 없음, no-output: %output 미수신
+        self._proc = subprocess.Popen(
+            ['tmux', '-S', self.socket_path, '-C', 'attach-session', '-r', '-f', 'read-only,ignore-size,no-output'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            encoding='utf-8'
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
         )
-        for line in result.strip().split('\n'):
-            if ':' in line:
-                parts = line.split(':')
-                if len(parts) >= 3:
-                    name, attached, windows = parts[0], parts[1], parts[2]
-                    sessions.append({
-                        "name": name,
-                        "attached": True if attached == '1' else False,
-                        "windows": int(windows) if windows.isdigit() else 0
-                    })
-    except FileNotFoundError:
-        logger.warning("Tmux 명령어를 찾을 수 없습니다. (설치되어 있나요?)")
-    except subprocess.CalledProcessError as e:
-        # 정상적인 '세션 없음' 상태 또는 버전 불일치 확인
-        output = e.output.strip() if e.output else ""
-        if "no server running" in output or "failed to connect to server" in output:
-            logger.info(f"실행 중인 Tmux 세션이 없습니다. (소켓: {socket_path})")
-        elif "protocol version mismatch" in output:
-             logger.error(f"Tmux 버전 불일치! (Host vs Container). 호스트의 tmux 버전을 업데이트하거나 컨테이너를 맞춰야 합니다. (Err: {output})")
+        logger.info(f"Tmux control 모드 접속: {self.socket_path}")
+        # attach 명령 자체의 응답 블록은 버린다
+        self._pending.append(None)
+        self._request_refresh()
+
+        block = None
+        block_flags = None
+        for raw in self._proc.stdout:
+            line = raw.rstrip('\n')
+            if block is not None:
+                if line.startswith('%end') or line.startswith('%error'):
+                    handler = self._pop_handler(block_flags)
+                    if handler:
+                        handler(block if line.startswith('%end') else None)
+                    block = None
+                else:
+                    block.append(line)
+                continue
+
+            if line.startswith('%begin'):
+                # %begin <time> <number> <flags>: flags=1은 이 클라이언트가 stdin으로 보낸 명령의 응답
+                parts = line.split()
+                block_flags = parts[3] if len(parts) > 3 else None
+                block = []
+            elif line.startswith('%session-changed'):
+                # 이 클라이언트가 붙은 세션 (attached 수에서 자신을 제외하기 위함)
+                parts = line.split(' ', 2)
+                self._own_session_id = parts[1] if len(parts) > 1 else None
+                self._request_refresh()
+            elif line.startswith(REFRESH_NOTIFICATIONS):
+                self._request_refresh()
+            elif line.startswith('%exit'):
+                break
+            elif "protocol version mismatch" in line:
+                logger.error(f"Tmux 버전 불일치! (Host vs Container). 호스트의 tmux 버전을 업데이트하거나 컨테이너를 맞춰야 합니다. (Err: {line})")
+            elif "no server running" in line or "no sessions" in line:
+                logger.info(f"실행 중인 Tmux 세션이 없습니다. (소켓: {self.socket_path})")
+
+        self._terminate()
+
+    def _pop_handler(self, flags):
+        """
+        응답 블록에 맞는 핸들러를 꺼냅니다. 자리표시자 None은 attach 명령 응답 몫입니다.
+        attach 응답(flags=0)은 먼저 보낸 list-sessions 응답(flags=1)보다 늦게 올 수 있으므로
+        flags가 있으면 순서 대신 flags로 구분합니다.
+        """
+        if flags == '0':
+            if None in self._pending:
+                self._pending.remove(None)
+            return None
+        if flags == '1':
+            for handler in self._pending:
+                if handler is not None:
+                    self._pending.remove(handler)
+                    return handler
+            return None
+        return self._pending.popleft() if self._pending else None
+
+    def _reconcile(self):
+        """
+        control 연결이 끊긴 직후 list-sessions로 실제 세션 목록을 확인해 사라진 세션만 closed로 기록합니다.
+        서버에 접근할 수 없으면 상태를 알 수 없으므로 모두 closed로 남기고 재접속 시 스냅샷으로 복구합니다.
+        반환: 서버가 살아 있고 세션이 남아 있으면 True
+        """
+        try:
+            result = run_command(
+                ['tmux', '-S', self.socket_path, 'list-sessions', '-F', LIST_SESSIONS_FORMAT], timeout=5, name="tmux",
+            )
+        except OSError as e:
+            logger.warning(f"Tmux list-sessions 실행 실패 ({self.socket_path}): {e}")
+            result = None
+        if result is None or not result.ok:
+            self._close_all_sessions()
+            self._snapshot_written = False
+            return False
+        current = {}
+        for line in result.stdout.splitlines():
+            s = parse_session_line(line)
+            if s:
+                current[s["id"]] = s
+        # 재접속 후 첫 목록은 스냅샷 대신 이 목록과의 차이만 기록됨
+        self._write(self._diff(self.sessions, current))
+        self.sessions = current
+        return bool(current)
+
+    def _send(self, command, handler):
+        if not self._proc or self._proc.poll() is not None:
+            return
+        self._pending.append(handler)
+        self._proc.stdin.write(command + '\n')
+        self._proc.stdin.flush()
+
+    def _request_refresh(self):
+        # 알림이 몰려와도 list-sessions는 동시에 하나만 보내고, 그 사이 변경은 dirty로 합친다
+        if self._refresh_in_flight:
+            self._refresh_dirty = True
+            return
+        self._refresh_in_flight = True
+        self._send(f"list-sessions -F '{LIST_SESSIONS_FORMAT}'", self._on_sessions)
+
+    def _on_sessions(self, lines):
+        self._refresh_in_flight = False
+        if lines is None:
+            logger.warning(f"Tmux list-sessions 실패 ({self.socket_path})")
+            return
+        current = {}
+        for line in lines:
+            s = parse_session_line(line)
+            if s:
+                if s["id"] == self._own_session_id:
+                    s["attached"] = max(s["attached"] - 1, 0)
+                current[s["id"]] = s
+
+        if not self._snapshot_written:
+            self._write([(s, "snapshot") for s in current.values()])
+            self._snapshot_written = True
         else:
-            logger.warning(f"Tmux 조회 실패: {output}")
-    except Exception as e:
-        logger.error(f"Tmux 정보 추출 중 알 수 없는 오류: {e}")
-        
-    return sessions
+            self._write(self._diff(self.sessions, current))
+        self.sessions = current
+
+        if self._refresh_dirty:
+            self._refresh_dirty = False
+            self._request_refresh()
+
+    def _terminate(self):
+        if self._proc and self._proc.poll() is None:
+            try:
+                self._proc.stdin.write('detach-client\n')
+                self._proc.stdin.flush()
+                self._proc.wait(timeout=2)
+            except Exception:
+                self._proc.kill()
+        self._proc = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+
+    # ------------------------------------------------------------------
+    # 상태 변경 → DB
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _diff(before, after):
+        changes = []
+        for sid, s in after.items():
+            prev = before.get(sid)
+            if prev is None:
+                changes.append((s, "created"))
+            elif (prev["name"], prev["attached"], prev["windows"]) != (s["name"], s["attached"], s["windows"]):
+                changes.append((s, "changed"))
+        for sid, s in before.items():
+            if sid not in after:
+                changes.append((dict(s, attached=0, windows=0), "closed"))
+        return changes
+
+    def _close_all_sessions(self):
+        if self.sessions:
+            self._write([(dict(s, attached=0, windows=0), "closed") for s in self.sessions.values()])
+            self.sessions = {}
+
+    def _write(self, changes):
+        if not changes:
+            return
+        ts = datetime.now()
+        db = SessionLocal()
+        try:
+            db.bulk_save_objects([
+                TmuxSession(
+                    ts=ts,
+                    batch_id=ts.isoformat(),
+                    session_name=s["name"],
+                    attached=s["attached"] > 0,
+                    windows=s["windows"],
+                    created_at=s["created_at"],
+                    event=event,
+                    socket_path=self.socket_path,
+                )
+                for s, event in changes
+            ])
+            db.commit()
+            logger.info(
+                f"Tmux 상태 변경 저장 ({self.socket_path}): "
+                + ", ".join(f"{s['name']}={event}" for s, event in changes)
+            )
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Tmux 상태 저장 중 오류 발생: {e}")
+        finally:
+            db.close()
+
 
 def collect_runtime_status(ts=None, batch_id=None):
     """
-    Tmux 세션 등의 런타임 상태 정보를 수집하여 DB에 저장 (Tier 2: 1분 주기)
+    Tmux control 클라이언트 감독 (Tier 2: 1분 주기)
+    - 새로 생긴 소켓(다른 UID 포함)에 클라이언트를 붙이고, 죽은 클라이언트는 다시 띄운다.
+    - 실제 상태 기록은 각 클라이언트가 알림을 받는 즉시 수행한다.
     """
-    if ts is None:
-        ts = datetime.now()
-    batch_id = batch_id or ts.isoformat()
-
-    db = SessionLocal()
     try:
-        # 1. Tmux 세션 정보 수집
-        sessions = get_tmux_sessions()
-        
-        objs_to_save = []
-        for s in sessions:
-            new_session = TmuxSession(
-                ts=ts,
-                batch_id=batch_id,
-                session_name=s['name'],
-                attached=s['attached'],
-                windows=s['windows']
-            )
-            objs_to_save.append(new_session)
-        
-        if objs_to_save:
-            db.bulk_save_objects(objs_to_save)
-            db.commit()
-            logger.info(f"런타임 상태 저장 완료 (Tmux: {len(objs_to_save)}개 세션)")
-            return f"Runtime: {len(objs_to_save)} tmux sessions collected"
-        
+        sockets = discover_tmux_sockets()
+        for path in sockets:
+            client = _CLIENTS.get(path)
+            if client is None or not client.is_alive():
+                client = TmuxControlClient(path)
+                client.start()
+                _CLIENTS[path] = client
+
+        for path in list(_CLIENTS):
+            if path not in sockets and not _CLIENTS[path].is_alive():
+                del _CLIENTS[path]
+
+        session_count = sum(len(c.sessions) for c in _CLIENTS.values())
+        return f"Runtime: {session_count} tmux sessions ({len(_CLIENTS)} sockets, push)"
     except Exception as e:
-        db.rollback()
         logger.error(f"런타임 수집 중 오류 발생: {e}")
         return None
-    finally:
-        db.close()
+
+
+def stop_runtime_monitors():
+    for client in _CLIENTS.values():
+        client.stop()
+    _CLIENTS.clear()